@@ -0,0 +1,136 @@
+import numpy as np
+
+from assumptions import MAX_SHAPIRO_N, NormalityResult, check_assumptions
+from backends import get_backend
+from batch_tests import compare_groups
+from ingest import DEFAULT_CHUNKSIZE
+from ranks import mannwhitney_summaries
+from resampling import bootstrap, permutation_test
+from schema import group_column, level_column, score_column, skill_columns
+from summaries import TestResult, anova_oneway, anova_twoway, ttest
+
+# Analysis stages. Each one takes the group summaries (plus its own
+# parameters) and returns plain, picklable results, so the driver can cache
+# them individually and the report is written from results alone.
+# scipy.stats is only imported by the stages that need it.
+
+DEFAULT_PARAMS = {
+    'alpha': 0.05,                   # significance level for every test decision
+    'epsilon': 0.5,                  # TOST equivalence bound on the mean difference
+    'min_level_size': 5,             # minimum rows in a level of study to analyse it
+    'min_group_size': 3,             # minimum rows per student type within a level
+    'max_shapiro_n': MAX_SHAPIRO_N,  # larger groups get D'Agostino-Pearson instead of Shapiro-Wilk
+}
+
+
+def load(paths, stream=False, chunksize=DEFAULT_CHUNKSIZE, processed_file=None, workers=1, backend='pandas',
+         scorer=None):
+    """Steps 1-4: the group summaries of the cleaned, scored data, from the named execution backend."""
+    return get_backend(backend).summarize(paths, stream, chunksize, processed_file, workers, scorer)
+
+
+def assumption_tests(summaries, alpha, max_shapiro_n=MAX_SHAPIRO_N):
+    # Every metric is checked in one call; the score rows decide the report's tests
+    checks = check_assumptions(summaries, alpha=alpha, max_shapiro_n=max_shapiro_n)
+    normality = checks['normality'].xs(score_column, level='metric')
+    variance = checks['variance'].loc[score_column]
+    normality_indian, normality_foreign = (NormalityResult(*normality.loc[group, ['test', 'statistic', 'pvalue']])
+                                           for group in ('Indian', 'Foreign'))
+    levene_result = TestResult(variance['statistic'], variance['pvalue'])
+    return {
+        'normality_indian': normality_indian,
+        'normality_foreign': normality_foreign,
+        'normality_met': bool(normality_indian.pvalue > alpha and normality_foreign.pvalue > alpha),
+        'levene': levene_result,
+        'equal_variance': bool(levene_result.pvalue > alpha),
+        'checks': checks,
+    }
+
+
+def hypothesis_tests(summaries, equal_variance):
+    indian = summaries.summary(group='Indian')
+    foreign = summaries.summary(group='Foreign')
+    return {
+        't_test': TestResult(*ttest(indian, foreign, equal_var=equal_variance)),
+        # U from the value histograms; same statistic and p-value as scipy's mannwhitneyu on the raw scores
+        'u_test': mannwhitney_summaries(indian, foreign),
+    }
+
+
+def anova(summaries):
+    # Closed form from the per-group summaries (same table as an OLS fit + anova_lm)
+    return anova_oneway({g: summaries.summary(group=g) for g in summaries.groups()}, group_column)
+
+
+def anova_by_level(summaries, levels):
+    # Student type x level of study, with interaction, over the given levels
+    table = summaries.table(by=[group_column, level_column], metrics=[score_column]).droplevel('metric')
+    return anova_twoway(table[table.index.get_level_values(level_column).isin(levels)])
+
+
+def effect_sizes(summaries):
+    indian = summaries.summary(group='Indian')
+    foreign = summaries.summary(group='Foreign')
+    n1, n2 = indian.n, foreign.n
+    # Pooled standard deviation
+    pooled_std = np.sqrt(((n1 - 1) * indian.var + (n2 - 1) * foreign.var) / (n1 + n2 - 2))
+    cohen_d = abs(indian.mean - foreign.mean) / pooled_std
+
+    # Classification of effect size
+    if cohen_d < 0.2:
+        effect_size_class = "negligible"
+    elif cohen_d < 0.5:
+        effect_size_class = "small"
+    elif cohen_d < 0.8:
+        effect_size_class = "medium"
+    else:
+        effect_size_class = "large"
+
+    return {
+        'n1': n1, 'n2': n2,
+        'mean1': indian.mean, 'mean2': foreign.mean,
+        'var1': indian.var, 'var2': foreign.var,
+        'cohen_d': cohen_d,
+        'effect_size_class': effect_size_class,
+    }
+
+
+def resampling(summaries, n_resamples, seed=0, workers=1, precision=None):
+    indian = summaries.summary(group='Indian')
+    foreign = summaries.summary(group='Foreign')
+    boot = bootstrap(indian, foreign, n_resamples, confidence_levels=(0.95, 0.90), seed=seed, workers=workers)
+    perm = permutation_test(indian, foreign, n_resamples, seed=seed, workers=workers, precision=precision)
+    return {'bootstrap': boot, 'permutation': perm}
+
+
+def equivalence(effects, epsilon, alpha):
+    # Two One-Sided Tests (TOST): a (1 - 2 alpha) CI for the mean difference inside +/- epsilon
+    from scipy import stats
+    n1, n2 = effects['n1'], effects['n2']
+    mean_diff = effects['mean1'] - effects['mean2']
+    se_diff = np.sqrt(effects['var1'] / n1 + effects['var2'] / n2)
+    margin = stats.t.ppf(1 - alpha, n1 + n2 - 2) * se_diff
+    ci_lower, ci_upper = mean_diff - margin, mean_diff + margin
+    return {
+        'ci_lower': ci_lower,
+        'ci_upper': ci_upper,
+        'conclusion': "equivalent" if ci_lower > -epsilon and ci_upper < epsilon else "not equivalent",
+    }
+
+
+def skill_tests(summaries, equal_variance, alpha):
+    # All skills in one vectorized call, Holm-adjusted
+    return compare_groups(summaries.table(metrics=skill_columns), 'Indian', 'Foreign',
+                          equal_var=equal_variance, correction='holm', alpha=alpha)
+
+
+def level_tests(summaries, alpha, min_level_size, min_group_size):
+    # Only levels with enough data in both groups are tested (Welch t-tests, all in one call)
+    testable = [level for level in summaries.levels
+                if summaries.row_count(level=level) >= min_level_size
+                and summaries.row_count('Indian', level) >= min_group_size
+                and summaries.row_count('Foreign', level) >= min_group_size]
+    table = summaries.table(by=[group_column, level_column], metrics=[score_column])
+    table = table[table.index.get_level_values(level_column).isin(testable)]
+    return compare_groups(table, 'Indian', 'Foreign', equal_var=False, correction='holm',
+                          alpha=alpha).droplevel('metric')
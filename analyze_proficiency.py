@@ -1,381 +1,507 @@
-import pandas as pd
-import numpy as np
-from scipy import stats
-import statsmodels.api as sm
-from statsmodels.formula.api import ols
-
-# Create a function to output results to a file
-def write_results(file, text):
-    with open(file, 'a') as f:
-        f.write(text + '\n')
-
-# Create/clear the output file
-output_file = 'proficiency_analysis_results.txt'
-with open(output_file, 'w') as f:
-    f.write("ENGLISH PROFICIENCY ANALYSIS RESULTS\n")
-    f.write("===================================\n\n")
-
-# Step 1: Load and clean the data
-print("Loading data...")
-write_results(output_file, "Data Loading and Preparation:")
-df = pd.read_csv('data/Data Collection.csv')
-
-# Print basic information
-print(f"Dataset shape: {df.shape}")
-write_results(output_file, f"Dataset shape: {df.shape}")
-
-# Step 2: Data cleaning and preparation
-# Remove any rows with missing values in key columns
-df = df.dropna(subset=['Nationality', 'First Language', 'Level of Study'])
-
-# Create a binary variable: Indian vs Foreign students
-df['Student_Type'] = df['Nationality'].apply(lambda x: 'Indian' if x == 'Indian' else 'Foreign')
-
-# Count student types
-count_by_type = df['Student_Type'].value_counts()
-write_results(output_file, f"\nStudent count by type:")
-write_results(output_file, f"Indian students: {count_by_type.get('Indian', 0)}")
-write_results(output_file, f"Foreign students: {count_by_type.get('Foreign', 0)}")
-write_results(output_file, f"Total: {len(df)}")
-
-# Step 3: Define English proficiency scores
-# Create a composite score for English proficiency based on the 4 skills
-# First, convert skill levels to numeric values
-skill_mapping = {
-    'Very Weak': 1, 
-    'Weak': 2, 
-    'Moderate': 3, 
-    'Strong': 4, 
-    'Very Strong': 5,
-    'Very strong': 5  # Handle capitalization inconsistency
-}
-
-# Apply mapping to skill columns
-skill_columns = [
-    'Reading Comprehension \n(Understanding academic text)', 
-    'Listening Skills (Understanding lectures and spoken English)',
-    'Speaking Skills (Fluency and confidence in spoken communication)',
-    'Writing Skills (Ability to write academic papers and assignments)'
-]
-
-# Convert skill ratings to numeric
-for col in skill_columns:
-    df[col] = df[col].map(skill_mapping)
-
-# Calculate composite proficiency score (mean of the 4 skills)
-df['Proficiency_Score'] = df[skill_columns].mean(axis=1)
-
-# Step 4: Save processed data to a new file
-df.to_csv('processed_proficiency_data.csv', index=False)
-print("\nProcessed data saved to 'processed_proficiency_data.csv'")
-
-# Step 5: Descriptive Statistics by Group
-print("\nDescriptive Statistics for English Proficiency by Student Type:")
-desc_stats = df.groupby('Student_Type')['Proficiency_Score'].describe()
-print(desc_stats)
-
-write_results(output_file, "\nDescriptive Statistics for English Proficiency by Student Type:")
-write_results(output_file, desc_stats.to_string())
-
-# Step 6: Statistical Tests
-print("\nStatistical Tests for English Proficiency Differences:")
-write_results(output_file, "\n\nSTATISTICAL TESTING")
-write_results(output_file, "===================")
-
-# Get scores for each group
-indian_scores = df[df['Student_Type'] == 'Indian']['Proficiency_Score']
-foreign_scores = df[df['Student_Type'] == 'Foreign']['Proficiency_Score']
-
-# 6.1 Shapiro-Wilk Test for Normality
-print("\nNormality Tests:")
-write_results(output_file, "\n1. Testing Normality Assumption")
-indian_shapiro = stats.shapiro(indian_scores)
-foreign_shapiro = stats.shapiro(foreign_scores)
-
-print(f"Shapiro-Wilk test for Indian students: W={indian_shapiro.statistic:.4f}, p-value={indian_shapiro.pvalue:.4f}")
-print(f"Shapiro-Wilk test for Foreign students: W={foreign_shapiro.statistic:.4f}, p-value={foreign_shapiro.pvalue:.4f}")
-
-write_results(output_file, f"Shapiro-Wilk test for Indian students: W={indian_shapiro.statistic:.4f}, p-value={indian_shapiro.pvalue:.4f}")
-write_results(output_file, f"Shapiro-Wilk test for Foreign students: W={foreign_shapiro.statistic:.4f}, p-value={foreign_shapiro.pvalue:.4f}")
-
-if indian_shapiro.pvalue > 0.05 and foreign_shapiro.pvalue > 0.05:
-    print("Both distributions appear to be normally distributed (p > 0.05)")
-    write_results(output_file, "Conclusion: Both distributions appear to be normally distributed (p > 0.05)")
-    normality_assumption_met = True
-else:
-    print("At least one distribution deviates from normality")
-    write_results(output_file, "Conclusion: At least one distribution deviates from normality")
-    normality_assumption_met = False
-
-# 6.2 Levene's Test for Homogeneity of Variances
-print("\nHomogeneity of Variances Test:")
-write_results(output_file, "\n2. Testing Homogeneity of Variances")
-levene = stats.levene(indian_scores, foreign_scores)
-print(f"Levene's test: W={levene.statistic:.4f}, p-value={levene.pvalue:.4f}")
-write_results(output_file, f"Levene's test: W={levene.statistic:.4f}, p-value={levene.pvalue:.4f}")
-
-if levene.pvalue > 0.05:
-    print("Variances appear to be equal (p > 0.05)")
-    write_results(output_file, "Conclusion: Variances appear to be equal (p > 0.05)")
-    equal_variance = True
-else:
-    print("Variances appear to be unequal")
-    write_results(output_file, "Conclusion: Variances appear to be unequal")
-    equal_variance = False
-
-# 6.3 Choose appropriate test based on assumptions
-print("\nHypothesis Test Results:")
-write_results(output_file, "\n3. Hypothesis Testing")
-
-# T-test (parametric)
-t_test = stats.ttest_ind(indian_scores, foreign_scores, equal_var=equal_variance)
-print(f"Independent samples t-test: t={t_test.statistic:.4f}, p-value={t_test.pvalue:.4f}")
-write_results(output_file, f"Independent samples t-test: t={t_test.statistic:.4f}, p-value={t_test.pvalue:.4f}")
-
-# Mann-Whitney U test (non-parametric)
-u_test = stats.mannwhitneyu(indian_scores, foreign_scores)
-print(f"Mann-Whitney U test: U={u_test.statistic:.4f}, p-value={u_test.pvalue:.4f}")
-write_results(output_file, f"Mann-Whitney U test: U={u_test.statistic:.4f}, p-value={u_test.pvalue:.4f}")
-
-# 6.4 One-way ANOVA
-model = ols('Proficiency_Score ~ Student_Type', data=df).fit()
-anova_table = sm.stats.anova_lm(model, typ=2)
-print("\nOne-way ANOVA results:")
-print(anova_table)
-write_results(output_file, "\n4. One-way ANOVA")
-write_results(output_file, anova_table.to_string())
-
-# Step 7: Effect Size Calculation
-write_results(output_file, "\n5. Effect Size Analysis")
-mean1 = indian_scores.mean()
-mean2 = foreign_scores.mean()
-n1 = len(indian_scores)
-n2 = len(foreign_scores)
-var1 = indian_scores.var()
-var2 = foreign_scores.var()
-
-# Pooled standard deviation
-pooled_std = np.sqrt(((n1 - 1) * var1 + (n2 - 1) * var2) / (n1 + n2 - 2))
-
-# Cohen's d
-cohen_d = abs(mean1 - mean2) / pooled_std
-print(f"\nEffect Size Analysis:")
-print(f"Mean proficiency score (Indian): {mean1:.4f}")
-print(f"Mean proficiency score (Foreign): {mean2:.4f}")
-print(f"Mean difference: {abs(mean1 - mean2):.4f}")
-print(f"Effect size (Cohen's d): {cohen_d:.4f}")
-
-write_results(output_file, f"Mean proficiency score (Indian): {mean1:.4f}")
-write_results(output_file, f"Mean proficiency score (Foreign): {mean2:.4f}")
-write_results(output_file, f"Mean difference: {abs(mean1 - mean2):.4f}")
-write_results(output_file, f"Effect size (Cohen's d): {cohen_d:.4f}")
-
-# Classification of effect size
-if cohen_d < 0.2:
-    effect_size_class = "negligible"
-elif cohen_d < 0.5:
-    effect_size_class = "small"
-elif cohen_d < 0.8:
-    effect_size_class = "medium"
-else:
-    effect_size_class = "large"
-
-print(f"Effect size classification: {effect_size_class}")
-write_results(output_file, f"Effect size classification: {effect_size_class}")
-
-# Step 8: Equivalence Testing
-# Two One-Sided Tests (TOST) approach for equivalence
-# Define equivalence bounds (0.5 is often used as meaningful difference threshold)
-print("\nEquivalence Testing:")
-write_results(output_file, "\n6. Equivalence Testing (TOST)")
-epsilon = 0.5
-
-# Calculate 90% confidence interval for mean difference
-# (90% CI is used for two one-sided tests at alpha=0.05)
-mean_diff = mean1 - mean2
-se_diff = np.sqrt(var1/n1 + var2/n2)
-ci_lower = mean_diff - stats.t.ppf(0.95, n1+n2-2) * se_diff
-ci_upper = mean_diff + stats.t.ppf(0.95, n1+n2-2) * se_diff
-
-print(f"90% Confidence Interval for mean difference: [{ci_lower:.4f}, {ci_upper:.4f}]")
-print(f"Equivalence bounds: [-{epsilon:.1f}, {epsilon:.1f}]")
-write_results(output_file, f"90% Confidence Interval for mean difference: [{ci_lower:.4f}, {ci_upper:.4f}]")
-write_results(output_file, f"Equivalence bounds: [-{epsilon:.1f}, {epsilon:.1f}]")
-
-if ci_lower > -epsilon and ci_upper < epsilon:
-    print("The groups are statistically equivalent (scores differ by less than the equivalence bound)")
-    write_results(output_file, "Conclusion: The groups are statistically equivalent (scores differ by less than the equivalence bound)")
-    equivalence_conclusion = "equivalent"
-else:
-    print("Cannot conclude that the groups are equivalent")
-    write_results(output_file, "Conclusion: Cannot conclude that the groups are equivalent")
-    equivalence_conclusion = "not equivalent"
-
-# Step 9: Skill-by-Skill Analysis
-print("\nSkill-by-Skill Analysis:")
-write_results(output_file, "\n\nSKILL-BY-SKILL ANALYSIS")
-write_results(output_file, "======================")
-
-for skill in skill_columns:
-    # Extract skill name for better readability
-    skill_name = skill.split('(')[0].strip()
-    
-    # Get scores for this skill
-    indian_skill = df[df['Student_Type'] == 'Indian'][skill]
-    foreign_skill = df[df['Student_Type'] == 'Foreign'][skill]
-    
-    # Run t-test
-    skill_ttest = stats.ttest_ind(indian_skill, foreign_skill, equal_var=equal_variance)
-    
-    # Calculate effect size
-    skill_mean1 = indian_skill.mean()
-    skill_mean2 = foreign_skill.mean()
-    skill_var1 = indian_skill.var()
-    skill_var2 = foreign_skill.var()
-    skill_n1 = len(indian_skill)
-    skill_n2 = len(foreign_skill)
-    
-    skill_pooled_std = np.sqrt(((skill_n1 - 1) * skill_var1 + (skill_n2 - 1) * skill_var2) / (skill_n1 + skill_n2 - 2))
-    skill_cohen_d = abs(skill_mean1 - skill_mean2) / skill_pooled_std
-    
-    print(f"\n{skill_name}:")
-    print(f"  Mean (Indian): {skill_mean1:.2f}, Mean (Foreign): {skill_mean2:.2f}")
-    print(f"  t-test: t={skill_ttest.statistic:.4f}, p-value={skill_ttest.pvalue:.4f}")
-    print(f"  Effect size (Cohen's d): {skill_cohen_d:.4f}")
-    
-    write_results(output_file, f"\n{skill_name}:")
-    write_results(output_file, f"  Mean (Indian): {skill_mean1:.2f}, Mean (Foreign): {skill_mean2:.2f}")
-    write_results(output_file, f"  Mean difference: {abs(skill_mean1 - skill_mean2):.2f}")
-    write_results(output_file, f"  t-test: t={skill_ttest.statistic:.4f}, p-value={skill_ttest.pvalue:.4f}")
-    write_results(output_file, f"  Effect size (Cohen's d): {skill_cohen_d:.4f}")
-    
-    if skill_ttest.pvalue < 0.05:
-        print(f"  Result: Significant difference detected")
-        write_results(output_file, f"  Result: Significant difference detected")
-    else:
-        print(f"  Result: No significant difference")
-        write_results(output_file, f"  Result: No significant difference")
-
-# Step 10: Analysis by Study Level
-print("\nAnalysis by Level of Study:")
-write_results(output_file, "\n\nANALYSIS BY LEVEL OF STUDY")
-write_results(output_file, "=======================")
-study_levels = df['Level of Study'].unique()
-
-for level in study_levels:
-    # Get data for this level
-    level_data = df[df['Level of Study'] == level]
-    
-    # Check if we have enough data
-    if len(level_data) < 5:
-        print(f"\n{level}: Insufficient data for analysis (n={len(level_data)})")
-        write_results(output_file, f"\n{level}: Insufficient data for analysis (n={len(level_data)})")
-        continue
-        
-    # Get scores
-    level_indian = level_data[level_data['Student_Type'] == 'Indian']['Proficiency_Score']
-    level_foreign = level_data[level_data['Student_Type'] == 'Foreign']['Proficiency_Score']
-    
-    # Check if we have enough in each group
-    if len(level_indian) < 3 or len(level_foreign) < 3:
-        print(f"\n{level}: Insufficient data in one or both groups (Indian: {len(level_indian)}, Foreign: {len(level_foreign)})")
-        write_results(output_file, f"\n{level}: Insufficient data in one or both groups (Indian: {len(level_indian)}, Foreign: {len(level_foreign)})")
-        continue
-    
-    # Run t-test
-    level_ttest = stats.ttest_ind(level_indian, level_foreign, equal_var=False)
-    
-    print(f"\n{level}:")
-    print(f"  Indian students: n={len(level_indian)}, mean={level_indian.mean():.2f}")
-    print(f"  Foreign students: n={len(level_foreign)}, mean={level_foreign.mean():.2f}")
-    print(f"  t-test: t={level_ttest.statistic:.4f}, p-value={level_ttest.pvalue:.4f}")
-    
-    write_results(output_file, f"\n{level}:")
-    write_results(output_file, f"  Indian students: n={len(level_indian)}, mean={level_indian.mean():.2f}")
-    write_results(output_file, f"  Foreign students: n={len(level_foreign)}, mean={level_foreign.mean():.2f}")
-    write_results(output_file, f"  Mean difference: {abs(level_indian.mean() - level_foreign.mean()):.2f}")
-    write_results(output_file, f"  t-test: t={level_ttest.statistic:.4f}, p-value={level_ttest.pvalue:.4f}")
-    
-    if level_ttest.pvalue < 0.05:
-        print(f"  Result: Significant difference detected")
-        write_results(output_file, f"  Result: Significant difference detected")
-    else:
-        print(f"  Result: No significant difference")
-        write_results(output_file, f"  Result: No significant difference")
-
-# Step 11: Summary and Conclusion
-print("\n=========================================================")
-print("SUMMARY AND CONCLUSION")
-print("=========================================================")
-
-write_results(output_file, "\n\nSUMMARY AND CONCLUSION")
-write_results(output_file, "====================")
-
-if t_test.pvalue >= 0.05:
-    conclusion = "Based on the t-test (p = {:.4f}), there is NO statistically significant difference in English proficiency between Indian and foreign students.".format(t_test.pvalue)
-    print(conclusion)
-    write_results(output_file, conclusion)
-else:
-    conclusion = "Based on the t-test (p = {:.4f}), there IS a statistically significant difference in English proficiency between Indian and foreign students.".format(t_test.pvalue)
-    print(conclusion)
-    write_results(output_file, conclusion)
-
-effect_conclusion = f"The effect size is {effect_size_class} (Cohen's d = {cohen_d:.4f}), indicating that the practical significance of any difference is {effect_size_class}."
-print(effect_conclusion)
-write_results(output_file, effect_conclusion)
-
-equiv_conclusion = f"Equivalence testing suggests that the groups are {equivalence_conclusion}. (90% CI for mean difference: [{ci_lower:.4f}, {ci_upper:.4f}], equivalence bounds: [-{epsilon:.1f}, {epsilon:.1f}])"
-print(equiv_conclusion)
-write_results(output_file, equiv_conclusion)
-
-print("\nInterpretation:")
-write_results(output_file, "\nInterpretation:")
-
-if t_test.pvalue >= 0.05 and equivalence_conclusion == "equivalent":
-    interpretation = "The data strongly supports the claim that there is no significant difference in English proficiency between Indian and foreign students based on country of origin."
-    print(interpretation)
-    write_results(output_file, interpretation)
-elif t_test.pvalue >= 0.05 and equivalence_conclusion != "equivalent":
-    interpretation = "While we cannot reject the null hypothesis of no difference, we also cannot confidently claim equivalence. More data may be needed."
-    print(interpretation)
-    write_results(output_file, interpretation)
-elif t_test.pvalue < 0.05 and effect_size_class in ["negligible", "small"]:
-    interpretation = f"Although a statistically significant difference was detected, the effect size is {effect_size_class}, suggesting that the practical importance of this difference may be limited."
-    print(interpretation)
-    write_results(output_file, interpretation)
-else:
-    interpretation = "There appears to be a meaningful difference in English proficiency between the groups, with foreign students scoring higher on average."
-    print(interpretation)
-    write_results(output_file, interpretation)
-
-# Add skill-specific insights
-write_results(output_file, "\nSkill-specific insights:")
-speaking_test = stats.ttest_ind(
-    df[df['Student_Type'] == 'Indian']['Speaking Skills (Fluency and confidence in spoken communication)'],
-    df[df['Student_Type'] == 'Foreign']['Speaking Skills (Fluency and confidence in spoken communication)'],
-    equal_var=equal_variance
-)
-
-if speaking_test.pvalue < 0.05:
-    write_results(output_file, "- Speaking is the only skill area showing a statistically significant difference between the groups.")
-    write_results(output_file, "  Foreign students report higher fluency and confidence in spoken communication.")
-
-# Add educational level insights
-pg_test = stats.ttest_ind(
-    df[(df['Student_Type'] == 'Indian') & (df['Level of Study'] == 'Postgraduate')]['Proficiency_Score'],
-    df[(df['Student_Type'] == 'Foreign') & (df['Level of Study'] == 'Postgraduate')]['Proficiency_Score'],
-    equal_var=False
-)
-
-if pg_test.pvalue < 0.05:
-    write_results(output_file, "- At the postgraduate level, there is a significant difference in proficiency between Indian and foreign students.")
-    write_results(output_file, "  This difference is not observed at the undergraduate level.")
-
-# Final recommendations
-write_results(output_file, "\nRecommendations for future research:")
-write_results(output_file, "1. Focus on speaking skills development, as this is the area with the most apparent differences")
-write_results(output_file, "2. Investigate the reasons for postgraduate-level differences in proficiency")
-write_results(output_file, "3. Consider controlling for years of English study and educational background in future analyses")
-write_results(output_file, "4. Examine differences by specific country of origin rather than just 'Indian' vs. 'Foreign'")
-
-print(f"\nDetailed analysis has been saved to '{output_file}'") 
\ No newline at end of file
+import argparse
+import os
+
+import analysis
+from assumptions import NORMALITY_TESTS
+from backends import BACKENDS
+from cache import (CACHE_VERSION, DEFAULT_CACHE_DIR, DEFAULT_CACHE_SIZE, ResultCache, code_digest, file_digest,
+                   make_key, run_stage)
+from ingest import DEFAULT_CHUNKSIZE, DEFAULT_STATE_FILE, append_responses
+from intermediate import DEFAULT_HISTOGRAM_FILE, DEFAULT_PROCESSED_FILE, write_histograms
+from profiling import Profiler
+from report import REPORT_FORMATS, Report
+from resampling import DEFAULT_RESAMPLES
+from schema import key_columns, row_columns, score_column, skill_columns, skill_mapping, speaking_column
+from scoring import SkillScorer
+
+# The pipeline as importable functions: load_summaries (steps 1-4), run_stages (the
+# tests, each one cached) and build_report (the write-up). main() wires them to the
+# command line; service.py keeps them resident behind a local HTTP server.
+
+
+def build_parser(allow_abbrev=True):
+    parser = argparse.ArgumentParser(description='Analyze English proficiency of Indian vs foreign students.',
+                                     allow_abbrev=allow_abbrev)
+    parser.add_argument('--input', nargs='+', default=['data/Data Collection.csv'], metavar='PATH',
+                        help='Survey exports to analyze together: CSV, XLSX (every data sheet) or Parquet, '
+                             'detected by content (default: data/Data Collection.csv)')
+    parser.add_argument('--format', choices=sorted(REPORT_FORMATS), default='text',
+                        help='Format of the saved report (default: text)')
+    parser.add_argument('--output', default=None,
+                        help='Report path (default: proficiency_analysis_results with the format suffix)')
+    parser.add_argument('--processed', default=DEFAULT_PROCESSED_FILE,
+                        help=f'Processed data for the plotting stage; .parquet, .arrow or .csv (default: {DEFAULT_PROCESSED_FILE})')
+    parser.add_argument('--histograms', default=DEFAULT_HISTOGRAM_FILE,
+                        help=f'Per-group value histograms the plots are drawn from (default: {DEFAULT_HISTOGRAM_FILE})')
+    parser.add_argument('--stream', action='store_true',
+                        help='Read the export in chunks instead of loading it into memory')
+    parser.add_argument('--backend', choices=list(BACKENDS), default='pandas',
+                        help='Engine that reads, cleans and groups the exports: pandas, or a lazy multi-threaded '
+                             'query with duckdb or polars (installed separately); same results (default: pandas)')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                        help=f'Rows per chunk in --stream mode (default: {DEFAULT_CHUNKSIZE})')
+    parser.add_argument('--skill-weights', nargs=len(skill_columns), type=float, default=None,
+                        metavar=('READING', 'LISTENING', 'SPEAKING', 'WRITING'),
+                        help='Weights of the skills in the composite score (default: equal weights)')
+    parser.add_argument('--min-skills', type=int, default=1,
+                        help='Rated skills a response needs to get a composite score (default: %(default)s)')
+    parser.add_argument('--resamples', type=int, default=DEFAULT_RESAMPLES,
+                        help=f'Bootstrap resamples and permutations for the Indian vs Foreign comparison; 0 disables (default: {DEFAULT_RESAMPLES})')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Worker processes for reading several inputs and for resampling (default: 1)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed for resampling (default: 0)')
+    parser.add_argument('--precision', type=float, default=None,
+                        help='Stop permutations once the p-value standard error is below this')
+    parser.add_argument('--append', nargs='+', metavar='CSV', default=None,
+                        help='Fold new responses (or a grown export) into the stored summaries and report on '
+                             'everything ingested so far; the processed file is not rewritten')
+    parser.add_argument('--state', default=DEFAULT_STATE_FILE,
+                        help=f'Stored summaries for --append (default: {DEFAULT_STATE_FILE})')
+    parser.add_argument('--alpha', type=float, default=analysis.DEFAULT_PARAMS['alpha'],
+                        help='Significance level (default: %(default)s)')
+    parser.add_argument('--epsilon', type=float, default=analysis.DEFAULT_PARAMS['epsilon'],
+                        help='Equivalence bound for TOST (default: %(default)s)')
+    parser.add_argument('--min-level-size', type=int, default=analysis.DEFAULT_PARAMS['min_level_size'],
+                        help='Minimum respondents for a level of study to be tested (default: %(default)s)')
+    parser.add_argument('--min-group-size', type=int, default=analysis.DEFAULT_PARAMS['min_group_size'],
+                        help='Minimum respondents per student type within a level (default: %(default)s)')
+    parser.add_argument('--max-shapiro-n', type=int, default=analysis.DEFAULT_PARAMS['max_shapiro_n'],
+                        help="Largest group tested with Shapiro-Wilk; larger groups get D'Agostino-Pearson "
+                             '(default: %(default)s)')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help=f'Directory for cached stage results (default: {DEFAULT_CACHE_DIR})')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE // (1024 * 1024),
+                        help='Cache size limit in MB; least recently used results are evicted (default: %(default)s)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Recompute every stage without reading or writing the cache')
+    parser.add_argument('--profile', default=None, metavar='JSONL',
+                        help='Append wall/CPU time, process peak RSS (and how far each stage raised it) and rows '
+                             'of every stage to this JSON-lines file')
+    parser.add_argument('--trace', default=None, metavar='JSON',
+                        help='Write the stage timings as a Chrome trace (chrome://tracing, Perfetto)')
+    parser.add_argument('--profile-deep', action='store_true',
+                        help='Also run each stage under cProfile and tracemalloc (slower)')
+    return parser
+
+
+def make_scorer(args):
+    # ValueError for weights or a minimum of rated skills that make no score
+    return SkillScorer(args.skill_weights, args.min_skills)
+
+
+# Modules whose code computes the cached stage results
+ANALYSIS_MODULES = ['analysis', 'assumptions', 'backends', 'batch_tests', 'ingest', 'intermediate', 'ranks', 'readers',
+                    'resampling', 'schema', 'scoring', 'summaries']
+
+
+def dataset_key(paths, scorer=None, digests=None):
+    # Identity of the inputs for caching: their content plus the schema and scoring used to read them,
+    # and the cache format and analysis code that results under this key were computed with.
+    # digests, if given, are the inputs' content digests (e.g. of the sources folded into --append state)
+    if digests is None:
+        paths = [paths] if isinstance(paths, str) else paths
+        digests = [file_digest(path) for path in paths]
+    return make_key('data', CACHE_VERSION, code_digest(*ANALYSIS_MODULES), list(digests),
+                    skill_mapping, key_columns, (scorer or SkillScorer()).key())
+
+
+def load_summaries(args, cache=None, data_key=None, profiler=None):
+    """Steps 1-4: load, clean, score and save the processed data; returns the group summaries."""
+    # Every statistic is computed from per-group value histograms (GroupedSummaries),
+    # which the streaming path accumulates chunk by chunk and the in-memory path builds at once.
+    processed_file = args.processed
+    scorer = make_scorer(args)
+    data_key = data_key or dataset_key(args.input, scorer)
+
+    def load():
+        summaries = analysis.load(args.input, args.stream, args.chunksize, processed_file, args.workers,
+                                  args.backend, scorer)
+        return summaries, file_digest(processed_file)
+
+    # The processed file is a side effect of loading, so the cached summaries are only
+    # reused while the file on disk is still the one written alongside them; its columns
+    # depend on the load mode (--stream and the query backends write the narrower set)
+    load_key = make_key('load', data_key, processed_file, row_columns, args.stream, args.backend)
+    with (profiler or Profiler()).stage('load') as record:
+        hits = len(cache.hits) if cache is not None else 0
+        summaries, _ = run_stage(cache, 'load', load_key, load,
+                                 lambda cached: os.path.exists(processed_file) and file_digest(processed_file) == cached[1])
+        record['rows'] = summaries.source_shape[0]
+        record['cached'] = cache is not None and len(cache.hits) > hits
+    return summaries
+
+
+def run_stages(summaries, args, cache=None, data_key=None, profiler=None):
+    """Run every analysis stage; results are cached under the data key and the stage's parameters."""
+    # Every stage result is cached under a hash of the input data, the schema mapping and
+    # the parameters that stage reads, so e.g. a new epsilon only reruns the TOST stage.
+    data_key = data_key or dataset_key(args.input, make_scorer(args))
+    alpha = args.alpha
+    profiler = profiler or Profiler()
+    n_rows = summaries.row_count()
+
+    def stage(name, compute, *params):
+        with profiler.stage(name, rows=n_rows) as record:
+            hits = len(cache.hits) if cache is not None else 0
+            result = run_stage(cache, name, make_key(name, data_key, *params), compute)
+            record['cached'] = cache is not None and len(cache.hits) > hits
+        return result
+
+    results = {}
+    results['assumptions'] = stage('assumptions',
+                                   lambda: analysis.assumption_tests(summaries, alpha, args.max_shapiro_n),
+                                   alpha, args.max_shapiro_n)
+    equal_variance = results['assumptions']['equal_variance']
+    results['hypothesis'] = stage('hypothesis', lambda: analysis.hypothesis_tests(summaries, equal_variance),
+                                  equal_variance)
+    results['anova'] = stage('anova', lambda: analysis.anova(summaries))
+    effects = results['effects'] = stage('effects', lambda: analysis.effect_sizes(summaries))
+    results['equivalence'] = stage('equivalence', lambda: analysis.equivalence(effects, args.epsilon, alpha),
+                                   args.epsilon, alpha)
+    results['resampling'] = None
+    if args.resamples > 0:
+        # Worker count does not change the draws, so it is not part of the key
+        results['resampling'] = stage('resampling', lambda: analysis.resampling(summaries, args.resamples, args.seed,
+                                                                                args.workers, args.precision),
+                                      args.resamples, args.seed, args.precision)
+    results['skills'] = stage('skills', lambda: analysis.skill_tests(summaries, equal_variance, alpha),
+                              equal_variance, alpha)
+    levels = results['levels'] = stage('levels', lambda: analysis.level_tests(summaries, alpha, args.min_level_size,
+                                                                              args.min_group_size),
+                                       alpha, args.min_level_size, args.min_group_size)
+    results['level_anova'] = stage('level_anova', lambda: analysis.anova_by_level(summaries, list(levels.index)),
+                                   list(levels.index))
+    return results
+
+
+def build_report(summaries, results, args, echo=True):
+    """Write up the stage results; with echo the report is printed as it grows."""
+    report = Report("ENGLISH PROFICIENCY ANALYSIS RESULTS", rule="===================================", echo=echo)
+    alpha = args.alpha
+    epsilon = args.epsilon
+    assumptions = results['assumptions']
+    equal_variance = assumptions['equal_variance']
+    hypothesis = results['hypothesis']
+    anova_table = results['anova']
+    effects = results['effects']
+    equivalence = results['equivalence']
+    resampled = results['resampling']
+    skill_tests = results['skills']
+    level_tests = results['levels']
+    level_anova = results['level_anova']
+
+    report.line("Data Loading and Preparation:")
+
+    # Print basic information
+    report.line(f"Dataset shape: {summaries.source_shape}")
+
+    # Count student types
+    report.heading("Student count by type:")
+    report.line(f"Indian students: {summaries.row_count('Indian')}")
+    report.line(f"Foreign students: {summaries.row_count('Foreign')}")
+    report.line(f"Total: {summaries.row_count()}")
+
+    # Scoring other than the plain mean of the rated skills is stated with the counts
+    scorer = make_scorer(args)
+    if not scorer.is_default():
+        weights = ', '.join(f"{skill.split('(')[0].strip()} {weight:g}"
+                            for skill, weight in zip(skill_columns, scorer.weights))
+        report.line(f"Composite score: weighted mean of the rated skills ({weights}), "
+                    f"at least {scorer.min_answered} rated skill(s); "
+                    f"{summaries.summary(score_column).n} of {summaries.row_count()} responses scored")
+    report.record(skill_weights=[float(w) for w in scorer.weights], min_rated_skills=scorer.min_answered)
+
+    # Skill labels outside the rating scale count as unrated; say how many there were
+    if summaries.unmapped_count():
+        unmapped = summaries.unmapped.rename(index=lambda skill: skill.split('(')[0].strip(), level='metric')
+        report.heading("Unrecognized skill labels (counted as unrated):")
+        report.table(unmapped.rename('responses').to_frame())
+    report.record(unmapped_skill_labels=summaries.unmapped_count())
+
+    # Step 5: Descriptive Statistics by Group
+    desc_stats = summaries.describe()
+    report.heading("Descriptive Statistics for English Proficiency by Student Type:")
+    report.table(desc_stats)
+
+    # Step 6: Statistical Tests
+    report.section("STATISTICAL TESTING", "===================")
+
+    # 6.1 Normality: Shapiro-Wilk, or D'Agostino-Pearson for groups too large for it
+    report.heading("1. Testing Normality Assumption")
+    indian_normality = assumptions['normality_indian']
+    foreign_normality = assumptions['normality_foreign']
+
+    for label, normality in (("Indian", indian_normality), ("Foreign", foreign_normality)):
+        test_name, symbol = NORMALITY_TESTS[normality.test]
+        report.line(f"{test_name} test for {label} students: {symbol}={normality.statistic:.4f}, p-value={normality.pvalue:.4f}")
+
+    if assumptions['normality_met']:
+        report.line(f"Conclusion: Both distributions appear to be normally distributed (p > {alpha:g})")
+    else:
+        report.line("Conclusion: At least one distribution deviates from normality")
+
+    # 6.2 Levene's Test for Homogeneity of Variances
+    report.heading("2. Testing Homogeneity of Variances")
+    levene = assumptions['levene']
+    report.line(f"Levene's test: W={levene.statistic:.4f}, p-value={levene.pvalue:.4f}")
+
+    if equal_variance:
+        report.line(f"Conclusion: Variances appear to be equal (p > {alpha:g})")
+    else:
+        report.line("Conclusion: Variances appear to be unequal")
+
+    # The same checks for every skill, from the one vectorized call
+    checks = assumptions['checks']
+    report.record(assumption_checks=[
+        {'metric': metric.split('(')[0].strip(),
+         'normality_indian_p': checks['normality'].loc[('Indian', metric), 'pvalue'],
+         'normality_foreign_p': checks['normality'].loc[('Foreign', metric), 'pvalue'],
+         'levene_p': row['pvalue'], 'equal_variance': bool(row['equal_variance'])}
+        for metric, row in checks['variance'].iterrows()
+    ])
+
+    # 6.3 Choose appropriate test based on assumptions
+    report.heading("3. Hypothesis Testing")
+
+    # T-test (parametric)
+    t_test = hypothesis['t_test']
+    report.line(f"Independent samples t-test: t={t_test.statistic:.4f}, p-value={t_test.pvalue:.4f}")
+
+    # Mann-Whitney U test (non-parametric)
+    u_test = hypothesis['u_test']
+    report.line(f"Mann-Whitney U test: U={u_test.statistic:.4f}, p-value={u_test.pvalue:.4f}")
+
+    # 6.4 One-way ANOVA
+    report.heading("4. One-way ANOVA")
+    report.table(anova_table)
+
+    # Step 7: Effect Size Calculation
+    report.heading("5. Effect Size Analysis")
+    n1, n2 = effects['n1'], effects['n2']
+    mean1, mean2 = effects['mean1'], effects['mean2']
+    cohen_d = effects['cohen_d']
+    effect_size_class = effects['effect_size_class']
+    report.line(f"Mean proficiency score (Indian): {mean1:.4f}")
+    report.line(f"Mean proficiency score (Foreign): {mean2:.4f}")
+    report.line(f"Mean difference: {abs(mean1 - mean2):.4f}")
+    report.line(f"Effect size (Cohen's d): {cohen_d:.4f}")
+    report.line(f"Effect size classification: {effect_size_class}")
+
+    # Resampling-based inference (bootstrap CIs and permutation p-value, Indian - Foreign)
+    if args.resamples > 0:
+        boot = resampled['bootstrap']
+        perm = resampled['permutation']
+        report.line(f"Bootstrap 95% CI for mean difference (Indian - Foreign): [{boot.mean_diff_ci[0.95][0]:.4f}, {boot.mean_diff_ci[0.95][1]:.4f}] ({boot.n_resamples} resamples)")
+        report.line(f"Bootstrap 95% CI for Cohen's d (Indian - Foreign): [{boot.cohen_d_ci[0.95][0]:.4f}, {boot.cohen_d_ci[0.95][1]:.4f}]")
+        report.line(f"Permutation test for mean difference: p-value={perm.pvalue:.4f} ({perm.n_resamples} permutations)")
+        report.record(
+            bootstrap_resamples=boot.n_resamples,
+            bootstrap_mean_diff_ci=[float(v) for v in boot.mean_diff_ci[0.95]],
+            bootstrap_cohen_d_ci=[float(v) for v in boot.cohen_d_ci[0.95]],
+            permutation_p=perm.pvalue, permutation_resamples=perm.n_resamples,
+        )
+
+    # Step 8: Equivalence Testing
+    # Two One-Sided Tests (TOST) approach for equivalence
+    # (a 90% CI for the mean difference at alpha=0.05, compared with +/- epsilon)
+    report.heading("6. Equivalence Testing (TOST)")
+    ci_level = f"{100 * (1 - 2 * alpha):g}%"
+    ci_lower, ci_upper = equivalence['ci_lower'], equivalence['ci_upper']
+    equivalence_conclusion = equivalence['conclusion']
+
+    report.line(f"{ci_level} Confidence Interval for mean difference: [{ci_lower:.4f}, {ci_upper:.4f}]")
+    report.line(f"Equivalence bounds: [-{epsilon:.1f}, {epsilon:.1f}]")
+
+    if equivalence_conclusion == "equivalent":
+        report.line("Conclusion: The groups are statistically equivalent (scores differ by less than the equivalence bound)")
+    else:
+        report.line("Conclusion: Cannot conclude that the groups are equivalent")
+
+    if args.resamples > 0:
+        boot_lower, boot_upper = boot.mean_diff_ci[0.90]
+        within = "within" if boot_lower > -epsilon and boot_upper < epsilon else "not within"
+        report.line(f"Bootstrap 90% CI for mean difference: [{boot_lower:.4f}, {boot_upper:.4f}] ({within} the equivalence bounds)")
+        report.record(bootstrap_tost_ci=[float(boot_lower), float(boot_upper)])
+
+    report.record(
+        n_indian=n1, n_foreign=n2,
+        mean_indian=mean1, mean_foreign=mean2,
+        normality_indian_test=indian_normality.test, normality_indian_stat=indian_normality.statistic,
+        normality_indian_p=indian_normality.pvalue,
+        normality_foreign_test=foreign_normality.test, normality_foreign_stat=foreign_normality.statistic,
+        normality_foreign_p=foreign_normality.pvalue,
+        levene_w=levene.statistic, levene_p=levene.pvalue, equal_variance=equal_variance,
+        t_statistic=t_test.statistic, t_pvalue=t_test.pvalue,
+        mannwhitney_u=u_test.statistic, mannwhitney_p=u_test.pvalue,
+        anova_f=anova_table['F'].iloc[0], anova_p=anova_table['PR(>F)'].iloc[0],
+        cohen_d=cohen_d, effect_size_class=effect_size_class,
+        tost_ci_lower=ci_lower, tost_ci_upper=ci_upper, epsilon=epsilon, alpha=alpha,
+        equivalence=equivalence_conclusion,
+    )
+
+    # Step 9: Skill-by-Skill Analysis
+    # All skills are tested in one vectorized call (Holm-adjusted p-values go to the structured results)
+    report.section("SKILL-BY-SKILL ANALYSIS", "======================")
+    for skill in skill_columns:
+        # Extract skill name for better readability
+        skill_name = skill.split('(')[0].strip()
+        result = skill_tests.loc[skill]
+    
+        report.heading(f"{skill_name}:")
+        report.line(f"  Mean (Indian): {result['mean1']:.2f}, Mean (Foreign): {result['mean2']:.2f}")
+        report.line(f"  Mean difference: {abs(result['mean_diff']):.2f}")
+        report.line(f"  t-test: t={result['t']:.4f}, p-value={result['pvalue']:.4f}")
+        report.line(f"  Effect size (Cohen's d): {abs(result['cohen_d']):.4f}")
+    
+        if result['pvalue'] < alpha:
+            report.line(f"  Result: Significant difference detected")
+        else:
+            report.line(f"  Result: No significant difference")
+
+    report.record(skills=[
+        {'skill': skill.split('(')[0].strip(), 'mean_indian': r['mean1'], 'mean_foreign': r['mean2'],
+         't_statistic': r['t'], 't_pvalue': r['pvalue'], 't_pvalue_holm': r['p_adjusted'],
+         'cohen_d': abs(r['cohen_d']), 'ci_lower': r['ci_lower'], 'ci_upper': r['ci_upper']}
+        for skill, r in skill_tests.iterrows()
+    ])
+
+    # Step 10: Analysis by Study Level
+    report.section("ANALYSIS BY LEVEL OF STUDY", "=======================")
+    study_levels = summaries.levels
+
+    for level in study_levels:
+        # Check if we have enough data
+        level_n = summaries.row_count(level=level)
+        if level_n < args.min_level_size:
+            report.heading(f"{level}: Insufficient data for analysis (n={level_n})")
+            continue
+        
+        # Check if we have enough in each group
+        level_n1 = summaries.row_count('Indian', level)
+        level_n2 = summaries.row_count('Foreign', level)
+        if level_n1 < args.min_group_size or level_n2 < args.min_group_size:
+            report.heading(f"{level}: Insufficient data in one or both groups (Indian: {level_n1}, Foreign: {level_n2})")
+            continue
+
+        result = level_tests.loc[level]
+    
+        report.heading(f"{level}:")
+        report.line(f"  Indian students: n={int(result['n1'])}, mean={result['mean1']:.2f}")
+        report.line(f"  Foreign students: n={int(result['n2'])}, mean={result['mean2']:.2f}")
+        report.line(f"  Mean difference: {abs(result['mean_diff']):.2f}")
+        report.line(f"  t-test: t={result['t']:.4f}, p-value={result['pvalue']:.4f}")
+    
+        if result['pvalue'] < alpha:
+            report.line(f"  Result: Significant difference detected")
+        else:
+            report.line(f"  Result: No significant difference")
+
+    report.record(levels=[
+        {'level': level, 'n_indian': int(r['n1']), 'n_foreign': int(r['n2']),
+         'mean_indian': r['mean1'], 'mean_foreign': r['mean2'],
+         't_statistic': r['t'], 't_pvalue': r['pvalue'], 't_pvalue_holm': r['p_adjusted']}
+        for level, r in level_tests.iterrows()
+    ])
+
+    # Two-way ANOVA over the tested levels (student type, level of study and their interaction)
+    if len(level_tests) > 1:
+        report.heading("Two-way ANOVA (Student Type x Level of Study):")
+        report.table(level_anova)
+        report.record(level_anova=[
+            {'term': term, 'F': r['F'], 'pvalue': r['PR(>F)']}
+            for term, r in level_anova.drop('Residual').iterrows()
+        ])
+
+    # Step 11: Summary and Conclusion
+    report.section("SUMMARY AND CONCLUSION", "====================")
+
+    if t_test.pvalue >= alpha:
+        conclusion = "Based on the t-test (p = {:.4f}), there is NO statistically significant difference in English proficiency between Indian and foreign students.".format(t_test.pvalue)
+    else:
+        conclusion = "Based on the t-test (p = {:.4f}), there IS a statistically significant difference in English proficiency between Indian and foreign students.".format(t_test.pvalue)
+    report.line(conclusion)
+
+    effect_conclusion = f"The effect size is {effect_size_class} (Cohen's d = {cohen_d:.4f}), indicating that the practical significance of any difference is {effect_size_class}."
+    report.line(effect_conclusion)
+
+    equiv_conclusion = f"Equivalence testing suggests that the groups are {equivalence_conclusion}. ({ci_level} CI for mean difference: [{ci_lower:.4f}, {ci_upper:.4f}], equivalence bounds: [-{epsilon:.1f}, {epsilon:.1f}])"
+    report.line(equiv_conclusion)
+
+    report.heading("Interpretation:")
+
+    if t_test.pvalue >= alpha and equivalence_conclusion == "equivalent":
+        interpretation = "The data strongly supports the claim that there is no significant difference in English proficiency between Indian and foreign students based on country of origin."
+    elif t_test.pvalue >= alpha and equivalence_conclusion != "equivalent":
+        interpretation = "While we cannot reject the null hypothesis of no difference, we also cannot confidently claim equivalence. More data may be needed."
+    elif t_test.pvalue < alpha and effect_size_class in ["negligible", "small"]:
+        interpretation = f"Although a statistically significant difference was detected, the effect size is {effect_size_class}, suggesting that the practical importance of this difference may be limited."
+    else:
+        interpretation = "There appears to be a meaningful difference in English proficiency between the groups, with foreign students scoring higher on average."
+    report.line(interpretation)
+
+    # Add skill-specific insights
+    report.heading("Skill-specific insights:")
+    if skill_tests.loc[speaking_column, 'pvalue'] < alpha:
+        report.line("- Speaking is the only skill area showing a statistically significant difference between the groups.")
+        report.line("  Foreign students report higher fluency and confidence in spoken communication.")
+
+    # Add educational level insights
+    if 'Postgraduate' in level_tests.index and level_tests.loc['Postgraduate', 'pvalue'] < alpha:
+        report.line("- At the postgraduate level, there is a significant difference in proficiency between Indian and foreign students.")
+        report.line("  This difference is not observed at the undergraduate level.")
+
+    # Final recommendations
+    report.heading("Recommendations for future research:")
+    report.line("1. Focus on speaking skills development, as this is the area with the most apparent differences")
+    report.line("2. Investigate the reasons for postgraduate-level differences in proficiency")
+    report.line("3. Consider controlling for years of English study and educational background in future analyses")
+    report.line("4. Examine differences by specific country of origin rather than just 'Indian' vs. 'Foreign'")
+
+    return report
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        scorer = make_scorer(args)
+    except ValueError as e:
+        parser.error(str(e))
+    cache = None if args.no_cache else ResultCache(args.cache_dir, args.cache_size * 1024 * 1024)
+    profiler = Profiler(deep=args.profile_deep)
+
+    if args.append:
+        # Only rows not ingested before are read; the data key covers every source so far
+        print("Appending new responses...")
+        with profiler.stage('append') as record:
+            try:
+                state = append_responses(args.append, args.state, args.chunksize, scorer)
+            except ValueError as e:
+                parser.error(str(e))
+            summaries = state['summaries']
+            record['rows'] = summaries.source_shape[0]
+        data_key = dataset_key(None, scorer, digests=[source['digest'] for source in state['sources']])
+        print(f"\nSummaries of {summaries.source_shape[0]} responses saved to '{args.state}'")
+    else:
+        data_key = dataset_key(args.input, scorer)
+        print("Loading data...")
+        summaries = load_summaries(args, cache, data_key, profiler)
+        print(f"\nProcessed data saved to '{args.processed}'")
+    # Written on every run (including --append), so the plots always match the report
+    write_histograms(summaries, args.histograms)
+    results = run_stages(summaries, args, cache, data_key, profiler)
+    if cache is not None:
+        print(f"\nCached stages reused: {', '.join(cache.hits) or 'none'}")
+
+    # The report is built in memory, echoed to stdout as it grows and written once at the end
+    output_file = args.output or 'proficiency_analysis_results' + REPORT_FORMATS[args.format]
+    with profiler.stage('report', rows=summaries.row_count()):
+        report = build_report(summaries, results, args)
+        report.save(output_file, args.format)
+    print(f"\nDetailed analysis has been saved to '{output_file}'")
+    profiler.save(args.profile, args.trace)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from schema import group_column, level_column
+from summaries import histogram_quantile
+
+# Normality and equal-variance checks for every group and metric in one call.
+#
+# Everything is computed from the count cube of a GroupedSummaries, so the
+# checks reuse the histograms the rest of the analysis already built. Groups
+# up to max_shapiro_n responses get Shapiro-Wilk, as before; SciPy only
+# vouches for its p-value up to n=5000 and its cost grows with n, so larger
+# groups get D'Agostino-Pearson K^2, whose skewness and kurtosis come from
+# the histogram moments for every cell at once. Homogeneity of variance is
+# Brown-Forsythe (Levene centred on the median), with the medians read off
+# the cumulative counts.
+
+MAX_SHAPIRO_N = 5000
+
+# Test used for one group's normality check: 'shapiro', 'dagostino' or None (too few values)
+NormalityResult = namedtuple('NormalityResult', ['test', 'statistic', 'pvalue'])
+
+# Report wording for each normality test: (name, statistic symbol)
+NORMALITY_TESTS = {
+    'shapiro': ('Shapiro-Wilk', 'W'),
+    'dagostino': ("D'Agostino-Pearson", 'K2'),
+}
+
+
+def _moments(cube, values):
+    # n, mean and biased central moments 2-4 of every histogram along the last axis
+    n = cube.sum(axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = (cube @ values) / n
+        deviations = values - mean[..., None]
+        m2, m3, m4 = ((cube * deviations ** k).sum(axis=-1) / n for k in (2, 3, 4))
+    return n, mean, m2, m3, m4
+
+
+def dagostino(n, skewness, kurtosis):
+    """D'Agostino-Pearson K^2 and p-value from sample skewness and (Pearson) kurtosis arrays.
+
+    Same transforms as scipy.stats.normaltest, which needs the raw sample.
+    """
+    from scipy import stats
+    n, g1, b2 = (np.asarray(v, dtype='float64') for v in (n, skewness, kurtosis))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Skewness test
+        y = g1 * np.sqrt((n + 1) * (n + 3) / (6.0 * (n - 2)))
+        beta2 = 3.0 * (n ** 2 + 27 * n - 70) * (n + 1) * (n + 3) / ((n - 2.0) * (n + 5) * (n + 7) * (n + 9))
+        w2 = -1 + np.sqrt(2 * (beta2 - 1))
+        delta = 1 / np.sqrt(0.5 * np.log(w2))
+        alpha = np.sqrt(2.0 / (w2 - 1))
+        y = np.where(y == 0, 1, y)
+        z_skew = delta * np.log(y / alpha + np.sqrt((y / alpha) ** 2 + 1))
+
+        # Kurtosis test
+        expected = 3.0 * (n - 1) / (n + 1)
+        var_b2 = 24.0 * n * (n - 2) * (n - 3) / ((n + 1) * (n + 1.0) * (n + 3) * (n + 5))
+        x = (b2 - expected) / np.sqrt(var_b2)
+        sqrt_beta1 = (6.0 * (n * n - 5 * n + 2) / ((n + 7) * (n + 9))
+                      * np.sqrt(6.0 * (n + 3) * (n + 5) / (n * (n - 2) * (n - 3))))
+        a = 6.0 + 8.0 / sqrt_beta1 * (2.0 / sqrt_beta1 + np.sqrt(1 + 4.0 / sqrt_beta1 ** 2))
+        term1 = 1 - 2 / (9.0 * a)
+        denom = 1 + x * np.sqrt(2 / (a - 4.0))
+        term2 = np.sign(denom) * np.where(denom == 0.0, np.nan, ((1 - 2.0 / a) / np.abs(denom)) ** (1 / 3.0))
+        z_kurt = (term1 - term2) / np.sqrt(2 / (9.0 * a))
+
+        statistic = z_skew ** 2 + z_kurt ** 2
+    return statistic, stats.chi2.sf(statistic, 2)
+
+
+def normality_table(summaries, by=(group_column,), metrics=None, alpha=0.05, max_shapiro_n=MAX_SHAPIRO_N):
+    """Normality check for every (by..., metric) cell of a GroupedSummaries.
+
+    Columns: n, skewness, excess kurtosis, the test used, its statistic and
+    p-value, and whether normality holds at alpha. Cells with fewer than 3
+    values are not tested.
+    """
+    from scipy import stats
+    cube, groups, levels, metrics, values = summaries.cube(by, metrics)
+    n, _, m2, m3, m4 = _moments(cube, values)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        skewness = m3 / m2 ** 1.5
+        kurtosis = m4 / m2 ** 2
+    large = (n > max_shapiro_n) & (n >= 20)
+    statistic, pvalue = dagostino(n, skewness, kurtosis)
+    statistic, pvalue = np.where(large, statistic, np.nan), np.where(large, pvalue, np.nan)
+    test = np.where(large, 'dagostino', np.where(n >= 3, 'shapiro', None)).astype(object)
+
+    # The remaining (small) cells are expanded and tested exactly
+    for cell in zip(*np.nonzero(test == 'shapiro')):
+        sample = np.repeat(values, cube[cell].astype('int64'))
+        statistic[cell], pvalue[cell] = stats.shapiro(sample)
+
+    index = pd.MultiIndex.from_product([groups, levels, metrics], names=summaries.keys + ['metric'])
+    table = pd.DataFrame({
+        'n': n.ravel().astype('int64'),
+        'skewness': skewness.ravel(),
+        'kurtosis': kurtosis.ravel() - 3,
+        'test': test.ravel(),
+        'statistic': statistic.ravel(),
+        'pvalue': pvalue.ravel(),
+    }, index=index)
+    table['normal'] = table['pvalue'] > alpha
+    drop = [k for k in summaries.keys if k not in by]
+    return table.droplevel(drop) if drop else table
+
+
+def variance_table(summaries, by=(), metrics=None, alpha=0.05):
+    """Brown-Forsythe test across student types for every (by..., metric) cell.
+
+    by may hold the level of study (per-level checks) or be empty (overall).
+    Student types with no values in a cell are left out of its test.
+    """
+    from scipy import stats
+    by = [group_column] + [k for k in by if k != group_column]
+    cube, _, levels, metrics, values = summaries.cube(by, metrics)
+    n = cube.sum(axis=-1)
+    median = histogram_quantile(cube, values, 0.5)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z = np.abs(values - median[..., None])
+        z_mean = (cube * z).sum(axis=-1) / n
+        present = n > 0
+        within = np.where(cube > 0, cube * (z - z_mean[..., None]) ** 2, 0).sum(axis=-1).sum(axis=0)
+        k = present.sum(axis=0)
+        total = n.sum(axis=0)
+        grand = np.where(present, z_mean * n, 0).sum(axis=0) / total
+        between = np.where(present, n * (z_mean - grand) ** 2, 0).sum(axis=0)
+        statistic = (total - k) / (k - 1) * between / within
+        pvalue = stats.f.sf(statistic, k - 1, total - k)
+
+    index = pd.MultiIndex.from_product([levels, metrics], names=[level_column, 'metric'])
+    table = pd.DataFrame({
+        'groups': k.ravel().astype('int64'),
+        'n': total.ravel().astype('int64'),
+        'statistic': statistic.ravel(),
+        'pvalue': pvalue.ravel(),
+    }, index=index)
+    table['equal_variance'] = table['pvalue'] > alpha
+    return table if level_column in by else table.droplevel(level_column)
+
+
+def check_assumptions(summaries, by=(), metrics=None, alpha=0.05, max_shapiro_n=MAX_SHAPIRO_N):
+    """Normality per (student type, by..., metric) and equal variance per (by..., metric), in one call."""
+    by = [k for k in by if k != group_column]
+    return {
+        'normality': normality_table(summaries, [group_column] + by, metrics, alpha, max_shapiro_n),
+        'variance': variance_table(summaries, by, metrics, alpha),
+    }
@@ -0,0 +1,286 @@
+from abc import ABC, abstractmethod
+
+import pandas as pd
+
+from ingest import DEFAULT_CHUNKSIZE, load_frame, source_width, stream_summaries
+from intermediate import _format as processed_format
+from intermediate import write_processed
+from readers import detect_format, known_columns, match_columns, na_strings, read_header, read_raw
+from schema import analysis_columns, group_column, key_columns, level_column, score_column, skill_columns, skill_mapping
+from scoring import SkillScorer
+from summaries import GroupedSummaries
+
+# Execution backends for steps 1-4: read, clean, score and group the exports.
+#
+# Every statistic in the report comes from the GroupedSummaries histograms,
+# so a backend only has to produce those. 'pandas' is the reference: the
+# readers in readers.py and clean_and_score, in memory or chunk by chunk.
+# 'duckdb' and 'polars' run the same cleaning and grouping as one lazy,
+# multi-threaded query over the files on disk: only the key and skill
+# columns are read (projection pushdown), rows with a missing key are
+# dropped in the scan (predicate pushdown), and the query returns one row
+# per distinct (student type, level, four skill labels) with its count.
+# That table has at most a few thousand rows whatever the number of
+# responses; its labels are parsed and scored with the same pandas code as
+# the reference, so every number in the report is identical (parity.py
+# checks this).
+#
+# duckdb and polars are optional; each is imported when its backend is used.
+# Workbooks have no lazy scanner in either engine and are read with the
+# pandas readers before being handed to the query.
+
+POSITION_STRIDE = 10 ** 12      # first positions are file index * stride + row within the file
+
+
+def _paths(paths):
+    return [paths] if isinstance(paths, str) else list(paths)
+
+
+def _raw_names(path, columns):
+    # Raw header of each canonical column in columns
+    headers = read_header(path)
+    raw = {name: header for header, name in zip(headers, match_columns(headers, known_columns)) if name}
+    missing = [col for col in columns if col not in raw]
+    if missing:
+        raise ValueError(f"{path!r} has no column(s) {', '.join(map(repr, missing))}")
+    return [raw[col] for col in columns]
+
+
+def _workbook_frame(path, columns):
+    # A workbook's columns as text (None for blanks), ready to hand to a query engine
+    frame = read_raw(path, columns)[columns]
+    return pd.DataFrame({col: frame[col].astype('object').map(str, na_action='ignore') for col in columns})
+
+
+def summaries_from_combinations(combinations, source_shape, scorer=None):
+    """GroupedSummaries from distinct (group, level, skill labels) rows with 'count' and 'first' columns.
+
+    The rows are ordered by first appearance, so levels come out in file
+    order, then parsed and scored exactly as clean_and_score does.
+    """
+    combinations = combinations.sort_values('first', kind='stable').reset_index(drop=True)
+    counts = combinations['count'].to_numpy()
+    frame = combinations[[group_column, level_column]].astype('category')
+    frame[skill_columns] = combinations[skill_columns]
+    unmapped = (scorer or SkillScorer()).apply(frame, counts)
+    summaries = GroupedSummaries()
+    summaries.add(frame, weights=counts)
+    summaries.add_unmapped(unmapped)
+    summaries.source_shape = source_shape
+    return summaries
+
+
+class PandasBackend:
+    """Reference backend: the pandas readers and clean_and_score, in memory or chunk by chunk."""
+
+    name = 'pandas'
+
+    def summarize(self, paths, stream=False, chunksize=DEFAULT_CHUNKSIZE, processed_file=None, workers=1,
+                  scorer=None):
+        if stream:
+            return stream_summaries(paths, chunksize, processed_file, scorer)
+        raw_shape, df, unmapped = load_frame(paths, workers, scorer)
+        if processed_file is not None:
+            write_processed(df, processed_file)
+        summaries = GroupedSummaries.from_frame(df, raw_shape)
+        summaries.add_unmapped(unmapped)
+        return summaries
+
+
+class QueryBackend(ABC):
+    """Shared driver of the lazy backends; subclasses build the scans and run the queries.
+
+    stream and chunksize do not apply: the engine decides how much to hold in
+    memory. The processed file, if asked for, is written by the engine with the
+    columns of --stream mode (keys, skill ratings, student type and score).
+    """
+
+    name = None
+
+    def summarize(self, paths, stream=False, chunksize=DEFAULT_CHUNKSIZE, processed_file=None, workers=1,
+                  scorer=None):
+        paths = _paths(paths)
+        scorer = scorer or SkillScorer()
+        combinations, n_rows = self.aggregate(paths)
+        if processed_file is not None:
+            self.write_processed(paths, processed_file, scorer)
+        return summaries_from_combinations(combinations, (n_rows, source_width(paths)), scorer)
+
+    @abstractmethod
+    def aggregate(self, paths):
+        """(distinct-combination frame, number of raw rows) for the exports."""
+
+    @abstractmethod
+    def write_processed(self, paths, path, scorer):
+        """Write the scored rows of the exports to the processed file at path."""
+
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _literal(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _sql_skill(column):
+    # Skill label -> 1-5 as SkillScorer does it: trimmed, case-insensitive, anything else NULL
+    cases = ' '.join(f"WHEN {_literal(label.lower())} THEN {score}" for label, score in skill_mapping.items())
+    normalized = f"lower(regexp_replace({_quote(column)}, '^\\s+|\\s+$', '', 'g'))"
+    return f"CAST(CASE {normalized} {cases} END AS TINYINT)"
+
+
+class DuckDBBackend(QueryBackend):
+    """DuckDB query over the exports (CSV and Parquet scanned lazily)."""
+
+    name = 'duckdb'
+
+    def __init__(self):
+        import duckdb
+        self._connection = duckdb.connect()
+
+    def _source(self, path, index, columns):
+        # SELECT of the canonical columns (as text) of one export, keys filtered in the scan
+        fmt = detect_format(path)
+        if fmt == 'csv':
+            nulls = ', '.join(_literal(value) for value in sorted(na_strings))
+            scan = f"read_csv({_literal(path)}, header=true, all_varchar=true, nullstr=[{nulls}])"
+        elif fmt == 'parquet':
+            scan = f"read_parquet({_literal(path)})"
+        else:
+            view = f"workbook_{index}"
+            self._connection.register(view, _workbook_frame(path, columns))
+            scan = _quote(view)
+        raw = _raw_names(path, columns) if fmt != 'xlsx' else columns
+        select = ', '.join(f"CAST({_quote(r)} AS VARCHAR) AS {_quote(c)}" for r, c in zip(raw, columns))
+        return f"SELECT {select} FROM {scan}"
+
+    def _cleaned(self, paths):
+        # Rows with every key present, the student type and the position of the row
+        sources = ' UNION ALL '.join(
+            f"SELECT *, {i} * {POSITION_STRIDE} + row_number() OVER () AS position "
+            f"FROM ({self._source(path, i, analysis_columns)}) "
+            f"WHERE {' AND '.join(f'{_quote(key)} IS NOT NULL' for key in key_columns)}"
+            for i, path in enumerate(paths))
+        return (f"SELECT *, CASE WHEN {_quote('Nationality')} = 'Indian' THEN 'Indian' ELSE 'Foreign' END "
+                f"AS {_quote(group_column)} FROM ({sources})")
+
+    def aggregate(self, paths):
+        keys = ', '.join(_quote(c) for c in [group_column, level_column] + skill_columns)
+        combinations = self._connection.execute(
+            f"SELECT {keys}, count(*) AS count, min(position) AS first FROM ({self._cleaned(paths)}) "
+            f"GROUP BY {keys}").df()
+        n_rows = sum(self._connection.execute(f"SELECT count(*) FROM ({self._source(path, i, [key_columns[0]])})")
+                     .fetchone()[0] for i, path in enumerate(paths))
+        return combinations, n_rows
+
+    def write_processed(self, paths, path, scorer):
+        # The score as SkillScorer.score computes it: weighted mean of the rated skills
+        skills = [f"{_sql_skill(col)} AS {_quote(col)}" for col in skill_columns]
+        columns = [_quote(col) for col in key_columns] + skills + [_quote(group_column)]
+        rated = ' + '.join(f"({_quote(col)} IS NOT NULL)::INTEGER" for col in skill_columns)
+        weights = [float(w) for w in scorer.weights]
+        total = ' + '.join(f"{w!r} * coalesce({_quote(col)}, 0)" for col, w in zip(skill_columns, weights))
+        weight = ' + '.join(f"{w!r} * ({_quote(col)} IS NOT NULL)::INTEGER" for col, w in zip(skill_columns, weights))
+        score = (f"CASE WHEN {rated} >= {scorer.min_answered} THEN CAST(({total}) / nullif({weight}, 0) AS FLOAT) "
+                 f"END AS {_quote(score_column)}")
+        rated_rows = f"SELECT {', '.join(columns)}, position FROM ({self._cleaned(paths)})"
+        query = f"SELECT * EXCLUDE (position), {score} FROM ({rated_rows}) ORDER BY position"
+        fmt = processed_format(path)
+        if fmt == 'arrow':
+            import pyarrow as pa
+            reader = self._connection.execute(query).fetch_record_batch()
+            with pa.ipc.new_file(path, reader.schema) as writer:
+                for batch in reader:
+                    writer.write_batch(batch)
+        else:
+            options = 'FORMAT parquet' if fmt == 'parquet' else 'FORMAT csv, HEADER true'
+            self._connection.execute(f"COPY ({query}) TO {_literal(path)} ({options})")
+
+
+class PolarsBackend(QueryBackend):
+    """Polars lazy query over the exports (CSV and Parquet scanned lazily)."""
+
+    name = 'polars'
+
+    def __init__(self):
+        import polars
+        self._pl = polars
+
+    def _collect(self, frame):
+        try:
+            return frame.collect(engine='streaming')
+        except TypeError:
+            # Polars releases before the engine argument
+            return frame.collect(streaming=True)
+
+    def _source(self, path, columns):
+        pl = self._pl
+        fmt = detect_format(path)
+        if fmt == 'csv':
+            scan = pl.scan_csv(path, infer_schema=False, null_values=sorted(na_strings))
+        elif fmt == 'parquet':
+            scan = pl.scan_parquet(path)
+        else:
+            return pl.from_pandas(_workbook_frame(path, columns)).lazy()
+        return scan.select([pl.col(raw).cast(pl.String).alias(col)
+                            for raw, col in zip(_raw_names(path, columns), columns)])
+
+    def _cleaned(self, paths):
+        pl = self._pl
+        frames = [self._source(path, analysis_columns)
+                  .filter(pl.all_horizontal([pl.col(key).is_not_null() for key in key_columns]))
+                  .with_row_index('position', offset=0)
+                  .with_columns(pl.col('position').cast(pl.Int64) + i * POSITION_STRIDE)
+                  for i, path in enumerate(paths)]
+        return pl.concat(frames).with_columns(
+            pl.when(pl.col('Nationality') == 'Indian').then(pl.lit('Indian')).otherwise(pl.lit('Foreign'))
+            .alias(group_column))
+
+    def aggregate(self, paths):
+        pl = self._pl
+        keys = [group_column, level_column] + skill_columns
+        combinations = self._collect(self._cleaned(paths).group_by(keys).agg(
+            pl.len().alias('count'), pl.col('position').min().alias('first'))).to_pandas()
+        n_rows = sum(self._collect(self._source(path, [key_columns[0]]).select(pl.len())).item() for path in paths)
+        return combinations, n_rows
+
+    def write_processed(self, paths, path, scorer):
+        pl = self._pl
+        lookup = {label.lower(): score for label, score in skill_mapping.items()}
+        skills = [pl.col(col).str.strip_chars().str.to_lowercase()
+                  .replace_strict(lookup, default=None, return_dtype=pl.Int8).alias(col) for col in skill_columns]
+        # The score as SkillScorer.score computes it: weighted mean of the rated skills
+        rated = [pl.col(col).is_not_null() for col in skill_columns]
+        weights = [float(w) for w in scorer.weights]
+        total = pl.sum_horizontal([w * pl.col(col).fill_null(0) for col, w in zip(skill_columns, weights)])
+        weight = pl.sum_horizontal([w * r.cast(pl.Float64) for r, w in zip(rated, weights)])
+        score = (pl.when(pl.sum_horizontal(rated) >= scorer.min_answered).then(total / weight)
+                 .otherwise(None).cast(pl.Float32).alias(score_column))
+        frame = (self._cleaned(paths).sort('position')
+                 .select([pl.col(col) for col in key_columns] + skills + [pl.col(group_column)])
+                 .with_columns(score))
+        fmt = processed_format(path)
+        if fmt == 'parquet':
+            frame.sink_parquet(path)
+        elif fmt == 'arrow':
+            frame.sink_ipc(path)
+        else:
+            frame.sink_csv(path)
+
+
+BACKENDS = {
+    'pandas': PandasBackend,
+    'duckdb': DuckDBBackend,
+    'polars': PolarsBackend,
+}
+
+
+def get_backend(name='pandas'):
+    """A backend by name; ImportError names the package an optional backend needs."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend: {name!r} (expected one of {', '.join(BACKENDS)})")
+    try:
+        return BACKENDS[name]()
+    except ImportError as e:
+        raise ImportError(f"The {name} backend needs the {name} package (pip install {name})") from e
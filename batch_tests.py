@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+from schema import group_column
+
+# Vectorized two-sample comparisons: one call tests every metric / subgroup
+# instead of one scipy call (and one hand-rolled pooled SD) per comparison.
+
+
+def adjust_pvalues(pvalues, method='holm'):
+    """Multiple-comparison adjusted p-values ('holm' or 'bh'); NaNs are left out."""
+    p = np.asarray(pvalues, dtype='float64')
+    adjusted = np.full_like(p, np.nan)
+    valid = ~np.isnan(p)
+    m = int(valid.sum())
+    if m == 0:
+        return adjusted
+    order = np.argsort(p[valid])
+    ranked = p[valid][order]
+    if method == 'holm':
+        # Step-down: p_(i) * (m - i + 1), made monotone
+        stepped = np.maximum.accumulate(ranked * (m - np.arange(m)))
+    elif method == 'bh':
+        # Benjamini-Hochberg step-up: p_(i) * m / i, made monotone from the top
+        stepped = np.minimum.accumulate((ranked * m / np.arange(1, m + 1))[::-1])[::-1]
+    else:
+        raise ValueError(f"Unknown correction method: {method!r} (expected 'holm' or 'bh')")
+    result = np.empty(m)
+    result[order] = np.minimum(stepped, 1.0)
+    adjusted[valid] = result
+    return adjusted
+
+
+def ttest_from_stats(mean1, var1, n1, mean2, var2, n2, equal_var=True, confidence=0.95,
+                     correction=None, alpha=0.05, index=None):
+    """Independent-samples t-tests for arrays of group moments.
+
+    Returns one row per comparison with the t statistic, degrees of freedom,
+    two-sided p-value, Cohen's d (pooled SD, signed as mean1 - mean2) and a
+    confidence interval for the mean difference. With correction='holm' or
+    'bh' the adjusted p-values and reject decisions at alpha are added.
+    """
+    from scipy import stats
+    mean1, var1, n1, mean2, var2, n2 = (np.asarray(v, dtype='float64') for v in (mean1, var1, n1, mean2, var2, n2))
+    diff = mean1 - mean2
+    with np.errstate(invalid='ignore', divide='ignore'):
+        pooled_var = ((n1 - 1) * var1 + (n2 - 1) * var2) / (n1 + n2 - 2)
+        if equal_var:
+            dof = n1 + n2 - 2
+            se = np.sqrt(pooled_var * (1 / n1 + 1 / n2))
+        else:
+            v1, v2 = var1 / n1, var2 / n2
+            dof = (v1 + v2) ** 2 / (v1 ** 2 / (n1 - 1) + v2 ** 2 / (n2 - 1))
+            se = np.sqrt(v1 + v2)
+        t = diff / se
+        margin = stats.t.ppf(0.5 + confidence / 2, dof) * se
+        result = pd.DataFrame({
+            'n1': n1, 'n2': n2,
+            'mean1': mean1, 'mean2': mean2,
+            'mean_diff': diff,
+            't': t,
+            'df': dof,
+            'pvalue': 2 * stats.t.sf(np.abs(t), dof),
+            'cohen_d': diff / np.sqrt(pooled_var),
+            'ci_lower': diff - margin,
+            'ci_upper': diff + margin,
+        }, index=index)
+    if correction is not None:
+        result['p_adjusted'] = adjust_pvalues(result['pvalue'], correction)
+        result['reject'] = result['p_adjusted'] < alpha
+    return result
+
+
+def ttest_matrix(a, b, equal_var=True, confidence=0.95, correction=None, alpha=0.05, columns=None):
+    """Column-wise t-tests between two 2-D arrays (observations x metrics), ignoring NaNs."""
+    a = np.asarray(a, dtype='float64')
+    b = np.asarray(b, dtype='float64')
+    with np.errstate(invalid='ignore', divide='ignore'):
+        moments = [(np.nanmean(x, axis=0), np.nanvar(x, axis=0, ddof=1), (~np.isnan(x)).sum(axis=0)) for x in (a, b)]
+    (m1, v1, n1), (m2, v2, n2) = moments
+    return ttest_from_stats(m1, v1, n1, m2, v2, n2, equal_var=equal_var, confidence=confidence,
+                            correction=correction, alpha=alpha, index=columns)
+
+
+def compare_groups(table, group1='Indian', group2='Foreign', equal_var=True, confidence=0.95,
+                   correction=None, alpha=0.05):
+    """Test group1 against group2 for every remaining cell of a GroupedSummaries.table()."""
+    first = table.xs(group1, level=group_column)
+    second = table.xs(group2, level=group_column).reindex(first.index)
+    return ttest_from_stats(first['mean'], first['var'], first['n'],
+                            second['mean'], second['var'], second['n'],
+                            equal_var=equal_var, confidence=confidence,
+                            correction=correction, alpha=alpha, index=first.index)
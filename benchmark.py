@@ -0,0 +1,224 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from synthetic import write_export
+
+# Scaling benchmarks on synthetic cohorts.
+#
+# Each case (responses x levels of study x export format) is generated once
+# into the data directory and then analysed, and optionally plotted, in a
+# fresh process with --profile. A fresh process per run keeps the peak RSS
+# that case's own rather than the maximum of everything run before it. The
+# stage records of every run are appended to the results file together with
+# the commit they ran against, so --compare can line up two commits stage by
+# stage and flag regressions.
+
+DEFAULT_RESULTS_FILE = 'benchmark_results.jsonl'
+DEFAULT_DATA_DIR = os.path.join('.cache', 'synthetic')
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def git_revision():
+    """(short commit hash, whether the working tree has uncommitted changes); (None, False) outside git."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=HERE,
+                                capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, False
+    return commit, bool(status.strip())
+
+
+def cohort_path(data_dir, rows, levels, universities, fmt, seed):
+    return os.path.join(data_dir, f"cohort_{rows}_{levels}l_{universities}u_s{seed}.{fmt}")
+
+
+def ensure_cohort(data_dir, rows, levels, universities, fmt, seed):
+    # Generated cohorts depend only on their parameters, so they are reused between runs and commits
+    path = cohort_path(data_dir, rows, levels, universities, fmt, seed)
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        write_export(path, rows, seed, n_universities=universities, n_levels=levels)
+    return path
+
+
+def _read_records(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _run(command, cwd):
+    # The script's own error output goes into the exception, so a failed case says why
+    result = subprocess.run(command, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if result.returncode:
+        raise RuntimeError(f"{os.path.basename(command[1])} exited with status {result.returncode}:\n"
+                           f"{result.stderr.strip()}")
+
+
+def run_case(path, rows, stream=False, resamples=1000, plots=False, workers=1, backend='pandas'):
+    """Analyse (and plot) one cohort in fresh processes; returns the run's measurements."""
+    with tempfile.TemporaryDirectory() as workdir:
+        profile = os.path.join(workdir, 'profile.jsonl')
+        processed = os.path.join(workdir, 'processed.parquet')
+        histograms = os.path.join(workdir, 'histograms.parquet')
+        command = [sys.executable, os.path.join(HERE, 'analyze_proficiency.py'), '--input', os.path.abspath(path),
+                   '--no-cache', '--resamples', str(resamples), '--workers', str(workers),
+                   '--output', os.path.join(workdir, 'report.txt'), '--processed', processed,
+                   '--histograms', histograms, '--profile', profile, '--backend', backend]
+        if stream:
+            command.append('--stream')
+        start = time.perf_counter()
+        _run(command, workdir)
+        analysis_s = time.perf_counter() - start
+        plots_s = None
+        if plots:
+            start = time.perf_counter()
+            _run([sys.executable, os.path.join(HERE, 'create_visualizations.py'), '--histograms', histograms,
+                  '--plots-dir', os.path.join(workdir, 'plots'), '--force', '--profile', profile], workdir)
+            plots_s = time.perf_counter() - start
+        records = _read_records(profile)
+    # Process wall time includes interpreter start-up and imports; the stages do not
+    return {
+        'wall_s': analysis_s,
+        'plots_wall_s': plots_s,
+        'rows_per_s': rows / analysis_s,
+        'peak_rss_mb': max((r['process_peak_rss_mb'] or 0 for r in records), default=None),
+        'stages': [{k: r.get(k) for k in ('stage', 'wall_s', 'cpu_s', 'process_peak_rss_mb', 'peak_rss_growth_mb',
+                                          'rows', 'pid')}
+                   for r in records],
+    }
+
+
+def run_benchmarks(args):
+    commit, dirty = git_revision()
+    environment = {'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+                   'machine': platform.machine(), 'cpus': os.cpu_count()}
+    for fmt in args.formats:
+        for levels in args.levels:
+            for rows in (int(size) for size in args.sizes):
+                path = ensure_cohort(args.data_dir, rows, levels, args.universities, fmt, args.seed)
+                case = {'rows': rows, 'levels': levels, 'universities': args.universities, 'format': fmt,
+                        'stream': args.stream, 'resamples': args.resamples, 'plots': args.plots,
+                        'workers': args.workers, 'backend': args.backend}
+                for repeat in range(args.repeat):
+                    result = run_case(path, rows, args.stream, args.resamples, args.plots, args.workers,
+                                      args.backend)
+                    record = {'commit': commit, 'dirty': dirty, 'timestamp': time.time(), 'case': case,
+                              'repeat': repeat, 'environment': environment, **result}
+                    with open(args.results, 'a') as f:
+                        f.write(json.dumps(record) + '\n')
+                    print(f"{_case_label(case)}: {result['wall_s']:.2f} s, {result['rows_per_s']:,.0f} rows/s, "
+                          f"peak RSS {result['peak_rss_mb']:.0f} MB")
+
+
+def _case_label(case):
+    label = f"{case['rows']:>11,} rows, {case['levels']} levels, {case['format']}"
+    label += f", {case['backend']}" if case.get('backend', 'pandas') != 'pandas' else ''
+    return label + (', stream' if case['stream'] else '')
+
+
+def _case_key(case):
+    # Records from before the backend option ran on pandas
+    return json.dumps({'backend': 'pandas', **case}, sort_keys=True)
+
+
+def _stage_times(records):
+    # Median wall time per stage (and for the whole run) over repeats; figure stages are summed per run
+    per_stage = {}
+    for record in records:
+        totals = {'total': record['wall_s']}
+        for stage in record['stages']:
+            totals[stage['stage']] = totals.get(stage['stage'], 0.0) + stage['wall_s']
+        for name, seconds in totals.items():
+            per_stage.setdefault(name, []).append(seconds)
+    return {name: statistics.median(values) for name, values in per_stage.items()}
+
+
+def compare(results_file, base=None, head=None, threshold=1.1, min_delta=0.01):
+    """Print stage-by-stage median times of two commits for every case both have run; returns the regressions."""
+    records = _read_records(results_file)
+    commits = list(dict.fromkeys(r['commit'] for r in records))
+    if head is None:
+        current = git_revision()[0]
+        head = current if current in commits else (commits[-1] if commits else None)
+    if base is None:
+        earlier = [c for c in commits if c != head]
+        base = earlier[-1] if earlier else None
+    if base is None or head is None:
+        raise ValueError(f"Need results for two commits in {results_file!r} to compare (have: {commits})")
+
+    by_case = {}
+    for record in records:
+        if record['commit'] in (base, head):
+            by_case.setdefault(_case_key(record['case']), {}).setdefault(record['commit'], []).append(record)
+
+    print(f"Stage times, {base} -> {head} (median seconds over repeats)")
+    regressions = []
+    for key, runs in by_case.items():
+        if base not in runs or head not in runs:
+            continue
+        print(f"\n{_case_label(json.loads(key))}")
+        before, after = _stage_times(runs[base]), _stage_times(runs[head])
+        for stage in [s for s in after if s in before]:
+            ratio = after[stage] / before[stage] if before[stage] > 0 else float('inf')
+            flag = ''
+            # Stages of a few milliseconds are too noisy to judge by ratio alone
+            if ratio > threshold and after[stage] - before[stage] > min_delta:
+                flag = '  REGRESSION'
+                regressions.append((json.loads(key), stage, ratio))
+            print(f"  {stage:<32} {before[stage]:>10.4f} {after[stage]:>10.4f} {ratio:>7.2f}x{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the analysis on synthetic cohorts of growing size.')
+    parser.add_argument('--sizes', type=float, nargs='+', default=[1e3, 1e4, 1e5],
+                        help='Responses per cohort (default: 1e3 1e4 1e5)')
+    parser.add_argument('--levels', type=int, nargs='+', default=[2],
+                        help='Levels of study per cohort, for sweeps over group counts (default: 2)')
+    parser.add_argument('--universities', type=int, default=6, help='Institutions per cohort (default: 6)')
+    parser.add_argument('--formats', nargs='+', choices=['csv', 'parquet', 'xlsx'], default=['csv'],
+                        help='Export formats to read (default: csv)')
+    parser.add_argument('--stream', action='store_true', help='Analyse in --stream mode')
+    parser.add_argument('--resamples', type=int, default=1000,
+                        help='Bootstrap resamples and permutations per run (default: 1000)')
+    parser.add_argument('--workers', type=int, default=1, help='--workers for the analysis (default: 1)')
+    parser.add_argument('--backend', default='pandas', help='--backend for the analysis (default: pandas)')
+    parser.add_argument('--plots', action='store_true', help='Also time create_visualizations.py')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per case (default: 1)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the synthetic cohorts (default: 0)')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR,
+                        help=f'Where generated cohorts are kept (default: {DEFAULT_DATA_DIR})')
+    parser.add_argument('--results', default=DEFAULT_RESULTS_FILE,
+                        help=f'JSON-lines file the runs are appended to (default: {DEFAULT_RESULTS_FILE})')
+    parser.add_argument('--compare', nargs='?', const='', default=None, metavar='BASE',
+                        help='Instead of running, compare the stored results of the current commit with BASE '
+                             '(default: the last other commit with results)')
+    parser.add_argument('--threshold', type=float, default=1.1,
+                        help='Slow-down ratio reported as a regression (default: %(default)s)')
+    parser.add_argument('--min-delta', type=float, default=0.01,
+                        help='Seconds a stage must also slow down by to count as a regression (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    if args.compare is not None:
+        regressions = compare(args.results, args.compare or None, threshold=args.threshold,
+                              min_delta=args.min_delta)
+        sys.exit(1 if regressions else 0)
+    run_benchmarks(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+import functools
+import hashlib
+import importlib
+import inspect
+import json
+import os
+import pickle
+import threading
+
+# Content-addressed, on-disk cache for pipeline stage results.
+#
+# A stage's key is a hash of its name, the keys of the stages it depends on
+# and its own parameters, so changing e.g. epsilon only invalidates the
+# stages that read it. Entries are pickles named by their key; the least
+# recently used ones are evicted once the directory exceeds max_bytes.
+
+# Part of every key: bump it when the layout of cached values changes (the source
+# of the analysis modules is hashed into the keys as well, see code_digest)
+CACHE_VERSION = 1
+
+DEFAULT_CACHE_DIR = os.path.join('.cache', 'analysis')
+DEFAULT_CACHE_SIZE = 256 * 1024 * 1024
+
+
+def file_digest(path, limit=None, block_size=1 << 20):
+    # sha256 of the file, or of its first limit bytes
+    digest = hashlib.sha256()
+    remaining = limit
+    with open(path, 'rb') as f:
+        while remaining is None or remaining > 0:
+            block = f.read(block_size if remaining is None else min(block_size, remaining))
+            if not block:
+                break
+            digest.update(block)
+            if remaining is not None:
+                remaining -= len(block)
+    return digest.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def code_digest(*modules):
+    """sha256 of the source of the named modules, so results computed by older code are not reused."""
+    digest = hashlib.sha256()
+    for name in modules:
+        digest.update(inspect.getsource(importlib.import_module(name)).encode())
+    return digest.hexdigest()
+
+
+def make_key(*parts):
+    """Stable hash of JSON-serialisable parts (dicts are key-sorted)."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_CACHE_SIZE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = []
+        self.misses = []
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.pkl')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None, False
+        # Touch the entry so eviction treats it as recently used
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return value, True
+
+    def put(self, key, value):
+        path = self._path(key)
+        # Unique temp name, so concurrent writers of one key never share a file
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        self.evict()
+
+    def evict(self):
+        # Entries may vanish under another process evicting at the same time
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.pkl'):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def stage(self, name, key, compute, valid=None):
+        """Return the cached result for (name, key), computing and storing it on a miss.
+
+        valid, if given, is called on a cached value; a false result counts as a miss.
+        """
+        value, hit = self.get(key)
+        if hit and (valid is None or valid(value)):
+            self.hits.append(name)
+            return value
+        self.misses.append(name)
+        value = compute()
+        self.put(key, value)
+        return value
+
+
+def run_stage(cache, name, key, compute, valid=None):
+    # Stage runner that also works with caching disabled (cache=None)
+    if cache is None:
+        return compute()
+    return cache.stage(name, key, compute, valid)
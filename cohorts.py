@@ -0,0 +1,290 @@
+import argparse
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import analysis
+from assumptions import MAX_SHAPIRO_N
+from ingest import load_frame
+from schema import group_column, level_column, score_column, skill_columns
+from summaries import GroupedSummaries
+
+# Batch mode: the Indian vs Foreign test battery for every cohort at once.
+#
+# The cleaned, scored frame is partitioned by one or more key columns (e.g.
+# 'University Name') and every partition gets the full battery: normality,
+# Levene, t and U tests, ANOVA, Cohen's d, TOST, per-skill and per-level
+# tests. The results come back as one tidy table, one row per
+# (partition, test, target).
+#
+# With several workers the columns the tests read are packed into one
+# float32 matrix in shared memory, sorted so each partition is a contiguous
+# block of rows. Workers attach to it by name and build the group summaries
+# of their partitions from their own slices, so the frame is never pickled
+# to a worker.
+
+DEFAULT_RESULTS_FILE = 'cohort_results.csv'
+
+# Columns of the packed matrix: group code, level code, then the metrics
+metrics = [score_column] + skill_columns
+
+result_columns = ['test', 'target', 'n1', 'n2', 'estimate', 'statistic', 'pvalue', 'p_adjusted',
+                  'ci_lower', 'ci_upper', 'conclusion']
+
+# Set in each worker by _attach
+_shared = {}
+
+
+def _short_skill(skill):
+    return skill.split('(')[0].strip()
+
+
+def normalize_key(values):
+    # Case and spacing variants of one label ('University of lucknow ') count as the same cohort
+    return values.map(lambda v: re.sub(r'\s+', ' ', v).strip().casefold() if isinstance(v, str) else v)
+
+
+def run_battery(summaries, alpha=0.05, epsilon=0.5, min_level_size=5, min_group_size=3, resamples=0, seed=0,
+                max_shapiro_n=MAX_SHAPIRO_N):
+    """The report's tests on one set of group summaries, as tidy result rows."""
+    rows = []
+
+    def add(test, target=None, **values):
+        rows.append({'test': test, 'target': target, **values})
+
+    indian = summaries.summary(group='Indian')
+    foreign = summaries.summary(group='Foreign')
+    n = {'n1': indian.n, 'n2': foreign.n}
+
+    assumptions = analysis.assumption_tests(summaries, alpha, max_shapiro_n)
+    equal_variance = assumptions['equal_variance']
+    for group, summary in (('Indian', indian), ('Foreign', foreign)):
+        normality = assumptions[f'normality_{group.lower()}']
+        add('normality', group, n1=summary.n, statistic=normality.statistic, pvalue=normality.pvalue,
+            conclusion=normality.test)
+    add('levene', **n, statistic=assumptions['levene'].statistic, pvalue=assumptions['levene'].pvalue,
+        conclusion='equal variance' if equal_variance else 'unequal variance')
+
+    hypothesis = analysis.hypothesis_tests(summaries, equal_variance)
+    mean_diff = indian.mean - foreign.mean
+    add('t_test', **n, estimate=mean_diff, statistic=hypothesis['t_test'].statistic,
+        pvalue=hypothesis['t_test'].pvalue)
+    add('u_test', **n, statistic=hypothesis['u_test'].statistic, pvalue=hypothesis['u_test'].pvalue)
+
+    anova_table = analysis.anova(summaries)
+    add('anova', group_column, **n, statistic=anova_table['F'].iloc[0], pvalue=anova_table['PR(>F)'].iloc[0])
+
+    effects = analysis.effect_sizes(summaries)
+    add('cohen_d', **n, estimate=effects['cohen_d'], conclusion=effects['effect_size_class'])
+
+    equivalence = analysis.equivalence(effects, epsilon, alpha)
+    add('tost', **n, estimate=mean_diff, ci_lower=equivalence['ci_lower'], ci_upper=equivalence['ci_upper'],
+        conclusion=equivalence['conclusion'])
+
+    if resamples > 0:
+        resampled = analysis.resampling(summaries, resamples, seed)
+        boot, perm = resampled['bootstrap'], resampled['permutation']
+        add('bootstrap', **n, estimate=boot.mean_diff, ci_lower=boot.mean_diff_ci[0.95][0],
+            ci_upper=boot.mean_diff_ci[0.95][1])
+        add('permutation', **n, estimate=perm.statistic, pvalue=perm.pvalue)
+
+    for skill, r in analysis.skill_tests(summaries, equal_variance, alpha).iterrows():
+        add('skill_t_test', _short_skill(skill), n1=r['n1'], n2=r['n2'], estimate=r['mean_diff'],
+            statistic=r['t'], pvalue=r['pvalue'], p_adjusted=r['p_adjusted'],
+            ci_lower=r['ci_lower'], ci_upper=r['ci_upper'])
+
+    # Levels with too few respondents in either group are left out, as in the report
+    testable = [level for level in summaries.levels
+                if summaries.row_count(level=level) >= min_level_size
+                and summaries.row_count('Indian', level) >= min_group_size
+                and summaries.row_count('Foreign', level) >= min_group_size]
+    if testable:
+        level_tests = analysis.level_tests(summaries, alpha, min_level_size, min_group_size)
+        for level, r in level_tests.iterrows():
+            add('level_t_test', level, n1=r['n1'], n2=r['n2'], estimate=r['mean_diff'],
+                statistic=r['t'], pvalue=r['pvalue'], p_adjusted=r['p_adjusted'],
+                ci_lower=r['ci_lower'], ci_upper=r['ci_upper'])
+        if len(level_tests) > 1:
+            level_anova = analysis.anova_by_level(summaries, list(level_tests.index))
+            for term, r in level_anova.drop('Residual').iterrows():
+                add('level_anova', term, statistic=r['F'], pvalue=r['PR(>F)'])
+    return rows
+
+
+def _partition_rows(key, summaries, min_group_size, params):
+    # Battery rows for one partition; a partition that cannot be tested gets one 'skipped' row
+    n1, n2 = summaries.row_count('Indian'), summaries.row_count('Foreign')
+    if min(n1, n2) < max(min_group_size, 3):
+        rows = [{'test': 'skipped', 'n1': n1, 'n2': n2,
+                 'conclusion': f"needs at least {max(min_group_size, 3)} students of each type"}]
+    else:
+        try:
+            rows = run_battery(summaries, min_group_size=min_group_size, **params)
+        except Exception as e:
+            rows = [{'test': 'error', 'n1': n1, 'n2': n2, 'conclusion': f"{type(e).__name__}: {e}"}]
+    return [{**key, **row} for row in rows]
+
+
+def pack(frame, by):
+    """Sort the rows by partition and pack what the tests read into one float32 matrix.
+
+    Returns (matrix, partition keys, row bounds, group labels, level labels);
+    partition i is matrix[bounds[i]:bounds[i + 1]].
+    """
+    grouped = frame.groupby(by, observed=True, sort=True, dropna=False)
+    codes = grouped.ngroup().to_numpy()
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(grouped.ngroups + 1))
+    # Each partition's key, from its first row
+    keys = frame[by].iloc[order[bounds[:-1]]].to_dict('records')
+
+    group_codes, group_labels = pd.factorize(frame[group_column])
+    level_codes, level_labels = pd.factorize(frame[level_column])
+    matrix = np.empty((len(frame), 2 + len(metrics)), dtype='float32')
+    matrix[:, 0] = group_codes
+    matrix[:, 1] = level_codes
+    for i, metric in enumerate(metrics):
+        matrix[:, 2 + i] = frame[metric].to_numpy(dtype='float32', na_value=np.nan)
+    return matrix[order], keys, bounds, list(group_labels), list(level_labels)
+
+
+def _summaries(block, group_labels, level_labels):
+    frame = pd.DataFrame({
+        group_column: pd.Categorical.from_codes(block[:, 0].astype('int64'), categories=group_labels),
+        level_column: pd.Categorical.from_codes(block[:, 1].astype('int64'), categories=level_labels),
+    })
+    for i, metric in enumerate(metrics):
+        frame[metric] = block[:, 2 + i]
+    return GroupedSummaries.from_frame(frame, (len(block), None))
+
+
+def _attach(name, shape, group_labels, level_labels):
+    # Worker initializer: map the shared matrix, once per process
+    from multiprocessing import shared_memory
+    memory = shared_memory.SharedMemory(name=name)
+    _shared.update(memory=memory, matrix=np.ndarray(shape, dtype='float32', buffer=memory.buf),
+                   groups=group_labels, levels=level_labels)
+
+
+def _fork_context():
+    # Forked workers start with the libraries already imported; the matrix still comes from shared memory
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('fork') if 'fork' in methods else None
+
+
+def _run_partitions(job):
+    partitions, min_group_size, params = job
+    matrix = _shared['matrix']
+    rows = []
+    for key, start, stop in partitions:
+        summaries = _summaries(matrix[start:stop], _shared['groups'], _shared['levels'])
+        rows += _partition_rows(key, summaries, min_group_size, params)
+    return rows
+
+
+def analyze_cohorts(frame, by, workers=1, min_size=10, alpha=0.05, epsilon=0.5, min_level_size=5,
+                    min_group_size=3, resamples=0, seed=0, max_shapiro_n=MAX_SHAPIRO_N, partitions_per_task=8):
+    """Run the test battery for every partition of a cleaned, scored frame; returns one tidy table.
+
+    Partitions with fewer than min_size respondents are left out. The table
+    has the key columns, then test, target and the result columns; tests
+    that do not apply to a row leave its columns empty.
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    params = {'alpha': alpha, 'epsilon': epsilon, 'min_level_size': min_level_size,
+              'resamples': resamples, 'seed': seed, 'max_shapiro_n': max_shapiro_n}
+    matrix, keys, bounds, group_labels, level_labels = pack(frame, by)
+    partitions = [(key, bounds[i], bounds[i + 1]) for i, key in enumerate(keys)
+                  if bounds[i + 1] - bounds[i] >= min_size]
+
+    if workers > 1 and len(partitions) > 1:
+        from multiprocessing import shared_memory
+        import scipy.stats    # imported once here rather than in every forked worker
+        memory = shared_memory.SharedMemory(create=True, size=max(matrix.nbytes, 1))
+        try:
+            np.ndarray(matrix.shape, dtype='float32', buffer=memory.buf)[:] = matrix
+            del matrix
+            jobs = [(partitions[i:i + partitions_per_task], min_group_size, params)
+                    for i in range(0, len(partitions), partitions_per_task)]
+            with ProcessPoolExecutor(max_workers=workers, mp_context=_fork_context(), initializer=_attach,
+                                     initargs=(memory.name, (bounds[-1], 2 + len(metrics)),
+                                               group_labels, level_labels)) as executor:
+                rows = [row for batch in executor.map(_run_partitions, jobs) for row in batch]
+        finally:
+            memory.close()
+            memory.unlink()
+    else:
+        rows = []
+        for key, start, stop in partitions:
+            summaries = _summaries(matrix[start:stop], group_labels, level_labels)
+            rows += _partition_rows(key, summaries, min_group_size, params)
+
+    return pd.DataFrame(rows, columns=by + result_columns)
+
+
+def save_results(table, path):
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix == '.parquet':
+        table.to_parquet(path, index=False)
+    elif suffix == '.json':
+        table.to_json(path, orient='records', indent=2)
+    elif suffix == '.csv':
+        table.to_csv(path, index=False)
+    else:
+        raise ValueError(f"Unsupported results format: {path!r} (use .csv, .parquet or .json)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the Indian vs Foreign analysis for every cohort at once.')
+    parser.add_argument('--input', nargs='+', default=['data/Data Collection.csv'], metavar='PATH',
+                        help='Survey exports: CSV, XLSX or Parquet (default: data/Data Collection.csv)')
+    parser.add_argument('--by', nargs='+', default=['University Name'], metavar='COLUMN',
+                        help="Columns that define a cohort (default: 'University Name')")
+    parser.add_argument('--exact-keys', action='store_true',
+                        help='Use key labels as written instead of ignoring case and spacing')
+    parser.add_argument('--output', default=DEFAULT_RESULTS_FILE,
+                        help=f'Results table; .csv, .parquet or .json (default: {DEFAULT_RESULTS_FILE})')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Worker processes (default: the CPU count)')
+    parser.add_argument('--min-size', type=int, default=10,
+                        help='Cohorts with fewer respondents are left out (default: %(default)s)')
+    parser.add_argument('--resamples', type=int, default=0,
+                        help='Bootstrap resamples and permutations per cohort; 0 disables (default: 0)')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for resampling (default: 0)')
+    parser.add_argument('--alpha', type=float, default=analysis.DEFAULT_PARAMS['alpha'],
+                        help='Significance level (default: %(default)s)')
+    parser.add_argument('--epsilon', type=float, default=analysis.DEFAULT_PARAMS['epsilon'],
+                        help='Equivalence bound for TOST (default: %(default)s)')
+    parser.add_argument('--min-level-size', type=int, default=analysis.DEFAULT_PARAMS['min_level_size'],
+                        help='Minimum respondents for a level of study to be tested (default: %(default)s)')
+    parser.add_argument('--max-shapiro-n', type=int, default=analysis.DEFAULT_PARAMS['max_shapiro_n'],
+                        help="Largest group tested with Shapiro-Wilk; larger groups get D'Agostino-Pearson "
+                             '(default: %(default)s)')
+    parser.add_argument('--min-group-size', type=int, default=analysis.DEFAULT_PARAMS['min_group_size'],
+                        help='Minimum respondents per student type, in a cohort and within a level (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    print("Loading data...")
+    _, df, _ = load_frame(args.input, args.workers)
+    missing = [col for col in args.by if col not in df]
+    if missing:
+        parser.error(f"Unknown cohort column(s): {', '.join(missing)}")
+    if not args.exact_keys:
+        for col in args.by:
+            df[col] = normalize_key(df[col]).astype('category')
+
+    table = analyze_cohorts(df, args.by, args.workers, args.min_size, args.alpha, args.epsilon,
+                            args.min_level_size, args.min_group_size, args.resamples, args.seed, args.max_shapiro_n)
+    save_results(table, args.output)
+    cohorts = table.groupby(args.by, observed=True, dropna=False).ngroups
+    skipped = table.loc[table['test'].isin(['skipped', 'error']), args.by].drop_duplicates()
+    print(f"Analyzed {cohorts - len(skipped)} cohorts ({len(skipped)} could not be tested); "
+          f"results saved to '{args.output}'")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,201 +1,340 @@
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-
-# Set style
-plt.style.use('seaborn-v0_8')
-sns.set_palette('Set2')
-
-# Load the processed data
-print("Loading processed data...")
-df = pd.read_csv('processed_proficiency_data.csv')
-
-# Create directory for plots if it doesn't exist
-import os
-if not os.path.exists('plots'):
-    os.makedirs('plots')
-
-# Define skill columns for reference
-skill_columns = [
-    'Reading Comprehension \n(Understanding academic text)', 
-    'Listening Skills (Understanding lectures and spoken English)',
-    'Speaking Skills (Fluency and confidence in spoken communication)',
-    'Writing Skills (Ability to write academic papers and assignments)'
-]
-
-# Simplified names for plotting
-skill_names = {
-    'Reading Comprehension \n(Understanding academic text)': 'Reading',
-    'Listening Skills (Understanding lectures and spoken English)': 'Listening',
-    'Speaking Skills (Fluency and confidence in spoken communication)': 'Speaking',
-    'Writing Skills (Ability to write academic papers and assignments)': 'Writing'
-}
-
-# Plot 1: Overall Proficiency Distribution
-plt.figure(figsize=(12, 6))
-
-# Boxplot
-plt.subplot(1, 2, 1)
-sns.boxplot(x='Student_Type', y='Proficiency_Score', data=df)
-plt.title('English Proficiency by Student Type')
-plt.xlabel('Student Type')
-plt.ylabel('Proficiency Score (1-5 scale)')
-plt.ylim(1, 5.5)
-
-# Violin plot
-plt.subplot(1, 2, 2)
-sns.violinplot(x='Student_Type', y='Proficiency_Score', data=df, inner='quartile')
-plt.title('Proficiency Distribution Comparison')
-plt.xlabel('Student Type')
-plt.ylabel('Proficiency Score (1-5 scale)')
-plt.ylim(1, 5.5)
-
-plt.tight_layout()
-plt.savefig('plots/overall_proficiency.png', dpi=300)
-print("Saved overall proficiency plot")
-
-# Plot 2: Skill-by-Skill Comparison
-plt.figure(figsize=(12, 8))
-
-# Prepare data
-skill_data = []
-for skill in skill_columns:
-    for student_type in ['Indian', 'Foreign']:
-        subset = df[df['Student_Type'] == student_type]
-        skill_data.append({
-            'Skill': skill_names[skill],
-            'Student_Type': student_type,
-            'Mean': subset[skill].mean(),
-            'SE': subset[skill].std() / np.sqrt(len(subset)),
-            'SD': subset[skill].std()
-        })
-
-skill_df = pd.DataFrame(skill_data)
-
-# Bar plot with error bars
-plt.subplot(2, 1, 1)
-sns.barplot(x='Skill', y='Mean', hue='Student_Type', data=skill_df, errorbar=('ci', 95))
-plt.title('Comparison of English Skills by Student Type with 95% CI')
-plt.xlabel('Skill Area')
-plt.ylabel('Mean Score (1-5 scale)')
-plt.ylim(1, 5)
-plt.legend(title='Student Type')
-
-# Radar chart for skills comparison
-plt.subplot(2, 1, 2)
-
-# Prepare data for radar chart
-categories = list(skill_names.values())
-N = len(categories)
-angles = [n / float(N) * 2 * np.pi for n in range(N)]
-angles += angles[:1]  # Close the loop
-
-indian_means = [skill_df[(skill_df['Student_Type'] == 'Indian') & (skill_df['Skill'] == skill)]['Mean'].values[0] 
-                for skill in categories]
-indian_means += indian_means[:1]  # Close the loop
-
-foreign_means = [skill_df[(skill_df['Student_Type'] == 'Foreign') & (skill_df['Skill'] == skill)]['Mean'].values[0] 
-                 for skill in categories]
-foreign_means += foreign_means[:1]  # Close the loop
-
-# Create radar chart
-ax = plt.subplot(2, 1, 2, polar=True)
-plt.xticks(angles[:-1], categories, color='grey', size=10)
-plt.yticks(np.arange(1, 6), ['1', '2', '3', '4', '5'], color='grey', size=8)
-plt.ylim(0, 5)
-
-# Plot data
-ax.plot(angles, indian_means, linewidth=1, linestyle='solid', label='Indian')
-ax.fill(angles, indian_means, alpha=0.25)
-ax.plot(angles, foreign_means, linewidth=1, linestyle='solid', label='Foreign')
-ax.fill(angles, foreign_means, alpha=0.25)
-plt.legend(loc='upper right', bbox_to_anchor=(0.1, 0.1))
-plt.title('Skills Radar Chart: Indian vs Foreign Students')
-
-plt.tight_layout()
-plt.savefig('plots/skill_comparison.png', dpi=300)
-print("Saved skill comparison plot")
-
-# Plot 3: Analysis by Education Level
-plt.figure(figsize=(14, 6))
-
-# Boxplot
-plt.subplot(1, 2, 1)
-sns.boxplot(x='Level of Study', y='Proficiency_Score', hue='Student_Type', data=df)
-plt.title('Proficiency by Level of Study')
-plt.xlabel('Level of Study')
-plt.ylabel('Proficiency Score (1-5 scale)')
-plt.ylim(1, 5.5)
-plt.legend(title='Student Type')
-
-# Group barplot
-level_data = []
-for level in df['Level of Study'].unique():
-    for student_type in ['Indian', 'Foreign']:
-        subset = df[(df['Level of Study'] == level) & (df['Student_Type'] == student_type)]
-        if len(subset) > 0:
-            level_data.append({
-                'Level': level,
-                'Student_Type': student_type,
-                'Mean': subset['Proficiency_Score'].mean(),
-                'SE': subset['Proficiency_Score'].std() / np.sqrt(len(subset)),
-                'Count': len(subset)
-            })
-
-level_df = pd.DataFrame(level_data)
-
-plt.subplot(1, 2, 2)
-barplot = sns.barplot(x='Level', y='Mean', hue='Student_Type', data=level_df, errorbar=('ci', 95))
-plt.title('Mean Proficiency by Level of Study with 95% CI')
-plt.xlabel('Level of Study')
-plt.ylabel('Mean Proficiency Score (1-5 scale)')
-plt.ylim(1, 5)
-
-# Add sample size as text on bars
-for i, level in enumerate(['Postgraduate', 'Undergraduate']):
-    for j, st in enumerate(['Indian', 'Foreign']):
-        count = level_df[(level_df['Level'] == level) & (level_df['Student_Type'] == st)]['Count'].values[0]
-        barplot.text(i + (j-0.5)*0.4, 1.2, f'n={count}', ha='center')
-
-plt.tight_layout()
-plt.savefig('plots/study_level_comparison.png', dpi=300)
-print("Saved study level comparison plot")
-
-# Plot 4: Focus on Speaking Skills
-plt.figure(figsize=(10, 8))
-
-# Distribution of speaking scores
-speaking_col = 'Speaking Skills (Fluency and confidence in spoken communication)'
-plt.subplot(2, 1, 1)
-for student_type, color in zip(['Indian', 'Foreign'], ['blue', 'green']):
-    subset = df[df['Student_Type'] == student_type]
-    sns.kdeplot(subset[speaking_col], fill=True, alpha=0.5, label=student_type, color=color)
-
-plt.title('Distribution of Speaking Skills Scores')
-plt.xlabel('Speaking Score (1-5 scale)')
-plt.ylabel('Density')
-plt.xlim(1, 5.5)
-plt.legend(title='Student Type')
-
-# Comparison of skills for Indian students
-plt.subplot(2, 1, 2)
-indian_df = df[df['Student_Type'] == 'Indian']
-indian_skills = pd.melt(indian_df, 
-                        id_vars=['Student_Type'], 
-                        value_vars=skill_columns,
-                        var_name='Skill', 
-                        value_name='Score')
-indian_skills['Skill'] = indian_skills['Skill'].map(skill_names)
-
-sns.boxplot(x='Skill', y='Score', data=indian_skills)
-plt.title('Comparison of Skills Among Indian Students')
-plt.xlabel('Skill Area')
-plt.ylabel('Score (1-5 scale)')
-plt.ylim(1, 5.5)
-
-plt.tight_layout()
-plt.savefig('plots/speaking_skills_focus.png', dpi=300)
-print("Saved speaking skills focus plot")
-
-print("All visualizations have been created and saved to the 'plots' directory") 
\ No newline at end of file
+import argparse
+import hashlib
+import inspect
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import numpy as np
+
+import histplots
+from intermediate import DEFAULT_HISTOGRAM_FILE, DEFAULT_PROCESSED_FILE, read_histograms, read_processed
+from profiling import Profiler
+from schema import group_column, level_column, score_column, skill_columns, speaking_column
+from summaries import GroupedSummaries
+
+PLOT_FORMATS = ['png', 'svg', 'webp']
+HASH_FILE = '.render_hashes.json'
+
+# Simplified names for plotting
+skill_names = {
+    'Reading Comprehension \n(Understanding academic text)': 'Reading',
+    'Listening Skills (Understanding lectures and spoken English)': 'Listening',
+    'Speaking Skills (Fluency and confidence in spoken communication)': 'Speaking',
+    'Writing Skills (Ability to write academic papers and assignments)': 'Writing'
+}
+
+
+def _pyplot():
+    # matplotlib and seaborn are only imported once a figure is actually drawn
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    # Set style
+    plt.style.use('seaborn-v0_8')
+    sns.set_palette('Set2')
+    return plt, sns
+
+
+def prepare_inputs(summaries):
+    """Derive the (small) inputs each figure needs from the group summaries."""
+    # Figures get per-group value histograms rather than rows, so their inputs, and the time
+    # to draw them, do not grow with the number of responses
+    skill_stats = summaries.table(by=[group_column], metrics=skill_columns)
+    level_stats = summaries.table(by=[group_column, level_column], metrics=[score_column])
+
+    skill_data = []
+    for skill in skill_columns:
+        for student_type in ['Indian', 'Foreign']:
+            cell = skill_stats.loc[(student_type, skill)]
+            skill_data.append({
+                'Skill': skill_names[skill],
+                'Student_Type': student_type,
+                'Mean': cell['mean'],
+                'SE': cell['se'],
+                'SD': cell['std']
+            })
+
+    skill_df = pd.DataFrame(skill_data)
+
+    level_data = []
+    for level in summaries.levels:
+        for student_type in ['Indian', 'Foreign']:
+            count = summaries.row_count(student_type, level)
+            if count > 0:
+                cell = level_stats.loc[(student_type, level, score_column)]
+                level_data.append({
+                    'Level': level,
+                    'Student_Type': student_type,
+                    'Mean': cell['mean'],
+                    'SE': cell['se'],
+                    'Count': count
+                })
+
+    level_df = pd.DataFrame(level_data)
+
+    return {
+        'overall_proficiency': {'hist': summaries.histograms([group_column], [score_column])},
+        'skill_comparison': {'skill_df': skill_df},
+        'study_level_comparison': {'hist': summaries.histograms([group_column, level_column], [score_column]),
+                                   'level_df': level_df},
+        'speaking_skills_focus': {'hist': summaries.histograms([group_column], skill_columns)},
+    }
+
+
+# Plot 1: Overall Proficiency Distribution
+def plot_overall_proficiency(hist):
+    plt, sns = _pyplot()
+    plt.figure(figsize=(12, 6))
+
+    # Boxplot
+    ax = plt.subplot(1, 2, 1)
+    histplots.boxplot(ax, hist, x='Student_Type', order=['Indian', 'Foreign'])
+    plt.title('English Proficiency by Student Type')
+    plt.xlabel('Student Type')
+    plt.ylabel('Proficiency Score (1-5 scale)')
+    plt.ylim(1, 5.5)
+
+    # Violin plot
+    ax = plt.subplot(1, 2, 2)
+    histplots.violinplot(ax, hist, x='Student_Type', order=['Indian', 'Foreign'], inner='quartile')
+    plt.title('Proficiency Distribution Comparison')
+    plt.xlabel('Student Type')
+    plt.ylabel('Proficiency Score (1-5 scale)')
+    plt.ylim(1, 5.5)
+
+    plt.tight_layout()
+
+
+# Plot 2: Skill-by-Skill Comparison
+def plot_skill_comparison(skill_df):
+    plt, sns = _pyplot()
+    plt.figure(figsize=(12, 8))
+
+    # Bar plot with error bars
+    plt.subplot(2, 1, 1)
+    sns.barplot(x='Skill', y='Mean', hue='Student_Type', data=skill_df, errorbar=('ci', 95))
+    plt.title('Comparison of English Skills by Student Type with 95% CI')
+    plt.xlabel('Skill Area')
+    plt.ylabel('Mean Score (1-5 scale)')
+    plt.ylim(1, 5)
+    plt.legend(title='Student Type')
+
+    # Radar chart for skills comparison
+    plt.subplot(2, 1, 2)
+
+    # Prepare data for radar chart
+    categories = list(skill_names.values())
+    N = len(categories)
+    angles = [n / float(N) * 2 * np.pi for n in range(N)]
+    angles += angles[:1]  # Close the loop
+
+    indian_means = [skill_df[(skill_df['Student_Type'] == 'Indian') & (skill_df['Skill'] == skill)]['Mean'].values[0] 
+                    for skill in categories]
+    indian_means += indian_means[:1]  # Close the loop
+
+    foreign_means = [skill_df[(skill_df['Student_Type'] == 'Foreign') & (skill_df['Skill'] == skill)]['Mean'].values[0] 
+                     for skill in categories]
+    foreign_means += foreign_means[:1]  # Close the loop
+
+    # Create radar chart
+    ax = plt.subplot(2, 1, 2, polar=True)
+    plt.xticks(angles[:-1], categories, color='grey', size=10)
+    plt.yticks(np.arange(1, 6), ['1', '2', '3', '4', '5'], color='grey', size=8)
+    plt.ylim(0, 5)
+
+    # Plot data
+    ax.plot(angles, indian_means, linewidth=1, linestyle='solid', label='Indian')
+    ax.fill(angles, indian_means, alpha=0.25)
+    ax.plot(angles, foreign_means, linewidth=1, linestyle='solid', label='Foreign')
+    ax.fill(angles, foreign_means, alpha=0.25)
+    plt.legend(loc='upper right', bbox_to_anchor=(0.1, 0.1))
+    plt.title('Skills Radar Chart: Indian vs Foreign Students')
+
+    plt.tight_layout()
+
+
+# Plot 3: Analysis by Education Level
+def plot_study_level_comparison(hist, level_df):
+    plt, sns = _pyplot()
+    plt.figure(figsize=(14, 6))
+
+    # Boxplot
+    ax = plt.subplot(1, 2, 1)
+    histplots.boxplot(ax, hist, x='Level of Study', hue='Student_Type', order=list(level_df['Level'].unique()),
+                      hue_order=['Indian', 'Foreign'])
+    plt.title('Proficiency by Level of Study')
+    plt.xlabel('Level of Study')
+    plt.ylabel('Proficiency Score (1-5 scale)')
+    plt.ylim(1, 5.5)
+    plt.legend(title='Student Type')
+
+    levels = list(level_df['Level'].unique())
+    student_types = ['Indian', 'Foreign']
+    plt.subplot(1, 2, 2)
+    barplot = sns.barplot(x='Level', y='Mean', hue='Student_Type', data=level_df, errorbar=('ci', 95),
+                          order=levels, hue_order=student_types)
+    plt.title('Mean Proficiency by Level of Study with 95% CI')
+    plt.xlabel('Level of Study')
+    plt.ylabel('Mean Proficiency Score (1-5 scale)')
+    plt.ylim(1, 5)
+
+    # Add sample size as text on bars (levels in the bars' order; a group absent from a level has no bar)
+    for i, level in enumerate(levels):
+        for j, st in enumerate(student_types):
+            count = level_df[(level_df['Level'] == level) & (level_df['Student_Type'] == st)]['Count']
+            if count.empty:
+                continue
+            barplot.text(i + (j-0.5)*0.4, 1.2, f'n={count.iloc[0]}', ha='center')
+
+    plt.tight_layout()
+
+
+# Plot 4: Focus on Speaking Skills
+def plot_speaking_skills_focus(hist):
+    plt, sns = _pyplot()
+    plt.figure(figsize=(10, 8))
+
+    # Distribution of speaking scores
+    ax = plt.subplot(2, 1, 1)
+    speaking = hist[hist['metric'] == speaking_column]
+    for student_type, color in zip(['Indian', 'Foreign'], ['blue', 'green']):
+        subset = speaking[speaking['Student_Type'] == student_type]
+        histplots.kdeplot(ax, subset['value'], subset['count'], fill=True, alpha=0.5, label=student_type, color=color)
+
+    plt.title('Distribution of Speaking Skills Scores')
+    plt.xlabel('Speaking Score (1-5 scale)')
+    plt.ylabel('Density')
+    plt.xlim(1, 5.5)
+    plt.legend(title='Student Type')
+
+    # Comparison of skills for Indian students
+    ax = plt.subplot(2, 1, 2)
+    indian_skills = hist[hist['Student_Type'] == 'Indian'].assign(Skill=lambda f: f['metric'].map(skill_names))
+
+    histplots.boxplot(ax, indian_skills, x='Skill', order=list(skill_names.values()))
+    plt.title('Comparison of Skills Among Indian Students')
+    plt.xlabel('Skill Area')
+    plt.ylabel('Score (1-5 scale)')
+    plt.ylim(1, 5.5)
+
+    plt.tight_layout()
+
+
+FIGURES = {
+    'overall_proficiency': (plot_overall_proficiency, "overall proficiency"),
+    'skill_comparison': (plot_skill_comparison, "skill comparison"),
+    'study_level_comparison': (plot_study_level_comparison, "study level comparison"),
+    'speaking_skills_focus': (plot_speaking_skills_focus, "speaking skills focus"),
+}
+
+
+def fingerprint(name, inputs, dpi, fmt):
+    """Content hash of a figure's input data, plotting parameters and plotting code."""
+    digest = hashlib.sha256()
+    digest.update(inspect.getsource(FIGURES[name][0]).encode())
+    digest.update(inspect.getsource(histplots).encode())
+    digest.update(f"{dpi}|{fmt}".encode())
+    for key in sorted(inputs):
+        frame = inputs[key]
+        digest.update(key.encode())
+        digest.update(json.dumps([str(c) for c in frame.columns]).encode())
+        digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def render(name, inputs, path, dpi, deep=False):
+    # Runs in a worker process: draw one figure and save it; returns its timing record
+    profiler = Profiler(deep)
+    with profiler.stage(f"plot {name}", rows=max(len(frame) for frame in inputs.values())):
+        plt, _ = _pyplot()
+        FIGURES[name][0](**inputs)
+        plt.savefig(path, dpi=dpi)
+        plt.close('all')
+    return name, profiler.records[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Create the proficiency plots from the analysis summaries.')
+    parser.add_argument('--histograms', default=DEFAULT_HISTOGRAM_FILE,
+                        help=f'Value histograms written by analyze_proficiency.py (default: {DEFAULT_HISTOGRAM_FILE})')
+    parser.add_argument('--input', default=None,
+                        help='Summarize this processed data file instead of reading the histograms '
+                             f'(also used when the histogram file is missing; default: {DEFAULT_PROCESSED_FILE})')
+    parser.add_argument('--plots-dir', default='plots', help='Output directory (default: plots)')
+    parser.add_argument('--format', choices=PLOT_FORMATS, default='png', help='Image format (default: png)')
+    parser.add_argument('--dpi', type=int, default=300, help='Resolution for raster formats (default: 300)')
+    parser.add_argument('--workers', type=int, default=min(len(FIGURES), os.cpu_count() or 1),
+                        help='Worker processes, one figure each (default: one per figure, up to the CPU count)')
+    parser.add_argument('--force', action='store_true', help='Re-render figures even if their inputs are unchanged')
+    parser.add_argument('--profile', default=None, metavar='JSONL',
+                        help='Append wall/CPU time, process peak RSS (and how far each stage raised it) and rows '
+                             'of every stage and figure to this file')
+    parser.add_argument('--trace', default=None, metavar='JSON', help='Write the timings as a Chrome trace')
+    parser.add_argument('--profile-deep', action='store_true',
+                        help='Also run each stage under cProfile and tracemalloc (slower)')
+    args = parser.parse_args(argv)
+    profiler = Profiler(deep=args.profile_deep)
+
+    # Load the group summaries; the rows are only read when there are no histograms to use
+    with profiler.stage('load summaries') as record:
+        if args.input is None and os.path.exists(args.histograms):
+            print("Loading histograms...")
+            summaries = read_histograms(args.histograms)
+        else:
+            print("Loading processed data...")
+            # Only the columns the plots use are read from the columnar file
+            df = read_processed(args.input or DEFAULT_PROCESSED_FILE,
+                                columns=[group_column, level_column] + skill_columns + [score_column])
+            summaries = GroupedSummaries.from_frame(df)
+        record['rows'] = summaries.row_count()
+
+    # Create directory for plots if it doesn't exist
+    if not os.path.exists(args.plots_dir):
+        os.makedirs(args.plots_dir)
+
+    # Figures whose inputs, parameters and code match the last run are skipped
+    hash_path = os.path.join(args.plots_dir, HASH_FILE)
+    hashes = {}
+    if os.path.exists(hash_path):
+        with open(hash_path) as f:
+            hashes = json.load(f)
+
+    with profiler.stage('prepare inputs', rows=summaries.row_count()):
+        inputs = prepare_inputs(summaries)
+    jobs = []
+    for name, (_, label) in FIGURES.items():
+        path = os.path.join(args.plots_dir, f"{name}.{args.format}")
+        digest = fingerprint(name, inputs[name], args.dpi, args.format)
+        if not args.force and hashes.get(path) == digest and os.path.exists(path):
+            print(f"Skipped {label} plot (unchanged)")
+            continue
+        hashes[path] = digest
+        jobs.append((name, inputs[name], path, args.dpi, args.profile_deep))
+
+    if args.workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(args.workers, len(jobs))) as executor:
+            futures = [executor.submit(render, *job) for job in jobs]
+            rendered = (future.result() for future in futures)
+            for name, record in rendered:
+                profiler.add(record)
+                print(f"Saved {FIGURES[name][1]} plot")
+    else:
+        for job in jobs:
+            name, record = render(*job)
+            profiler.add(record)
+            print(f"Saved {FIGURES[name][1]} plot")
+
+    # Only record hashes once every figure has been written
+    with open(hash_path, 'w') as f:
+        json.dump(hashes, f, indent=2)
+
+    print(f"All visualizations have been created and saved to the '{args.plots_dir}' directory")
+    profiler.save(args.profile, args.trace)
+
+
+if __name__ == '__main__':
+    main()
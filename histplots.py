@@ -0,0 +1,165 @@
+import numpy as np
+
+from summaries import quantile_table
+
+# Box, violin and density plots drawn from value histograms.
+#
+# seaborn's boxplot, violinplot and kdeplot take the raw observations and
+# recompute quartiles and kernel densities from them, so a figure of a
+# million responses pushes millions of points through matplotlib. Scores and
+# ratings take a handful of distinct values, so the same figures follow from
+# the per-group counts: quartiles and whiskers from the cumulative counts, and
+# the Gaussian KDE of the expanded sample as a count-weighted sum over the
+# distinct values. The cost depends on the number of distinct values and
+# groups, never on the number of responses.
+#
+# Histograms are long frames as returned by GroupedSummaries.histograms():
+# category columns, 'value' and 'count'.
+
+WHIS = 1.5          # whisker reach in IQRs (matplotlib's and seaborn's default)
+VIOLIN_CUT = 2      # violins extend this many bandwidths past the extremes (violinplot's default)
+KDE_CUT = 3         # kdeplot's default
+GRID_POINTS = 200
+
+
+def _sorted(values, counts):
+    values = np.asarray(values, dtype='float64')
+    counts = np.asarray(counts, dtype='float64')
+    order = np.argsort(values)
+    return values[order], counts[order]
+
+
+def box_stats(values, counts, label=None, whis=WHIS):
+    """Box-plot statistics of one histogram for Axes.bxp, as matplotlib computes them from the raw values.
+
+    Fliers are the distinct values beyond the whiskers, each drawn once.
+    """
+    values, counts = _sorted(values, counts)
+    quartiles = quantile_table(counts, values)
+    q1, median, q3 = (float(quartiles[column]) for column in ('25%', '50%', '75%'))
+    low, high = q1 - whis * (q3 - q1), q3 + whis * (q3 - q1)
+    present = values[counts > 0]
+    inside = present[(present >= low) & (present <= high)]
+    return {
+        'label': label,
+        'mean': float(np.dot(values, counts) / counts.sum()),
+        'med': median, 'q1': q1, 'q3': q3,
+        'whislo': float(inside.min()), 'whishi': float(inside.max()),
+        'fliers': present[(present < low) | (present > high)],
+    }
+
+
+def bandwidth(values, counts):
+    # Scott's rule on the expanded sample, as scipy's gaussian_kde (and so seaborn) applies it
+    values, counts = _sorted(values, counts)
+    n = counts.sum()
+    mean = np.dot(values, counts) / n
+    var = np.dot((values - mean) ** 2, counts) / (n - 1)
+    return float(np.sqrt(var) * n ** (-1 / 5))
+
+
+def kde(values, counts, grid, bw=None):
+    """Gaussian KDE of the expanded sample on grid, summed over the distinct values."""
+    values, counts = _sorted(values, counts)
+    bw = bandwidth(values, counts) if bw is None else bw
+    z = (np.asarray(grid, dtype='float64')[:, None] - values) / bw
+    return np.exp(-0.5 * z ** 2) @ counts / (counts.sum() * bw * np.sqrt(2 * np.pi))
+
+
+def _palette():
+    import matplotlib.pyplot as plt
+    return plt.rcParams['axes.prop_cycle'].by_key()['color']
+
+
+def _cells(hist, x, hue, order, hue_order, width):
+    # One (position, width, colour index, values, counts) per non-empty (x, hue) cell, dodged like seaborn
+    order = list(order if order is not None else dict.fromkeys(hist[x]))
+    hues = [None] if hue is None else list(hue_order if hue_order is not None else dict.fromkeys(hist[hue]))
+    step = width / len(hues)
+    cells = []
+    for i, category in enumerate(order):
+        for j, level in enumerate(hues):
+            mask = hist[x] == category
+            if hue is not None:
+                mask &= hist[hue] == level
+            cell = hist[mask & (hist['count'] > 0)]
+            if len(cell):
+                position = i - width / 2 + step * (j + 0.5)
+                cells.append((position, step, i if hue is None else j,
+                              *_sorted(cell['value'].to_numpy(), cell['count'].to_numpy())))
+    return order, hues, cells
+
+
+def _axis(ax, order):
+    ax.set_xticks(range(len(order)), order)
+    ax.set_xlim(-0.5, len(order) - 0.5)
+
+
+def _label(artist, hues, color, labelled):
+    # The first artist of each hue level carries its label, so plt.legend() picks the levels up
+    if hues != [None] and color not in labelled:
+        artist.set_label(hues[color])
+        labelled.add(color)
+
+
+def boxplot(ax, hist, x, hue=None, order=None, hue_order=None, width=0.8):
+    """One box per x (and hue) category of a histogram frame."""
+    colors = _palette()
+    order, hues, cells = _cells(hist, x, hue, order, hue_order, width)
+    artists = ax.bxp([box_stats(values, counts) for _, _, _, values, counts in cells],
+                     positions=[position for position, *_ in cells],
+                     widths=[0.9 * step for _, step, *_ in cells],
+                     patch_artist=True, manage_ticks=False,
+                     medianprops={'color': '0.25'}, flierprops={'marker': 'd', 'markerfacecolor': '0.25'})
+    labelled = set()
+    for box, (_, _, color, _, _) in zip(artists['boxes'], cells):
+        box.set_facecolor(colors[color % len(colors)])
+        _label(box, hues, color, labelled)
+    _axis(ax, order)
+    return ax
+
+
+def violinplot(ax, hist, x, hue=None, order=None, hue_order=None, width=0.8, inner='quartile',
+               cut=VIOLIN_CUT, points=GRID_POINTS):
+    """One violin per x (and hue) category of a histogram frame; inner='quartile' marks the quartiles.
+
+    All violins share one width scale, so they have equal areas (seaborn's default).
+    """
+    colors = _palette()
+    order, hues, cells = _cells(hist, x, hue, order, hue_order, width)
+    shapes = []
+    for position, step, color, values, counts in cells:
+        bw = bandwidth(values, counts)
+        if not bw > 0:
+            continue    # a single distinct value has no density to draw
+        grid = np.linspace(values.min() - cut * bw, values.max() + cut * bw, points)
+        shapes.append((position, step, color, values, counts, grid, kde(values, counts, grid, bw)))
+    scale = max((density.max() for *_, density in shapes), default=1.0)
+    labelled = set()
+    for position, step, color, values, counts, grid, density in shapes:
+        half = density / scale * 0.9 * step / 2
+        body = ax.fill_betweenx(grid, position - half, position + half, facecolor=colors[color % len(colors)],
+                                edgecolor='0.25', linewidth=1)
+        _label(body, hues, color, labelled)
+        if inner == 'quartile':
+            quartiles = quantile_table(counts, values)
+            for column, style in (('25%', ':'), ('50%', '--'), ('75%', ':')):
+                y = float(quartiles[column])
+                reach = np.interp(y, grid, half)
+                ax.plot([position - reach, position + reach], [y, y], color='0.25', linestyle=style, linewidth=1)
+    _axis(ax, order)
+    return ax
+
+
+def kdeplot(ax, values, counts, fill=True, alpha=0.5, label=None, color=None, cut=KDE_CUT, points=GRID_POINTS):
+    """Density curve of one histogram, as kdeplot would draw it from the expanded sample."""
+    values, counts = _sorted(values, counts)
+    bw = bandwidth(values, counts)
+    if not bw > 0:
+        return ax
+    grid = np.linspace(values.min() - cut * bw, values.max() + cut * bw, points)
+    density = kde(values, counts, grid, bw)
+    line, = ax.plot(grid, density, color=color, label=None if fill else label)
+    if fill:
+        ax.fill_between(grid, density, color=line.get_color(), alpha=alpha, label=label)
+    return ax
@@ -0,0 +1,184 @@
+import io
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from cache import file_digest
+from intermediate import ProcessedWriter
+from readers import detect_format, iter_raw_chunks, known_columns, match_columns, read_header, read_many
+from schema import analysis_columns, apply_schema, group_column, key_columns, row_columns
+from scoring import SkillScorer
+from summaries import GroupedSummaries
+
+DEFAULT_CHUNKSIZE = 100_000
+DEFAULT_STATE_FILE = 'proficiency_state.pkl'
+
+
+def with_student_type(df):
+    # Remove any rows with missing values in key columns
+    df = df.dropna(subset=key_columns).copy()
+
+    # Create a binary variable: Indian vs Foreign students
+    df[group_column] = pd.Categorical(np.where(df['Nationality'] == 'Indian', 'Indian', 'Foreign'))
+    return df
+
+
+def clean_and_score(df, scorer=None):
+    """Drop incomplete rows, add the student type, the skill ratings and the score.
+
+    Returns (frame, unmapped label counts).
+    """
+    df = with_student_type(df)
+
+    # Skill labels -> Int8 ratings 1-5 and the composite score (weighted mean of the skills)
+    unmapped = (scorer or SkillScorer()).apply(df)
+
+    # Convert the other labels to compact dtypes
+    apply_schema(df)
+    return df, unmapped
+
+
+def _paths(paths):
+    return [paths] if isinstance(paths, str) else list(paths)
+
+
+def source_width(paths):
+    # Number of distinct columns across the exports, as reading all of them would give
+    names = {}
+    for path in _paths(paths):
+        headers = read_header(path)
+        names.update(dict.fromkeys(name or raw for raw, name in zip(headers, match_columns(headers, known_columns))))
+    return len(names)
+
+
+def load_frame(paths, workers=1, scorer=None):
+    """Read whole exports (CSV, XLSX or Parquet, one or many) into memory.
+
+    Returns (raw shape, cleaned frame, unmapped label counts). The free-text
+    answers are left on disk; texts.py reads them when asked.
+    """
+    df = read_many(_paths(paths), columns=row_columns, workers=workers)
+    raw_shape = (len(df), source_width(paths))
+    df, unmapped = clean_and_score(df, scorer)
+    return raw_shape, df, unmapped
+
+
+def iter_scored_chunks(path, chunksize=DEFAULT_CHUNKSIZE, names=None, scorer=None):
+    # Only the columns the analysis needs, read as categoricals and scored per chunk
+    # (names is the header to use for a CSV source that has none)
+    for chunk in iter_raw_chunks(path, analysis_columns, chunksize, names):
+        scored, unmapped = clean_and_score(chunk, scorer)
+        yield len(chunk), scored, unmapped
+
+
+def stream_summaries(paths, chunksize=DEFAULT_CHUNKSIZE, processed_file=None, scorer=None):
+    """Build GroupedSummaries chunk by chunk without holding the exports in memory.
+
+    If processed_file is given, each scored chunk is appended to it so the
+    plotting stage still has its per-row input.
+    """
+    paths = _paths(paths)
+    n_columns = source_width(paths)
+    summaries = GroupedSummaries()
+    n_rows = 0
+    writer = ProcessedWriter(processed_file) if processed_file is not None else None
+    try:
+        for raw_rows, chunk, unmapped in (item for path in paths
+                                          for item in iter_scored_chunks(path, chunksize, scorer=scorer)):
+            n_rows += raw_rows
+            summaries.add(chunk)
+            summaries.add_unmapped(unmapped)
+            if writer is not None:
+                writer.write(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    summaries.source_shape = (n_rows, n_columns)
+    return summaries
+
+
+# Append mode: the group histograms are the running sufficient statistics
+# (counts, sums and sums of squares all follow from them, as do medians and
+# mid-ranks), so folding in new responses is one GroupedSummaries.add per
+# chunk of new rows and nothing already ingested is parsed again.
+
+def load_state(path=DEFAULT_STATE_FILE):
+    """Stored summaries and the sources folded into them, or None if there is no state yet."""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def save_state(state, path=DEFAULT_STATE_FILE):
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def _new_rows(path, sources):
+    """Split path against the ingested sources: (source it extends or None, CSV of new rows or None).
+
+    The new rows of a grown export come without a header.
+    """
+    size = os.path.getsize(path)
+    digest = file_digest(path)
+    for source in sources:
+        if source['digest'] == digest:
+            return source, None
+        if (source['size'] < size and source['tail'] == b'\n' and detect_format(path) == 'csv'
+                and file_digest(path, source['size']) == source['digest']):
+            # A grown export: only the bytes after the ingested prefix are parsed
+            with open(path, 'rb') as f:
+                f.seek(source['size'])
+                return source, io.BytesIO(f.read())
+    return None, path
+
+
+def append_responses(paths, state_path=DEFAULT_STATE_FILE, chunksize=DEFAULT_CHUNKSIZE, scorer=None):
+    """Fold new survey responses into the stored summaries, reading only rows not seen before.
+
+    Each path (CSV, XLSX or Parquet) is either a file of new responses or a
+    grown copy of a CSV export that was ingested earlier, in which case only
+    the appended rows are read.
+    Files already ingested are skipped, so repeating an append is harmless.
+    New rows must be scored as the stored ones were (same weights and
+    minimum of rated skills), otherwise ValueError is raised.
+    Returns the updated state: {'summaries': GroupedSummaries, 'sources': [...], 'scoring': ...}.
+    """
+    scorer = scorer or SkillScorer()
+    state = load_state(state_path) or {'summaries': GroupedSummaries(), 'sources': [], 'scoring': scorer.key()}
+    # States saved before scoring was configurable used the default
+    stored = state.setdefault('scoring', SkillScorer().key())
+    if tuple(stored) != scorer.key():
+        raise ValueError(f"The summaries in {state_path!r} were scored with weights {list(stored[0])} and at least "
+                         f"{stored[1]} rated skill(s); append with the same scoring or start a new state")
+    summaries = state['summaries']
+    for path in paths:
+        source, new_rows = _new_rows(path, state['sources'])
+        if new_rows is None:
+            continue
+        columns = read_header(path)
+        n_rows = 0
+        names = columns if source is not None else None
+        for raw_rows, chunk, unmapped in iter_scored_chunks(new_rows, chunksize, names, scorer):
+            n_rows += raw_rows
+            summaries.add(chunk)
+            summaries.add_unmapped(unmapped)
+        previous_rows = summaries.source_shape[0] if summaries.source_shape else 0
+        summaries.source_shape = (previous_rows + n_rows, len(columns))
+
+        # A grown export replaces the record of its prefix
+        if source is not None:
+            state['sources'].remove(source)
+            n_rows += source['rows']
+        with open(path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            tail = f.read(1)
+        state['sources'].append({'path': path, 'size': os.path.getsize(path), 'digest': file_digest(path),
+                                 'tail': tail, 'rows': n_rows})
+    save_state(state, state_path)
+    return state
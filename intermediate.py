@@ -0,0 +1,124 @@
+import os
+
+import pandas as pd
+
+from schema import group_column, label_columns, processed_dtypes
+from summaries import GroupedSummaries
+
+# Hand-off file between analyze_proficiency.py and create_visualizations.py.
+# The format follows the suffix: .parquet (default), .arrow/.feather (Arrow IPC,
+# memory-mapped on read) or .csv (the old text format, re-parsed on every read).
+DEFAULT_PROCESSED_FILE = 'processed_proficiency_data.parquet'
+# The per-group value histograms behind every statistic, so the plots can be drawn
+# without reading the rows back: their size depends on the groups, not the responses.
+DEFAULT_HISTOGRAM_FILE = 'proficiency_histograms.parquet'
+# An Arrow IPC file holds one dictionary per field for all its batches, so the
+# label columns, whose categories differ from chunk to chunk, are written to it
+# as plain strings when streaming; the Likert and experience columns keep their
+# fixed categories from schema.py and so the same dictionary in every chunk.
+ARROW_STRING_COLUMNS = label_columns + [group_column]
+
+
+def _format(path):
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix == '.parquet':
+        return 'parquet'
+    if suffix in ('.arrow', '.feather', '.ipc'):
+        return 'arrow'
+    if suffix == '.csv':
+        return 'csv'
+    raise ValueError(f"Unsupported processed-data format: {path!r} (use .parquet, .arrow or .csv)")
+
+
+def write_processed(df, path=DEFAULT_PROCESSED_FILE):
+    fmt = _format(path)
+    if fmt == 'parquet':
+        df.to_parquet(path, index=False)
+    elif fmt == 'arrow':
+        df.reset_index(drop=True).to_feather(path)
+    else:
+        df.to_csv(path, index=False)
+
+
+def read_processed(path=DEFAULT_PROCESSED_FILE, columns=None):
+    """Read the processed data back with its typed schema, optionally only some columns."""
+    fmt = _format(path)
+    if fmt == 'parquet':
+        return pd.read_parquet(path, columns=columns)
+    if fmt == 'arrow':
+        import pyarrow.feather as feather
+        df = feather.read_table(path, columns=columns, memory_map=True).to_pandas()
+        # Labels written chunk by chunk are plain strings (see ProcessedWriter)
+        for col in ARROW_STRING_COLUMNS:
+            if col in df and df[col].dtype != 'category':
+                df[col] = df[col].astype('category')
+        return df
+    return pd.read_csv(path, usecols=columns, dtype=processed_dtypes())
+
+
+def write_histograms(summaries, path=DEFAULT_HISTOGRAM_FILE):
+    frame = summaries.to_frame()
+    fmt = _format(path)
+    if fmt == 'parquet':
+        frame.to_parquet(path, index=False)
+    elif fmt == 'arrow':
+        frame.to_feather(path)
+    else:
+        frame.to_csv(path, index=False)
+
+
+def read_histograms(path=DEFAULT_HISTOGRAM_FILE):
+    """GroupedSummaries from a histogram file written by write_histograms."""
+    fmt = _format(path)
+    if fmt == 'parquet':
+        frame = pd.read_parquet(path)
+    elif fmt == 'arrow':
+        frame = pd.read_feather(path)
+    else:
+        frame = pd.read_csv(path, dtype={'metric': 'object', 'value': 'float64', 'count': 'int64'})
+    return GroupedSummaries.from_histogram_frame(frame)
+
+
+class ProcessedWriter:
+    """Append scored chunks to the processed file through one open writer."""
+
+    def __init__(self, path=DEFAULT_PROCESSED_FILE):
+        self.path = path
+        self.format = _format(path)
+        self._writer = None
+        self._schema = None
+        self._first = True
+
+    def write(self, chunk):
+        if self.format == 'csv':
+            chunk.to_csv(self.path, index=False, mode='w' if self._first else 'a', header=self._first)
+            self._first = False
+            return
+
+        import pyarrow as pa
+        if self.format == 'arrow':
+            chunk = chunk.assign(**{col: chunk[col].astype('object').where(chunk[col].notna(), None)
+                                    for col in ARROW_STRING_COLUMNS if col in chunk})
+        if self._writer is None:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            self._schema = table.schema
+            if self.format == 'parquet':
+                import pyarrow.parquet as pq
+                self._writer = pq.ParquetWriter(self.path, self._schema)
+            else:
+                self._writer = pa.ipc.new_file(self.path, self._schema)
+        else:
+            # Later chunks may carry different category sets; Parquet re-encodes them per row group
+            table = pa.Table.from_pandas(chunk, schema=self._schema, preserve_index=False)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,197 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+import analyze_proficiency
+from backends import BACKENDS, get_backend
+from intermediate import read_processed
+from readers import read_raw
+from schema import level_column
+from synthetic import write_export
+
+# Parity checks between the execution backends.
+#
+# Every case is summarized by the pandas reference (in memory) and by each
+# other backend, plus the reference in --stream mode, and the results must be
+# identical: the same histogram counts and row totals, levels in the same
+# order, the same source shape and, last, the same report text character for
+# character. Cases cover the bundled export (as CSV and as XLSX) and
+# synthetic cohorts in every input format, with more levels of study than the
+# real data, with several files read together and with unrecognized skill labels under weighted
+# scoring. Backends whose package is not installed are skipped. The processed
+# file is also written chunk by chunk in every format and read back, and must
+# hold the same rows as the in-memory one, and the bundled CSV and XLSX
+# must give the same summaries, source shape included. The JSON report of a
+# cohort with a single response in one cell must still be strict JSON.
+# Exits non-zero on any difference, so it can gate a change to a backend.
+
+# The survey export as shipped, in both of its formats
+BUNDLED_EXPORTS = ['data/Data Collection.csv', 'data/Data Collection.xlsx']
+
+# (name, rows, levels of study, formats read together, share of unknown skill labels, skill weights,
+#  minimum rated skills)
+SYNTHETIC_CASES = [
+    ('csv', 5000, 2, ['csv'], 0.0, None, 1),
+    ('parquet, 4 levels', 5000, 4, ['parquet'], 0.0, None, 1),
+    ('xlsx, 3 levels', 2000, 3, ['xlsx'], 0.0, None, 1),
+    ('csv + parquet', 3000, 2, ['csv', 'parquet'], 0.0, None, 1),
+    ('csv, unknown labels', 3000, 2, ['csv'], 0.05, None, 1),
+    ('parquet, weighted', 3000, 2, ['parquet'], 0.1, [2, 1, 1, 0.5], 3),
+]
+
+
+def _variants(names):
+    # (label, backend name, stream) to compare with the in-memory reference
+    variants = [('pandas --stream', 'pandas', True)]
+    for name in names:
+        try:
+            get_backend(name)
+        except ImportError as e:
+            print(f"Skipping {name}: {e}")
+            continue
+        variants.append((name, name, False))
+    return variants
+
+
+def differences(reference, other):
+    """Names of the parts of two GroupedSummaries that differ (empty if they match)."""
+    found = []
+    if not reference.counts.sort_index().astype('int64').equals(other.counts.sort_index().astype('int64')):
+        found.append('histogram counts')
+    if not reference.rows.sort_index().astype('int64').equals(other.rows.sort_index().astype('int64')):
+        found.append('row totals')
+    if list(reference.levels) != list(other.levels):
+        found.append(f"level order ({reference.levels} vs {other.levels})")
+    if tuple(reference.source_shape) != tuple(other.source_shape):
+        found.append(f"source shape ({reference.source_shape} vs {other.source_shape})")
+    if not reference.unmapped.sort_index().equals(other.unmapped.sort_index()):
+        found.append('unmapped label counts')
+    return found
+
+
+def report_text(summaries, args):
+    results = analyze_proficiency.run_stages(summaries, args)
+    return analyze_proficiency.build_report(summaries, results, args, echo=False).render('text')
+
+
+def check_case(label, paths, variants, args):
+    """Compare every variant with the reference on one set of exports; returns the number of failures."""
+    scorer = analyze_proficiency.make_scorer(args)
+    reference = get_backend('pandas').summarize(paths, scorer=scorer)
+    expected = report_text(reference, args)
+    failures = 0
+    for name, backend, stream in variants:
+        summaries = get_backend(backend).summarize(paths, stream=stream, chunksize=args.chunksize, scorer=scorer)
+        found = differences(reference, summaries)
+        if not found and report_text(summaries, args) != expected:
+            found.append('report text')
+        print(f"  {label:<32} {name:<16} {'ok' if not found else 'DIFFERS: ' + ', '.join(found)}")
+        failures += bool(found)
+    return failures
+
+
+def check_formats(paths):
+    """Compare the summaries of the same export in different formats; returns the number of failures."""
+    pandas = get_backend('pandas')
+    reference = pandas.summarize([paths[0]])
+    failures = 0
+    for path in paths[1:]:
+        found = differences(reference, pandas.summarize([path]))
+        print(f"  {os.path.basename(path):<32} {'same as ' + os.path.splitext(paths[0])[1]:<16} "
+              f"{'ok' if not found else 'DIFFERS: ' + ', '.join(found)}")
+        failures += bool(found)
+    return failures
+
+
+def _reject_constant(name):
+    raise ValueError(f"bare {name} in the JSON report")
+
+
+def check_json(path, args, work_dir):
+    """The JSON report must be strict JSON even when a (student type, level) cell has a single response."""
+    df = read_raw(path)
+    cell = (df['Nationality'] != 'Indian') & (df[level_column] == df[level_column].dropna().iloc[0])
+    sparse = os.path.join(work_dir, 'single_response_cell.csv')
+    df[~cell | (cell.cumsum() == 1)].to_csv(sparse, index=False)
+    case_args = argparse.Namespace(**{**vars(args), 'min_level_size': 1, 'min_group_size': 1})
+    summaries = get_backend('pandas').summarize([sparse], scorer=analyze_proficiency.make_scorer(case_args))
+    results = analyze_proficiency.run_stages(summaries, case_args)
+    text = analyze_proficiency.build_report(summaries, results, case_args, echo=False).render('json')
+    try:
+        json.loads(text, parse_constant=_reject_constant)
+        outcome = 'ok'
+    except ValueError as e:
+        outcome = f"FAILS: {e}"
+    print(f"  {'one response in a cell':<32} {'--format json':<16} {outcome}")
+    return outcome != 'ok'
+
+
+PROCESSED_FORMATS = ['parquet', 'arrow', 'csv']
+
+
+def check_processed(label, paths, args, work_dir):
+    """Compare the processed file of --stream (small chunks, every format) with the in-memory one."""
+    scorer = analyze_proficiency.make_scorer(args)
+    pandas = get_backend('pandas')
+    reference_path = os.path.join(work_dir, 'reference.parquet')
+    pandas.summarize(paths, processed_file=reference_path, scorer=scorer)
+    failures = 0
+    for fmt in PROCESSED_FORMATS:
+        path = os.path.join(work_dir, f"streamed.{fmt}")
+        try:
+            pandas.summarize(paths, stream=True, chunksize=args.chunksize, processed_file=path, scorer=scorer)
+            streamed = read_processed(path)
+            expected = read_processed(reference_path, columns=list(streamed.columns))
+            same = streamed.astype(str).equals(expected.astype(str))
+            outcome = 'ok' if same else 'DIFFERS: processed rows'
+        except Exception as e:
+            same, outcome = False, f"FAILS: {type(e).__name__}: {e}"
+        print(f"  {label:<32} {'--stream .' + fmt:<16} {outcome}")
+        failures += not same
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check that every execution backend gives identical results.')
+    parser.add_argument('--backends', nargs='+', choices=[b for b in BACKENDS if b != 'pandas'],
+                        default=[b for b in BACKENDS if b != 'pandas'],
+                        help='Backends to compare with pandas (default: all)')
+    parser.add_argument('--input', nargs='+', default=BUNDLED_EXPORTS, metavar='PATH',
+                        help=f"Real exports to include, each as its own case (default: {' '.join(BUNDLED_EXPORTS)})")
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiplier for the synthetic cohort sizes')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the synthetic cohorts (default: 0)')
+    parser.add_argument('--resamples', type=int, default=200,
+                        help='Bootstrap resamples and permutations in the compared reports (default: 200)')
+    parser.add_argument('--chunksize', type=int, default=1000,
+                        help='Chunk size of the --stream variant; small, so chunks are merged (default: 1000)')
+    args = parser.parse_args(argv)
+    report_args = analyze_proficiency.build_parser().parse_args(['--resamples', str(args.resamples), '--no-cache'])
+    report_args.chunksize = args.chunksize
+
+    variants = _variants(args.backends)
+    failures = 0
+    print("Backend parity (reference: pandas, in memory)")
+    with tempfile.TemporaryDirectory() as data_dir:
+        for path in (path for path in args.input if os.path.exists(path)):
+            failures += check_case(os.path.basename(path), [path], variants, report_args)
+            failures += check_processed(os.path.basename(path), [path], report_args, data_dir)
+        if args.input == BUNDLED_EXPORTS and all(os.path.exists(path) for path in BUNDLED_EXPORTS):
+            failures += check_formats(BUNDLED_EXPORTS)
+        if os.path.exists(args.input[0]):
+            failures += check_json(args.input[0], report_args, data_dir)
+        for label, rows, levels, formats, unknown_rate, weights, min_skills in SYNTHETIC_CASES:
+            rows = max(int(rows * args.scale), 100)
+            paths = [write_export(os.path.join(data_dir, f"cohort_{i}.{fmt}"), rows, args.seed + i, n_levels=levels,
+                                  unknown_rate=unknown_rate)
+                     for i, fmt in enumerate(formats)]
+            case_args = argparse.Namespace(**{**vars(report_args), 'skill_weights': weights, 'min_skills': min_skills})
+            failures += check_case(f"{label} ({rows} rows)", paths, variants, case_args)
+            failures += check_processed(f"{label} ({rows} rows)", paths, case_args, data_dir)
+    print(f"\n{'All backends agree' if not failures else f'{failures} comparison(s) differ'}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
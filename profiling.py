@@ -0,0 +1,109 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:     # not available on Windows
+    resource = None
+
+# Stage-level instrumentation.
+#
+# Every stage records its wall time, CPU time and the number of rows it
+# covered, plus two memory figures. The OS only keeps the process's peak RSS
+# over its whole lifetime (ru_maxrss), so process_peak_rss_mb is that running
+# maximum when the stage finished, not the stage's own peak; peak_rss_growth_mb
+# is how far the stage raised it, which is 0 for a stage that stayed below the
+# peak of an earlier one. With deep=True each stage also
+# runs under cProfile (top functions by cumulative time) and tracemalloc
+# (peak Python allocations during the stage). Records are plain dicts, so
+# figure workers can return theirs to the parent, and are written as JSON
+# lines or as a Chrome trace (chrome://tracing, Perfetto).
+
+TOP_FUNCTIONS = 15
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if os.uname().sysname == 'Darwin' else peak / 1024
+
+
+def _top_functions(profile, limit=TOP_FUNCTIONS):
+    import pstats
+    stats = pstats.Stats(profile).stats
+    rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [{'function': f"{os.path.basename(file)}:{line}({name})", 'calls': nc,
+             'total_s': round(tt, 6), 'cumulative_s': round(ct, 6)}
+            for (file, line, name), (_, nc, tt, ct, _) in rows]
+
+
+class Profiler:
+    def __init__(self, deep=False):
+        self.deep = deep
+        self.records = []
+
+    @contextmanager
+    def stage(self, name, rows=None, **attrs):
+        """Time the enclosed block; the yielded record can be filled in (e.g. rows) before it closes."""
+        record = {'stage': name, 'rows': rows, **attrs}
+        profile = None
+        if self.deep:
+            import cProfile
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            profile = cProfile.Profile()
+            profile.enable()
+        rss_before = _peak_rss_mb()
+        start, wall, cpu = time.time(), time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record['wall_s'] = time.perf_counter() - wall
+            record['cpu_s'] = time.process_time() - cpu
+            record['process_peak_rss_mb'] = _peak_rss_mb()
+            record['peak_rss_growth_mb'] = None if rss_before is None else record['process_peak_rss_mb'] - rss_before
+            record['start'] = start
+            record['pid'] = os.getpid()
+            if profile is not None:
+                profile.disable()
+                import tracemalloc
+                record['py_peak_mb'] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+                record['top_functions'] = _top_functions(profile)
+            self.records.append(record)
+
+    def add(self, record):
+        # A record measured elsewhere, e.g. in a worker process
+        self.records.append(record)
+
+    def write_jsonl(self, path):
+        with open(path, 'a') as f:
+            for record in self.records:
+                f.write(json.dumps(record, default=str) + '\n')
+
+    def write_chrome_trace(self, path):
+        # Complete ('X') events in microseconds; one row per process
+        origin = min((r['start'] for r in self.records), default=0)
+        events = [{
+            'name': r['stage'],
+            'cat': 'stage',
+            'ph': 'X',
+            'ts': (r['start'] - origin) * 1e6,
+            'dur': r['wall_s'] * 1e6,
+            'pid': r['pid'],
+            'tid': r['pid'],
+            'args': {k: v for k, v in r.items() if k not in ('stage', 'start', 'wall_s', 'pid', 'top_functions')},
+        } for r in self.records]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, default=str)
+
+    def save(self, jsonl=None, trace=None):
+        if jsonl:
+            self.write_jsonl(jsonl)
+        if trace:
+            self.write_chrome_trace(trace)
@@ -0,0 +1,181 @@
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import re
+
+import analyze_proficiency
+import create_visualizations
+import report as report_module
+from cache import ResultCache
+
+# Static report bundle: index.html, conclusion.md and the figures as SVG.
+#
+# The report is built in memory as analyze_proficiency.py builds it (stages
+# come from the result cache) and split into its sections; the figures are
+# drawn from the group summaries. Every section and figure is fingerprinted
+# (its structured content or plot inputs, plus the code that renders it) and
+# the fingerprints are kept in the bundle with the rendered section fragments.
+# A rebuild re-renders only the sections and figures whose fingerprint moved,
+# and index.html and conclusion.md are only rewritten when their text changed:
+# republishing an unchanged report touches no file, and a new cohort costs the
+# sections and figures that actually differ.
+#
+# index.html is one self-contained page with the figures inline as SVG; the
+# Markdown links the same files in figures/.
+
+DEFAULT_BUNDLE_DIR = 'report'
+MANIFEST_FILE = '.bundle_hashes.json'
+FIGURE_DPI = 100
+
+# Figures shown at the end of each section, by section anchor
+SECTION_FIGURES = {
+    'overview': ['overall_proficiency'],
+    'skill-by-skill-analysis': ['skill_comparison', 'speaking_skills_focus'],
+    'analysis-by-level-of-study': ['study_level_comparison'],
+}
+
+# Labels stay text rather than glyph outlines, which keeps the SVG small
+SVG_PARAMS = {'svg.fonttype': 'none', 'svg.hashsalt': 'report'}
+
+
+def load_manifest(bundle_dir):
+    path = os.path.join(bundle_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, bundle_dir):
+    path = os.path.join(bundle_dir, MANIFEST_FILE)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _write_if_changed(path, text):
+    # Leave the file (and its modification time) alone when the text is the same
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            if f.read() == text:
+                return False
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    return True
+
+
+def section_fingerprint(title, items):
+    """Content hash of a section's structured items and the code that renders them."""
+    digest = hashlib.sha256()
+    digest.update(inspect.getsource(report_module).encode())
+    digest.update(json.dumps([title, items], sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def render_figure(name, inputs, path):
+    import matplotlib
+    with matplotlib.rc_context(SVG_PARAMS):
+        create_visualizations.render(name, inputs, path, FIGURE_DPI)
+
+
+def _inline_svg(path, prefix):
+    # The <svg> element of a figure file without the XML prolog; every figure numbers its
+    # elements from 1, so ids and the references to them get the figure's prefix
+    with open(path, encoding='utf-8') as f:
+        svg = f.read()
+    svg = svg[svg.index('<svg'):].strip()
+    return re.sub(r'(\bid="|href="#|url\(#)', lambda match: f"{match.group(1)}{prefix}-", svg)
+
+
+def _caption(name):
+    return create_visualizations.FIGURES[name][1].capitalize()
+
+
+def build_bundle(report, summaries, bundle_dir=DEFAULT_BUNDLE_DIR, force=False):
+    """Write index.html, conclusion.md and figures/ for a Report into bundle_dir.
+
+    Returns (parts rebuilt, files written); with force every part is rebuilt.
+    """
+    figures_dir = os.path.join(bundle_dir, 'figures')
+    os.makedirs(figures_dir, exist_ok=True)
+    manifest = {} if force else load_manifest(bundle_dir)
+    previous_sections = manifest.get('sections', {})
+    previous_figures = manifest.get('figures', {})
+    rebuilt = []
+
+    # Figures: the plot inputs are small, so fingerprinting them is cheap next to drawing
+    inputs = create_visualizations.prepare_inputs(summaries)
+    figures = {}
+    for name in (name for names in SECTION_FIGURES.values() for name in names):
+        path = os.path.join(figures_dir, f"{name}.svg")
+        digest = create_visualizations.fingerprint(name, inputs[name], FIGURE_DPI, 'svg')
+        if previous_figures.get(name) != digest or not os.path.exists(path):
+            render_figure(name, inputs[name], path)
+            rebuilt.append(f"figure {name}")
+        figures[name] = digest
+
+    # Sections: reuse the stored fragments of every section whose content is unchanged
+    sections = {}
+    html_sections = []
+    markdown = [f"# {report.title.title()}"]
+    for title, entries in report.sections():
+        anchor = report_module.section_id(title)
+        heading = (title or 'Overview').title()
+        digest = section_fingerprint(title, report.section_items(entries))
+        section = previous_sections.get(anchor)
+        if section is None or section['digest'] != digest:
+            section = {'digest': digest, 'html': report.html_section(entries),
+                       'markdown': report.markdown_section(entries)}
+            rebuilt.append(f"section {anchor}")
+        sections[anchor] = section
+
+        html_parts = [section['html']]
+        markdown += [f"## {heading}", section['markdown']]
+        for name in SECTION_FIGURES.get(anchor, []):
+            svg = _inline_svg(os.path.join(figures_dir, f"{name}.svg"), name)
+            html_parts.append(f"<figure>\n{svg}\n<figcaption>{_caption(name)}</figcaption>\n</figure>")
+            markdown.append(f"![{_caption(name)}](figures/{name}.svg)")
+        html_sections.append((anchor, heading, '\n'.join(html_parts)))
+
+    written = []
+    page = report_module.html_page(report.title.title(), html_sections)
+    for filename, text in (('index.html', page), ('conclusion.md', '\n\n'.join(markdown) + '\n')):
+        if _write_if_changed(os.path.join(bundle_dir, filename), text):
+            written.append(filename)
+
+    # Only record fingerprints once every part has been written
+    save_manifest({'sections': sections, 'figures': figures}, bundle_dir)
+    return rebuilt, written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Build the static report bundle (index.html, conclusion.md and SVG figures) from the analysis. '
+                    'Other options are passed to analyze_proficiency.py.',
+        allow_abbrev=False)
+    parser.add_argument('--bundle-dir', default=DEFAULT_BUNDLE_DIR,
+                        help=f'Output directory of the bundle (default: {DEFAULT_BUNDLE_DIR})')
+    parser.add_argument('--force', action='store_true',
+                        help='Rebuild every section and figure even if its content is unchanged')
+    args, analysis_argv = parser.parse_known_args(argv)
+    analysis_args = analyze_proficiency.build_parser().parse_args(analysis_argv)
+    if analysis_args.append:
+        parser.error('--append is not supported here; append with analyze_proficiency.py, then publish the inputs')
+    cache = None if analysis_args.no_cache else ResultCache(analysis_args.cache_dir,
+                                                            analysis_args.cache_size * 1024 * 1024)
+
+    print("Loading data...")
+    summaries = analyze_proficiency.load_summaries(analysis_args, cache)
+    results = analyze_proficiency.run_stages(summaries, analysis_args, cache)
+    report = analyze_proficiency.build_report(summaries, results, analysis_args, echo=False)
+
+    rebuilt, written = build_bundle(report, summaries, args.bundle_dir, args.force)
+    print(f"Rebuilt: {', '.join(rebuilt) or 'nothing (all sections and figures unchanged)'}")
+    print(f"Report bundle in '{args.bundle_dir}': {', '.join(written) or 'no files changed'}")
+
+
+if __name__ == '__main__':
+    main()
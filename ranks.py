@@ -0,0 +1,164 @@
+from math import comb
+
+import numpy as np
+import pandas as pd
+
+from schema import group_column, level_column
+from summaries import TestResult
+
+# Rank statistics on value histograms.
+#
+# Scores and skill ratings take a handful of distinct values, so every tie
+# group is one histogram bin: mid-ranks, rank sums, U and the tie correction
+# all follow from the pooled counts in O(distinct values), after the O(n)
+# counting pass that built the histograms. No observation is ever sorted.
+#
+# Counts are arrays (..., values) sharing one sorted value axis; leading axes
+# are independent comparisons (metrics, levels), all tested in one call.
+
+# Largest n1 * n2 for which method='exact' is allowed (the DP table is (n1 + 1) x (2 n1 n2 + 1))
+MAX_EXACT_CELLS = 10_000
+# scipy's 'auto' rule: exact only without ties and when a group has at most this many values
+AUTO_EXACT_N = 8
+
+
+def midranks(pooled):
+    """Mid-rank of each value given pooled counts (..., values); ties share the average rank."""
+    pooled = np.asarray(pooled, dtype='float64')
+    return np.cumsum(pooled, axis=-1) - pooled + (pooled + 1) / 2
+
+
+def _exact_pmf(c1, pooled):
+    # Null distribution of 2 * U1 given the tie structure, by dynamic programming over the bins.
+    # Picking j of the t tied values for group 1 adds 2 j (group-2 values below) + j (t - j) to 2 U1;
+    # state is (group-1 values placed so far, 2 U1 so far), weighted by the ways to place them.
+    n1 = int(c1.sum())
+    n = int(pooled.sum())
+    n2 = n - n1
+    size = 2 * n1 * n2 + 1
+    dist = np.zeros((n1 + 1, size))
+    dist[0, 0] = 1.0
+    below = 0
+    for t in pooled.astype('int64'):
+        new = np.zeros_like(dist)
+        for placed in range(min(n1, below) + 1):
+            row = dist[placed]
+            if not row.any():
+                continue
+            below2 = below - placed
+            for j in range(min(t, n1 - placed) + 1):
+                if t - j > n2 - below2:
+                    continue
+                shift = 2 * j * below2 + j * (t - j)
+                new[placed + j, shift:] += comb(t, j) * row[:size - shift]
+        dist = new
+        below += t
+    return dist[n1] / comb(n, n1)
+
+
+def mannwhitney(counts1, counts2, values=None, alternative='two-sided', method='auto', use_continuity=True):
+    """Mann-Whitney U test of group 1 against group 2 from value histograms.
+
+    Same statistic (U of group 1) and p-values as scipy.stats.mannwhitneyu
+    on the expanded samples. method='asymptotic' uses the tie-corrected
+    normal approximation; 'exact' the exact null distribution given the
+    ties (for n1 * n2 up to MAX_EXACT_CELLS); 'auto' follows scipy and is
+    exact only without ties and with a group of at most 8 values. values, if
+    given, orders the bins; counts may have leading axes for many tests at
+    once.
+    """
+    from scipy import stats
+    counts1 = np.asarray(counts1, dtype='float64')
+    counts2 = np.asarray(counts2, dtype='float64')
+    if values is not None:
+        order = np.argsort(values)
+        counts1, counts2 = counts1[..., order], counts2[..., order]
+    pooled = counts1 + counts2
+    n1, n2 = counts1.sum(axis=-1), counts2.sum(axis=-1)
+    n = n1 + n2
+    u1 = (counts1 * midranks(pooled)).sum(axis=-1) - n1 * (n1 + 1) / 2
+    u2 = n1 * n2 - u1
+    mu = n1 * n2 / 2
+    ties = (pooled ** 3 - pooled).sum(axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sigma = np.sqrt(n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1))))
+
+    if alternative == 'two-sided':
+        u = np.maximum(u1, u2)
+    elif alternative == 'greater':
+        u = u1
+    elif alternative == 'less':
+        u = u2
+    else:
+        raise ValueError(f"Unknown alternative: {alternative!r} (expected 'two-sided', 'greater' or 'less')")
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z = (u - mu - (0.5 if use_continuity else 0)) / sigma
+    pvalue = stats.norm.sf(z)
+    if alternative == 'two-sided':
+        pvalue = 2 * pvalue
+
+    if method == 'auto':
+        exact = (np.minimum(n1, n2) <= AUTO_EXACT_N) & (pooled.max(axis=-1) <= 1)
+    elif method == 'exact':
+        if np.any(n1 * n2 > MAX_EXACT_CELLS):
+            raise ValueError(f"Exact p-values need n1 * n2 <= {MAX_EXACT_CELLS}; use method='asymptotic'")
+        exact = np.ones(np.shape(n1), dtype=bool)
+    elif method == 'asymptotic':
+        exact = np.zeros(np.shape(n1), dtype=bool)
+    else:
+        raise ValueError(f"Unknown method: {method!r} (expected 'auto', 'exact' or 'asymptotic')")
+
+    pvalue = np.array(pvalue, dtype='float64')
+    exact = np.asarray(exact)
+    c1_flat, pooled_flat = counts1.reshape(-1, counts1.shape[-1]), pooled.reshape(-1, pooled.shape[-1])
+    for i in np.flatnonzero(exact.ravel()):
+        pmf = _exact_pmf(c1_flat[i], pooled_flat[i])
+        observed = int(round(2 * u1.ravel()[i]))
+        less_equal, greater_equal = pmf[:observed + 1].sum(), pmf[observed:].sum()
+        if alternative == 'two-sided':
+            p = 2 * min(less_equal, greater_equal)
+        else:
+            p = greater_equal if alternative == 'greater' else less_equal
+        pvalue.flat[i] = p
+    pvalue = np.clip(pvalue, 0, 1)
+    if np.ndim(u1) == 0:
+        return TestResult(float(u1), float(pvalue))
+    return TestResult(u1, pvalue)
+
+
+def mannwhitney_summaries(a, b, alternative='two-sided', method='auto'):
+    """Mann-Whitney U test between two ValueSummary histograms."""
+    values = np.union1d(a._values, b._values)
+    c1 = a.counts.reindex(values, fill_value=0).to_numpy(dtype='float64')
+    c2 = b.counts.reindex(values, fill_value=0).to_numpy(dtype='float64')
+    return mannwhitney(c1, c2, values, alternative, method)
+
+
+def rank_tests(summaries, group1='Indian', group2='Foreign', by=(), metrics=None, method='auto',
+               correction=None, alpha=0.05):
+    """Mann-Whitney U of group1 against group2 for every (by..., metric) cell of a GroupedSummaries.
+
+    by may hold the level of study; cells where either group is empty give NaN.
+    With correction='holm' or 'bh' adjusted p-values and decisions are added.
+    """
+    from batch_tests import adjust_pvalues
+    by = [group_column] + [k for k in by if k != group_column]
+    cube, groups, levels, metrics, values = summaries.cube(by, metrics)
+    counts1 = cube[groups.index(group1)] if group1 in groups else np.zeros(cube.shape[1:])
+    counts2 = cube[groups.index(group2)] if group2 in groups else np.zeros(cube.shape[1:])
+    u, pvalue = mannwhitney(counts1, counts2, values, method=method)
+    n1, n2 = counts1.sum(axis=-1), counts2.sum(axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Probability that a group-1 value beats a group-2 value (ties count half)
+        common_language = u / (n1 * n2)
+    index = pd.MultiIndex.from_product([levels, metrics], names=[level_column, 'metric'])
+    table = pd.DataFrame({
+        'n1': n1.ravel(), 'n2': n2.ravel(),
+        'u': u.ravel(),
+        'common_language': common_language.ravel(),
+        'pvalue': pvalue.ravel(),
+    }, index=index)
+    if correction is not None:
+        table['p_adjusted'] = adjust_pvalues(table['pvalue'], correction)
+        table['reject'] = table['p_adjusted'] < alpha
+    return table if level_column in by else table.droplevel(level_column)
@@ -0,0 +1,187 @@
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from schema import (experience_column, key_columns, label_columns, likert_columns, read_dtypes, skill_columns,
+                    text_columns)
+
+# Raw survey exports: CSV, XLSX workbooks and Parquet, recognised by content.
+#
+# Every reader yields frames with the canonical column names from schema.py
+# (headers are matched with whitespace normalised, so a workbook whose
+# 'Reading Comprehension \n(Understanding academic text)' header wraps
+# differently still lines up) and with the label columns as categoricals,
+# exactly like pd.read_csv(path, dtype=read_dtypes()) on the CSV export.
+#
+# Workbooks are read row by row with a streaming engine: python-calamine when
+# it is installed, otherwise openpyxl in read-only mode. Every sheet whose
+# header has the key columns is read; other sheets (notes, empty) are skipped.
+
+# Every column of the survey export, under its canonical name
+known_columns = label_columns + [experience_column] + skill_columns + likert_columns + text_columns
+
+# Cell texts pd.read_csv treats as missing by default; workbook cells get the same treatment
+na_strings = {'', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+              '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'}
+
+
+def detect_format(path):
+    # By content rather than suffix: XLSX is a zip archive and Parquet starts with PAR1
+    with open(path, 'rb') as f:
+        magic = f.read(4)
+    if magic == b'PK\x03\x04':
+        return 'xlsx'
+    if magic == b'PAR1':
+        return 'parquet'
+    return 'csv'
+
+
+def _is_blank(name):
+    return name is None or not str(name).strip()
+
+
+def _header_key(name):
+    return re.sub(r'\s+', ' ', str(name)).strip().lower()
+
+
+def match_columns(headers, known):
+    """Map each raw header to its canonical name in known (None for unknown headers)."""
+    lookup = {_header_key(name): name for name in known}
+    return [lookup.get(_header_key(header)) if header is not None else None for header in headers]
+
+
+def _frame(rows, names, dtypes):
+    frame = pd.DataFrame(rows, columns=names)
+    return frame.astype({col: dtype for col, dtype in dtypes.items() if col in frame})
+
+
+def _iter_csv(path, columns, chunksize, names=None):
+    # names is the header for a headerless CSV source (e.g. the new tail of a grown export)
+    headers = names if names is not None else list(pd.read_csv(path, nrows=0).columns)
+    if hasattr(path, 'seek'):
+        path.seek(0)
+    canonical = match_columns(headers, known_columns)
+    rename = {raw: name for raw, name in zip(headers, canonical) if name is not None and raw != name}
+    canonical = [name or raw for raw, name in zip(headers, canonical)]
+    wanted = [raw for raw, name in zip(headers, canonical) if columns is None or name in columns]
+    dtypes = read_dtypes()
+    dtypes = {raw: dtypes[name] for raw, name in zip(headers, canonical) if raw in wanted and name in dtypes}
+    reader = pd.read_csv(path, usecols=wanted, dtype=dtypes, names=names,
+                         header=None if names is not None else 'infer', chunksize=chunksize)
+    for chunk in ([reader] if chunksize is None else reader):
+        yield chunk.rename(columns=rename)
+
+
+def _iter_parquet(path, columns, chunksize):
+    import pyarrow.parquet as pq
+    parquet = pq.ParquetFile(path)
+    headers = parquet.schema_arrow.names
+    canonical = match_columns(headers, known_columns)
+    wanted = [raw for raw, name in zip(headers, canonical) if columns is None or (name or raw) in columns]
+    names = [name or raw for raw, name in zip(headers, canonical) if raw in wanted]
+    dtypes = read_dtypes(names)
+    for batch in parquet.iter_batches(batch_size=chunksize or 65_536, columns=wanted):
+        frame = batch.to_pandas()
+        frame.columns = names
+        yield frame.astype(dtypes)
+
+
+def _workbook_sheets(path):
+    # (sheet name, row iterator) for every sheet
+    try:
+        from python_calamine import CalamineWorkbook
+    except ImportError:
+        from openpyxl import load_workbook
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            for sheet in workbook.worksheets:
+                yield sheet.title, sheet.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+        return
+    workbook = CalamineWorkbook.from_path(path)
+    for name in workbook.sheet_names:
+        yield name, workbook.get_sheet_by_name(name).iter_rows()
+
+
+def _iter_workbook(path, columns, chunksize):
+    for _, canonical, rows in _data_sheets(path):
+        wanted = [(i, name) for i, name in enumerate(canonical)
+                  if name is not None and (columns is None or name in columns)]
+        names = [name for _, name in wanted]
+        dtypes = read_dtypes(names)
+        batch = []
+        for row in rows:
+            row = [None if isinstance(cell, str) and cell in na_strings else cell for cell in row]
+            # Sheets often carry formatted but empty rows below the data
+            if all(cell is None for cell in row):
+                continue
+            batch.append([row[i] if i < len(row) else None for i, _ in wanted])
+            if chunksize and len(batch) == chunksize:
+                yield _frame(batch, names, dtypes)
+                batch = []
+        if batch:
+            yield _frame(batch, names, dtypes)
+
+
+def _data_sheets(path):
+    # Sheets whose header has the key columns: (header, canonical names, row iterator)
+    for _, rows in _workbook_sheets(path):
+        header = next(rows, None)
+        if header is None:
+            continue
+        canonical = match_columns(header, known_columns)
+        if set(key_columns) <= set(canonical):
+            yield header, canonical, rows
+
+
+def read_header(path):
+    """Column names of an export (the first data sheet of a workbook), without unnamed workbook cells."""
+    fmt = detect_format(path)
+    if fmt == 'xlsx':
+        for header, _, _ in _data_sheets(path):
+            # Formatted but empty cells (e.g. after the last column) come back as None; they name no column
+            return [name for name in header if not _is_blank(name)]
+        return []
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).schema_arrow.names
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def iter_raw_chunks(path, columns=None, chunksize=None, names=None):
+    """Frames of up to chunksize raw rows (one frame per sheet / file if None) from any supported export."""
+    fmt = 'csv' if names is not None else detect_format(path)
+    if fmt == 'xlsx':
+        return _iter_workbook(path, columns, chunksize)
+    if fmt == 'parquet':
+        return _iter_parquet(path, columns, chunksize)
+    return _iter_csv(path, columns, chunksize, names)
+
+
+def read_raw(path, columns=None):
+    """Read a whole CSV, XLSX (all data sheets) or Parquet export into one frame."""
+    frames = list(iter_raw_chunks(path, columns))
+    if not frames:
+        raise ValueError(f"No sheet in {path!r} has the survey's key columns")
+    if len(frames) == 1:
+        return frames[0]
+    return _concat(frames)
+
+
+def _concat(frames):
+    # Categories differ between files and sheets, so re-type after stacking
+    frame = pd.concat(frames, ignore_index=True)
+    return frame.astype(read_dtypes(list(frame.columns)))
+
+
+def read_many(paths, columns=None, workers=1):
+    """Read several exports (e.g. one workbook per institution), in parallel processes if workers > 1."""
+    paths = list(paths)
+    if workers > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as executor:
+            frames = list(executor.map(read_raw, paths, [columns] * len(paths)))
+    else:
+        frames = [read_raw(path, columns) for path in paths]
+    return frames[0] if len(frames) == 1 else _concat(frames)
@@ -0,0 +1,262 @@
+import html
+import json
+import math
+import re
+
+import numpy as np
+
+# Report formats and the file suffix each one is saved with
+REPORT_FORMATS = {
+    'text': '.txt',
+    'json': '.json',
+    'markdown': '.md',
+    'html': '.html',
+}
+
+# Self-contained page (no scripts or remote styles) for the HTML rendering
+HTML_PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{title}</title>
+<style>
+body {{ font-family: system-ui, sans-serif; max-width: 60rem; margin: 2rem auto; padding: 0 1rem; line-height: 1.5; color: #222; }}
+h2 {{ border-bottom: 1px solid #ddd; padding-bottom: 0.25rem; margin-top: 2.5rem; }}
+table {{ border-collapse: collapse; margin: 1rem 0; font-size: 0.9rem; }}
+th, td {{ border: 1px solid #ccc; padding: 0.25rem 0.5rem; text-align: right; }}
+th:first-child, td:first-child {{ text-align: left; }}
+p {{ margin: 0.25rem 0; }}
+figure {{ margin: 1.5rem 0; }}
+figure svg, figure img {{ width: 100%; height: auto; }}
+figcaption {{ color: #555; font-size: 0.9rem; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+<nav>
+<ul>
+{contents}
+</ul>
+</nav>
+{body}
+</body>
+</html>
+"""
+
+
+def _to_builtin(value):
+    # Convert numpy scalars and NaN / infinities, also inside the dicts and lists
+    # recorded per skill or level, into something strict JSON can hold
+    if isinstance(value, dict):
+        return {k: _to_builtin(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_builtin(v) for v in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def section_id(title):
+    # Anchor of a section: its title in lower case with dashes ('overview' for the untitled lead)
+    if title is None:
+        return 'overview'
+    return re.sub(r'[^a-z0-9]+', '-', title.lower()).strip('-')
+
+
+def _collapse_blank_lines(text):
+    # Collapse the blank lines left between adjacent Markdown blocks
+    text = text.strip()
+    while '\n\n\n' in text:
+        text = text.replace('\n\n\n', '\n\n')
+    return text
+
+
+def html_page(title, sections):
+    """A complete HTML document from (anchor, title, body) sections, with a table of contents."""
+    contents = '\n'.join(f'<li><a href="#{anchor}">{html.escape(heading)}</a></li>' for anchor, heading, _ in sections)
+    body = '\n'.join(f'<section id="{anchor}">\n<h2>{html.escape(heading)}</h2>\n{content}\n</section>'
+                     for anchor, heading, content in sections)
+    return HTML_PAGE.format(title=html.escape(title), contents=contents, body=body)
+
+
+def _markdown_cell(value):
+    value = _to_builtin(value)
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        return f"{value:.6g}"
+    return str(value)
+
+
+class Report:
+    """In-memory report sink.
+
+    Entries are collected as structured items (sections, headings, lines,
+    tables and recorded values) and rendered once as plain text, JSON,
+    Markdown or HTML. Nothing touches the disk until save() is called.
+    """
+
+    def __init__(self, title, rule=None, echo=True):
+        self.title = title
+        self.rule = rule or '=' * len(title)
+        self.echo = echo
+        self.entries = []
+        self.results = {}
+
+    def _add(self, kind, payload):
+        self.entries.append((kind, payload))
+        if self.echo:
+            print(self._render_text_entry(kind, payload))
+
+    # Builders
+    def section(self, title, rule=None):
+        self._add('section', {'title': title, 'rule': rule or '=' * len(title)})
+
+    def heading(self, text):
+        self._add('heading', {'text': text})
+
+    def line(self, text=''):
+        self._add('line', {'text': text})
+
+    def table(self, frame):
+        self._add('table', {'frame': frame})
+
+    def record(self, **values):
+        # Structured values that do not appear as text (used by the JSON output)
+        self.results.update({k: _to_builtin(v) for k, v in values.items()})
+
+    # Text rendering
+    @staticmethod
+    def _render_text_entry(kind, payload):
+        if kind == 'section':
+            return f"\n\n{payload['title']}\n{payload['rule']}"
+        if kind == 'heading':
+            return f"\n{payload['text']}"
+        if kind == 'table':
+            return payload['frame'].to_string()
+        return payload['text']
+
+    def to_text(self):
+        lines = [self.title, self.rule, '']
+        lines += [self._render_text_entry(kind, payload) for kind, payload in self.entries]
+        return '\n'.join(lines) + '\n'
+
+    def sections(self):
+        """Entries split at each section: [(title, entries)], the untitled lead first (title None)."""
+        sections = [(None, [])]
+        for kind, payload in self.entries:
+            if kind == 'section':
+                sections.append((payload['title'], []))
+            else:
+                sections[-1][1].append((kind, payload))
+        return sections
+
+    # Markdown rendering
+    @staticmethod
+    def _markdown_table(frame):
+        frame = frame.reset_index()
+        header = '| ' + ' | '.join(str(c) for c in frame.columns) + ' |'
+        rule = '|' + '|'.join('---' for _ in frame.columns) + '|'
+        rows = ['| ' + ' | '.join(_markdown_cell(v) for v in row) + ' |'
+                for row in frame.itertuples(index=False)]
+        return '\n'.join([header, rule] + rows)
+
+    @classmethod
+    def _markdown_lines(cls, kind, payload):
+        if kind == 'section':
+            return ['', f"## {payload['title'].title()}", '']
+        if kind == 'heading':
+            return ['', f"### {payload['text'].rstrip(':')}", '']
+        if kind == 'table':
+            return [cls._markdown_table(payload['frame']), '']
+        if payload['text'].strip():
+            return [payload['text'].strip() + '  ']
+        return []
+
+    @classmethod
+    def markdown_section(cls, entries):
+        # Markdown of one section's entries, without its title
+        return _collapse_blank_lines('\n'.join(line for entry in entries for line in cls._markdown_lines(*entry)))
+
+    def to_markdown(self):
+        out = [f"# {self.title.title()}", '']
+        for kind, payload in self.entries:
+            out += self._markdown_lines(kind, payload)
+        return _collapse_blank_lines('\n'.join(out)) + '\n'
+
+    # HTML rendering
+    @staticmethod
+    def _html_table(frame):
+        frame = frame.reset_index()
+        header = ''.join(f'<th>{html.escape(str(c))}</th>' for c in frame.columns)
+        rows = '\n'.join('<tr>' + ''.join(f'<td>{html.escape(_markdown_cell(v))}</td>' for v in row) + '</tr>'
+                         for row in frame.itertuples(index=False))
+        return f'<table>\n<thead><tr>{header}</tr></thead>\n<tbody>\n{rows}\n</tbody>\n</table>'
+
+    @classmethod
+    def html_section(cls, entries):
+        """HTML of one section's entries, without its title."""
+        out = []
+        for kind, payload in entries:
+            if kind == 'heading':
+                out.append(f"<h3>{html.escape(payload['text'].strip().rstrip(':'))}</h3>")
+            elif kind == 'table':
+                out.append(cls._html_table(payload['frame']))
+            elif payload['text'].strip():
+                out.append(f"<p>{html.escape(payload['text'].strip())}</p>")
+        return '\n'.join(out)
+
+    def to_html(self):
+        sections = [(section_id(title), (title or 'Overview').title(), self.html_section(entries))
+                    for title, entries in self.sections()]
+        return html_page(self.title.title(), sections)
+
+    # JSON rendering
+    @staticmethod
+    def _dict_item(kind, payload):
+        # JSON item of a heading, table or line (None for a blank line)
+        if kind == 'heading':
+            return {'heading': payload['text'].strip()}
+        if kind == 'table':
+            frame = payload['frame']
+            return {
+                'table': {
+                    'index': [_to_builtin(v) for v in frame.index],
+                    'columns': [str(c) for c in frame.columns],
+                    'data': [[_to_builtin(v) for v in row] for row in frame.itertuples(index=False)],
+                }
+            }
+        if payload['text'].strip():
+            return {'text': payload['text'].strip()}
+        return None
+
+    @classmethod
+    def section_items(cls, entries):
+        """JSON items of one section's entries."""
+        return [item for item in (cls._dict_item(kind, payload) for kind, payload in entries) if item is not None]
+
+    def to_dict(self):
+        sections = [{'title': title, 'items': self.section_items(entries)} for title, entries in self.sections()]
+        return {'title': self.title, 'results': self.results, 'sections': sections}
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2, allow_nan=False)
+
+    def render(self, fmt='text'):
+        if fmt == 'text':
+            return self.to_text()
+        if fmt == 'json':
+            return self.to_json()
+        if fmt == 'markdown':
+            return self.to_markdown()
+        if fmt == 'html':
+            return self.to_html()
+        raise ValueError(f"Unknown report format: {fmt!r} (expected one of {sorted(REPORT_FORMATS)})")
+
+    def save(self, path, fmt='text'):
+        # Single open/write/close for the whole report
+        with open(path, 'w') as f:
+            f.write(self.render(fmt))
@@ -0,0 +1,144 @@
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Bootstrap and permutation inference for two groups.
+#
+# Both groups are ValueSummary histograms, so a resample never needs row
+# indices: a bootstrap resample of a group is a multinomial draw of counts
+# over its distinct values, and a permutation of the pooled sample is a
+# multivariate hypergeometric draw of group-1 counts. Each batch draws a
+# (batch_size x distinct values) count matrix in one call, which keeps the
+# cost per resample O(distinct values) regardless of group size.
+#
+# Every batch gets its own child of one SeedSequence, so results depend only
+# on the seed and batch layout, not on how batches are spread over workers.
+
+DEFAULT_RESAMPLES = 10_000
+DEFAULT_BATCH_SIZE = 1_000
+
+# CIs are dicts keyed by confidence level, e.g. {0.95: (lower, upper)}
+BootstrapResult = namedtuple('BootstrapResult', ['mean_diff', 'mean_diff_ci', 'cohen_d', 'cohen_d_ci', 'n_resamples'])
+PermutationResult = namedtuple('PermutationResult', ['statistic', 'pvalue', 'stderr', 'n_resamples'])
+
+
+def _moments(counts, values, n):
+    mean = counts @ values / n
+    var = (counts @ values ** 2 - n * mean ** 2) / (n - 1)
+    return mean, var
+
+
+def _effects(counts1, counts2, values, n1, n2):
+    mean1, var1 = _moments(counts1, values, n1)
+    mean2, var2 = _moments(counts2, values, n2)
+    pooled = np.sqrt(((n1 - 1) * var1 + (n2 - 1) * var2) / (n1 + n2 - 2))
+    return mean1 - mean2, (mean1 - mean2) / pooled
+
+
+def _bootstrap_batch(job):
+    seed, size, values, p1, n1, p2, n2 = job
+    rng = np.random.default_rng(seed)
+    counts1 = rng.multinomial(n1, p1, size=size)
+    counts2 = rng.multinomial(n2, p2, size=size)
+    return _effects(counts1, counts2, values, n1, n2)
+
+
+def _permutation_batch(job):
+    seed, size, values, pooled, n1, observed = job
+    rng = np.random.default_rng(seed)
+    counts1 = rng.multivariate_hypergeometric(pooled, n1, size=size)
+    diff, _ = _effects(counts1, pooled - counts1, values, n1, pooled.sum() - n1)
+    # Two-sided, with a little slack so ties with the observed value count as extreme
+    return int(np.sum(np.abs(diff) >= abs(observed) - 1e-12))
+
+
+def _common_support(a, b):
+    values = np.union1d(a._values, b._values)
+    w1 = np.zeros(len(values), dtype='int64')
+    w2 = np.zeros(len(values), dtype='int64')
+    w1[np.searchsorted(values, a._values)] = a._weights.astype('int64')
+    w2[np.searchsorted(values, b._values)] = b._weights.astype('int64')
+    return values, w1, w2
+
+
+def _batches(n_resamples, batch_size, seed):
+    sizes = [batch_size] * (n_resamples // batch_size)
+    if n_resamples % batch_size:
+        sizes.append(n_resamples % batch_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    return list(zip(seeds, sizes))
+
+
+def _executor(workers):
+    if workers <= 1:
+        return None
+    # fork keeps the analysis script from being re-imported in every worker
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork') if 'fork' in methods else None
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+
+def _run(function, jobs, executor):
+    if executor is None:
+        return [function(job) for job in jobs]
+    return list(executor.map(function, jobs))
+
+
+def bootstrap(a, b, n_resamples=DEFAULT_RESAMPLES, confidence_levels=(0.95,), seed=0,
+              batch_size=DEFAULT_BATCH_SIZE, workers=1):
+    """Percentile bootstrap CIs for the mean difference (a - b) and Cohen's d."""
+    values, w1, w2 = _common_support(a, b)
+    n1, n2 = int(w1.sum()), int(w2.sum())
+    jobs = [(s, size, values, w1 / n1, n1, w2 / n2, n2) for s, size in _batches(n_resamples, batch_size, seed)]
+    executor = _executor(workers)
+    try:
+        results = _run(_bootstrap_batch, jobs, executor)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    diffs = np.concatenate([r[0] for r in results])
+    ds = np.concatenate([r[1] for r in results])
+    tails = {level: (1 - level) / 2 * 100 for level in confidence_levels}
+    observed_diff, observed_d = _effects(w1[None, :], w2[None, :], values, n1, n2)
+    return BootstrapResult(
+        mean_diff=float(observed_diff[0]),
+        mean_diff_ci={level: tuple(np.percentile(diffs, [t, 100 - t])) for level, t in tails.items()},
+        cohen_d=float(observed_d[0]),
+        cohen_d_ci={level: tuple(np.percentile(ds, [t, 100 - t])) for level, t in tails.items()},
+        n_resamples=len(diffs),
+    )
+
+
+def permutation_test(a, b, n_resamples=DEFAULT_RESAMPLES, seed=0, batch_size=DEFAULT_BATCH_SIZE,
+                     workers=1, precision=None, batches_per_round=4):
+    """Two-sided permutation p-value for the difference in means.
+
+    With precision set, batches run in rounds of batches_per_round and the
+    test stops as soon as the Monte Carlo standard error of the p-value
+    drops below it (n_resamples is then an upper bound).
+    """
+    values, w1, w2 = _common_support(a, b)
+    n1 = int(w1.sum())
+    pooled = w1 + w2
+    observed, _ = _effects(w1[None, :], w2[None, :], values, n1, int(w2.sum()))
+    observed = float(observed[0])
+
+    jobs = [(s, size, values, pooled, n1, observed) for s, size in _batches(n_resamples, batch_size, seed)]
+    round_size = len(jobs) if precision is None else batches_per_round
+    executor = _executor(workers)
+    extreme = done = 0
+    try:
+        for start in range(0, len(jobs), round_size):
+            chunk = jobs[start:start + round_size]
+            extreme += sum(_run(_permutation_batch, chunk, executor))
+            done += sum(job[1] for job in chunk)
+            pvalue = (extreme + 1) / (done + 1)
+            stderr = np.sqrt(pvalue * (1 - pvalue) / done)
+            if precision is not None and stderr < precision:
+                break
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return PermutationResult(observed, pvalue, float(stderr), done)
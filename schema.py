@@ -0,0 +1,147 @@
+import numpy as np
+import pandas as pd
+
+# Column names, value mappings and the typed (compact) schema shared by the
+# analysis and plotting scripts
+
+# Rows missing any of these are dropped before analysis
+key_columns = ['Nationality', 'First Language', 'Level of Study']
+
+# Convert skill levels to numeric values
+# (labels are matched case-insensitively at parse time, so 'Very strong' maps like 'Very Strong')
+skill_mapping = {
+    'Very Weak': 1,
+    'Weak': 2,
+    'Moderate': 3,
+    'Strong': 4,
+    'Very Strong': 5,
+}
+
+# Self-rated skill columns that make up the composite score
+skill_columns = [
+    'Reading Comprehension \n(Understanding academic text)',
+    'Listening Skills (Understanding lectures and spoken English)',
+    'Speaking Skills (Fluency and confidence in spoken communication)',
+    'Writing Skills (Ability to write academic papers and assignments)'
+]
+
+speaking_column = 'Speaking Skills (Fluency and confidence in spoken communication)'
+
+# Attitude statements answered on a five-point agreement scale
+likert_levels = ['Strongly disagree', 'Disagree', 'Neutral', 'Agree', 'Strongly agree']
+likert_columns = [
+    'I have recived formal English language education since childhood.',
+    'My school education prepared me well for English-medium university studies.',
+    'My English proficiency has improved since I started my university studies.',
+    'English is necessary for my academics success in India.',
+    'Even without strong English proficiency, I believe I can succeed in my studies.',
+    'I regularly parctice English outside my academics studies. (Watching moveis, reading books, or speaking with friends)',
+    'My motivation to learn English is influenced by career opportunities.',
+    'The region I come from has influenced my English Proficiency.',
+    'I actively seek opportunities to improve my English skills. ( joining language courses, speaking clubs, or tutoring)',
+    'In a multilingual country like India, English is necessary for effective communication.',
+    "My home country's education system provided strong English Language training.",
+    'I think foreign students face more language difficulties compared to Indian students in Indian Universities.',
+    'Indian students also face challenges with academic English despite growing up in a multilingual environment.',
+    'Language support programs (such as English courses, peer tutoring, or writing centers) should be improved in Indian Universities.',
+    'My university provides enough language support for students struggling with English.',
+    'More resources (such as language courses, tutoring, or language labs) should be available to help students improve their English proficiency.',
+    'I believe my English skills will improve through social interaction with peers and faculty members.',
+    'Language barriers have affected my ability to form friendships and participate in university activities.',
+]
+
+experience_column = 'How long have you been studying in English-medium Institution?'
+experience_levels = ['Less than 1 year', '1-5 years', 'More than 5 years']
+
+# Free-text answers; only read by the text stage (texts.py), never carried with the scored rows
+text_columns = [
+    'What challenges have you faced in learning or using English at your university ?',
+    'What strategies or resources have helped you improve your English proficiency ?',
+    'Do you think your university should implement new languages support programs? Yes, what kind ?',
+]
+
+# Columns the statistical analysis actually reads from the raw export
+analysis_columns = key_columns + skill_columns
+
+# Columns kept per row in the processed data: every survey answer except the free text
+row_columns = ['Nationality', 'First Language', 'University Name', 'Level of Study', experience_column] \
+    + skill_columns + likert_columns
+
+# Columns added during cleaning and scoring
+group_column = 'Student_Type'
+level_column = 'Level of Study'
+score_column = 'Proficiency_Score'
+
+# Compact dtypes
+likert_dtype = pd.CategoricalDtype(likert_levels, ordered=True)
+experience_dtype = pd.CategoricalDtype(experience_levels, ordered=True)
+skill_dtype = 'Int8'        # 1-5 with a missing-value mask
+# Composite score: ~7 significant digits, finer than the report's 4 decimals. The
+# plain mean of four rated skills is exact on the quarter grid; means over three
+# skills and weighted means (--skill-weights) are rounded to the nearest float32.
+score_dtype = 'float32'
+label_columns = ['Nationality', 'First Language', 'University Name', 'Level of Study']
+
+
+def normalize_labels(categories):
+    """Labels as matched against the schema: text, trimmed, lower case."""
+    return pd.Index(categories).astype(str).str.strip().str.lower()
+
+
+def _recode(raw, table, missing):
+    # Translate a categorical column through its (few) categories rather than
+    # row by row; table holds one target per category, `missing` is for NaN rows
+    lookup = np.append(np.asarray(table), missing)
+    return lookup[raw.cat.codes.to_numpy()]
+
+
+def parse_skill(series):
+    """Skill labels -> Int8 ratings 1-5; unknown labels and blanks become <NA>."""
+    lookup = {label.lower(): score for label, score in skill_mapping.items()}
+    raw = series.astype('category')
+    table = normalize_labels(raw.cat.categories).map(lambda v: lookup.get(v, np.nan)).to_numpy(dtype='float64')
+    return pd.Series(_recode(raw, table, np.nan), index=series.index, name=series.name).astype(skill_dtype)
+
+
+def parse_ordinal(series, dtype):
+    """Labels -> ordered categorical with int8 codes, matching case-insensitively."""
+    raw = series.astype('category')
+    table = normalize_labels(dtype.categories).get_indexer(normalize_labels(raw.cat.categories))
+    codes = _recode(raw, table, -1).astype('int8')
+    return pd.Series(pd.Categorical.from_codes(codes, dtype=dtype), index=series.index, name=series.name)
+
+
+def apply_schema(df):
+    # Convert whichever known columns are present to their compact dtypes
+    for col in skill_columns:
+        if col in df and df[col].dtype != skill_dtype:
+            df[col] = parse_skill(df[col])
+    for col in likert_columns:
+        if col in df:
+            df[col] = parse_ordinal(df[col], likert_dtype)
+    if experience_column in df:
+        df[experience_column] = parse_ordinal(df[experience_column], experience_dtype)
+    for col in label_columns + [group_column]:
+        if col in df and df[col].dtype != 'category':
+            df[col] = df[col].astype('category')
+    return df
+
+
+def read_dtypes(columns=None):
+    """dtype mapping for pd.read_csv so labels are parsed straight into categoricals."""
+    # Free text is interned too: each distinct answer is stored once, rows hold integer codes
+    dtypes = {col: 'category'
+              for col in label_columns + skill_columns + likert_columns + [experience_column] + text_columns}
+    if columns is not None:
+        dtypes = {col: dtype for col, dtype in dtypes.items() if col in columns}
+    return dtypes
+
+
+def processed_dtypes():
+    """dtype mapping for reading the processed file back with its compact schema."""
+    dtypes = {col: 'category' for col in label_columns + [group_column]}
+    dtypes.update({col: skill_dtype for col in skill_columns})
+    dtypes.update({col: likert_dtype for col in likert_columns})
+    dtypes[experience_column] = experience_dtype
+    dtypes[score_column] = score_dtype
+    return dtypes
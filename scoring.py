@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+
+from schema import normalize_labels, score_column, score_dtype, skill_columns, skill_dtype, skill_mapping
+
+# Composite proficiency score.
+#
+# The skill labels of all skill columns go through one label -> rating table,
+# built over the union of the columns' categories (a few dozen distinct labels
+# whatever the number of rows), and the category codes of each column are
+# gathered through it into a single (rows x skills) int8 matrix, 0 meaning
+# unrated. The score is the weighted mean of the rated skills, accumulated
+# column by column into two float64 buffers, so no float copy of the skill
+# columns is ever made, and stored as float32: exact for the plain mean of
+# four skills, rounded to ~7 significant digits otherwise (e.g. weighted). Rows with fewer rated skills
+# than min_answered are left unscored. Labels that are present but not in
+# skill_mapping are counted per skill instead of quietly becoming NaN.
+
+UNMAPPED_NAMES = ['metric', 'label']
+
+
+def unmapped_counts(found=None):
+    """(metric, label) -> responses Series from a {(metric, label): count} dict (empty if None)."""
+    found = found or {}
+    index = pd.MultiIndex.from_tuples(list(found), names=UNMAPPED_NAMES) if found else \
+        pd.MultiIndex.from_arrays([[], []], names=UNMAPPED_NAMES)
+    return pd.Series(list(found.values()), index=index, dtype='int64')
+
+
+class SkillScorer:
+    """Skill labels -> Int8 ratings 1-5 and the weighted composite score.
+
+    weights holds one non-negative weight per skill column (default: equal
+    weights, the plain mean of the rated skills); a row needs at least
+    min_answered rated skills to be scored.
+    """
+
+    def __init__(self, weights=None, min_answered=1):
+        weights = np.ones(len(skill_columns)) if weights is None else np.asarray(weights, dtype='float64')
+        if weights.shape != (len(skill_columns),) or (weights < 0).any() or not weights.sum() > 0:
+            raise ValueError(f"Expected {len(skill_columns)} non-negative skill weights, not all zero "
+                             f"(got {[float(w) for w in np.atleast_1d(weights)]})")
+        if not 1 <= min_answered <= len(skill_columns):
+            raise ValueError(f"The minimum number of rated skills must be between 1 and {len(skill_columns)} "
+                             f"(got {min_answered})")
+        self.weights = weights
+        self.min_answered = int(min_answered)
+
+    def key(self):
+        # Everything that changes the scores, for cache keys and stored state
+        return tuple(float(w) for w in self.weights), self.min_answered
+
+    def is_default(self):
+        return self.key() == SkillScorer().key()
+
+    def ratings(self, frame, counts=None):
+        """(rows x skills) int8 ratings of frame, 0 where unrated, and the unmapped label counts.
+
+        counts, if given, is the number of responses each row of frame stands
+        for. Columns already parsed to Int8 are taken as they are.
+        """
+        columns = [frame[col] if frame[col].dtype == skill_dtype else frame[col].astype('category')
+                   for col in skill_columns]
+        categories = [col.cat.categories for col in columns if isinstance(col.dtype, pd.CategoricalDtype)]
+
+        # One table for every label of every column
+        labels = categories[0].append(categories[1:]).unique() if categories else pd.Index([])
+        normalized = normalize_labels(labels)
+        lookup = {label.lower(): score for label, score in skill_mapping.items()}
+        table = np.array([lookup.get(label, 0) for label in normalized], dtype='int8')
+        unknown = (table == 0) & (normalized != '')
+
+        ratings = np.zeros((len(frame), len(skill_columns)), dtype='int8', order='F')
+        found = {}
+        for j, (name, col) in enumerate(zip(skill_columns, columns)):
+            if col.dtype == skill_dtype:
+                ratings[:, j] = col.fillna(0).to_numpy(dtype='int8')
+                continue
+            position = labels.get_indexer(col.cat.categories)
+            codes = col.cat.codes.to_numpy()
+            # Code -1 (blank) picks the 0 appended at the end
+            ratings[:, j] = np.append(table[position], 0)[codes]
+            if unknown[position].any():
+                present = codes >= 0
+                tally = np.bincount(codes[present], minlength=len(position),
+                                    weights=None if counts is None else np.asarray(counts)[present])
+                for i in np.flatnonzero(unknown[position] & (tally > 0)):
+                    found[(name, col.cat.categories[i])] = int(tally[i])
+        return ratings, unmapped_counts(found)
+
+    def score(self, ratings):
+        """Weighted mean of the rated skills of every row (NaN when too few are rated).
+
+        Computed in float64 and rounded to float32 (score_dtype), which every
+        statistic is then computed from.
+        """
+        total = np.zeros(len(ratings))
+        weight = np.zeros(len(ratings))
+        answered = np.zeros(len(ratings), dtype='int8')
+        for j, w in enumerate(self.weights):
+            rated = ratings[:, j] > 0
+            answered += rated
+            if w:
+                total += w * ratings[:, j]
+                weight += w * rated
+        with np.errstate(invalid='ignore', divide='ignore'):
+            scores = (total / weight).astype(score_dtype)
+        scores[answered < self.min_answered] = np.nan
+        return scores
+
+    def apply(self, df, counts=None):
+        """Replace the skill labels of df by Int8 ratings and add the score column, in place.
+
+        Returns the unmapped label counts.
+        """
+        ratings, unmapped = self.ratings(df, counts)
+        for j, col in enumerate(skill_columns):
+            df[col] = pd.arrays.IntegerArray(ratings[:, j], ratings[:, j] == 0)
+        df[score_column] = self.score(ratings)
+        return unmapped
@@ -0,0 +1,244 @@
+import argparse
+import json
+import os
+import socketserver
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+import analyze_proficiency
+from cache import DEFAULT_CACHE_DIR, DEFAULT_CACHE_SIZE, ResultCache
+
+# Resident analysis service.
+#
+# Libraries are imported once and the group summaries of every dataset seen
+# are kept in memory, so a report request only runs the (mostly cached)
+# stages and renders the write-up. Requests are plain HTTP, over TCP or a
+# Unix socket:
+#
+#   GET  /health
+#   GET  /report?input=data/Data%20Collection.csv&format=json&alpha=0.01
+#   POST /report  {"input": ["a.xlsx", "b.xlsx"], "format": "json", "alpha": 0.01}
+#
+# Report options are the command-line options of analyze_proficiency.py that
+# shape the analysis (REPORT_OPTIONS, full names only): options naming files
+# the server would write are not accepted, so a client never chooses paths
+# under the service user's permissions, and --resamples and --workers are
+# capped so one request cannot tie up the server.
+
+DEFAULT_PORT = 8765
+DEFAULT_PROCESSED_DIR = os.path.join('.cache', 'processed')
+REPORT_OPTIONS = ['input', 'format', 'stream', 'backend', 'chunksize', 'skill_weights', 'min_skills', 'resamples',
+                  'workers', 'seed', 'precision', 'alpha', 'epsilon', 'min_level_size', 'min_group_size',
+                  'max_shapiro_n']
+DEFAULT_MAX_RESAMPLES = 100_000
+DEFAULT_MAX_REQUEST_WORKERS = 4
+CONTENT_TYPES = {
+    'text': 'text/plain; charset=utf-8',
+    'json': 'application/json',
+    'markdown': 'text/markdown; charset=utf-8',
+    'html': 'text/html; charset=utf-8',
+}
+
+
+class AnalysisService:
+    """Warm datasets plus a worker pool that turns report options into rendered reports."""
+
+    def __init__(self, cache=None, workers=4, processed_dir=DEFAULT_PROCESSED_DIR, max_datasets=8,
+                 max_resamples=DEFAULT_MAX_RESAMPLES, max_request_workers=DEFAULT_MAX_REQUEST_WORKERS):
+        self.cache = cache
+        self.max_resamples = max_resamples
+        self.max_request_workers = max_request_workers
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.processed_dir = processed_dir
+        self.max_datasets = max_datasets
+        self._datasets = OrderedDict()   # data key -> summaries, least recently used first
+        self._digests = {}               # (input versions (path, size, mtime), scoring) -> data key
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _data_key(self, paths, scorer):
+        # Hash each input file once per version and scoring instead of on every request
+        paths = [paths] if isinstance(paths, str) else paths
+        versions = []
+        for path in paths:
+            stat = os.stat(path)
+            versions.append((os.path.abspath(path), stat.st_size, stat.st_mtime_ns))
+        versions = (tuple(versions), scorer.key())
+        if versions not in self._digests:
+            self._digests[versions] = analyze_proficiency.dataset_key(paths, scorer)
+        return self._digests[versions]
+
+    def summaries(self, args, data_key):
+        with self._lock:
+            if data_key in self._datasets:
+                self._datasets.move_to_end(data_key)
+                return self._datasets[data_key]
+            lock = self._locks.setdefault(data_key, threading.Lock())
+        # One load per dataset, however many requests for it arrive at once
+        with lock:
+            with self._lock:
+                if data_key in self._datasets:
+                    return self._datasets[data_key]
+            summaries = analyze_proficiency.load_summaries(args, self.cache, data_key)
+            with self._lock:
+                self._datasets[data_key] = summaries
+                while len(self._datasets) > self.max_datasets:
+                    self._datasets.popitem(last=False)
+        return summaries
+
+    def parse_options(self, options):
+        # Report options map onto the analysis command line, so they are validated the same way;
+        # the parser takes full option names only, so no prefix can reach an option not listed
+        rejected = [name for name in options if name.replace('-', '_') not in REPORT_OPTIONS]
+        if rejected:
+            raise ValueError(f"Report options not accepted by the service: {', '.join(sorted(rejected))} "
+                             f"(accepted: {', '.join(REPORT_OPTIONS)})")
+        argv = []
+        for name, value in options.items():
+            flag = '--' + name.replace('_', '-')
+            if value is True:
+                argv.append(flag)
+            elif isinstance(value, list):
+                argv += [flag] + [str(v) for v in value]
+            elif value is not False and value is not None:
+                argv += [flag, str(value)]
+        try:
+            args = analyze_proficiency.build_parser(allow_abbrev=False).parse_args(argv)
+            scorer = analyze_proficiency.make_scorer(args)
+        except (SystemExit, ValueError):
+            raise ValueError(f"Invalid report options: {options}")
+        if not 0 <= args.resamples <= self.max_resamples:
+            raise ValueError(f"resamples must be between 0 and {self.max_resamples} (got {args.resamples})")
+        if not 1 <= args.workers <= self.max_request_workers:
+            raise ValueError(f"workers must be between 1 and {self.max_request_workers} (got {args.workers})")
+        # Each dataset (and scoring) gets its own processed file, so concurrent loads never share one
+        os.makedirs(self.processed_dir, exist_ok=True)
+        args.processed = os.path.join(self.processed_dir, self._data_key(args.input, scorer)[:16] + '.parquet')
+        return args
+
+    def report(self, options):
+        """Run the analysis for one set of report options; returns (format, rendered report)."""
+        args = self.parse_options(options)
+        data_key = self._data_key(args.input, analyze_proficiency.make_scorer(args))
+        summaries = self.summaries(args, data_key)
+        results = analyze_proficiency.run_stages(summaries, args, self.cache, data_key)
+        report = analyze_proficiency.build_report(summaries, results, args, echo=False)
+        return args.format, report.render(args.format)
+
+    def submit(self, options):
+        return self.pool.submit(self.report, options)
+
+    def close(self):
+        self.pool.shutdown()
+
+
+class Handler(BaseHTTPRequestHandler):
+    service = None
+
+    def address_string(self):
+        # Unix socket peers have no (host, port) address
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def _send(self, status, body, content_type='application/json'):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, status, message):
+        self._send(status, json.dumps({'error': message}))
+
+    def _report(self, options):
+        try:
+            fmt, body = self.service.submit(options).result()
+        except ValueError as e:
+            self._error(400, str(e))
+        except FileNotFoundError as e:
+            self._error(404, str(e))
+        except Exception as e:
+            self._error(500, f"{type(e).__name__}: {e}")
+        else:
+            self._send(200, body, CONTENT_TYPES[fmt])
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/health':
+            self._send(200, json.dumps({'status': 'ok', 'datasets': len(self.service._datasets)}))
+        elif url.path == '/report':
+            self._report(dict(parse_qsl(url.query)))
+        else:
+            self._error(404, f"Unknown path: {url.path}")
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != '/report':
+            self._error(404, f"Unknown path: {url.path}")
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            options = json.loads(self.rfile.read(length) or b'{}')
+        except json.JSONDecodeError as e:
+            self._error(400, f"Invalid JSON body: {e}")
+            return
+        if not isinstance(options, dict):
+            self._error(400, "Request body must be a JSON object of report options")
+            return
+        self._report(options)
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(service, host='127.0.0.1', port=DEFAULT_PORT, socket_path=None):
+    handler = type('ServiceHandler', (Handler,), {'service': service})
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        return ThreadingUnixHTTPServer(socket_path, handler)
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve proficiency reports from a resident process.')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'TCP port (default: {DEFAULT_PORT})')
+    parser.add_argument('--socket', default=None, help='Listen on this Unix socket instead of TCP')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Reports computed at once (default: the CPU count)')
+    parser.add_argument('--max-datasets', type=int, default=8,
+                        help='Datasets kept in memory; least recently used are dropped (default: 8)')
+    parser.add_argument('--processed-dir', default=DEFAULT_PROCESSED_DIR,
+                        help=f'Where processed data is written per dataset (default: {DEFAULT_PROCESSED_DIR})')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help=f'Directory for cached stage results (default: {DEFAULT_CACHE_DIR})')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE // (1024 * 1024),
+                        help='Cache size limit in MB (default: %(default)s)')
+    parser.add_argument('--no-cache', action='store_true', help='Keep only the in-memory datasets')
+    parser.add_argument('--max-resamples', type=int, default=DEFAULT_MAX_RESAMPLES,
+                        help='Largest resamples option a request may ask for (default: %(default)s)')
+    parser.add_argument('--max-request-workers', type=int, default=DEFAULT_MAX_REQUEST_WORKERS,
+                        help='Largest workers option a request may ask for (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    cache = None if args.no_cache else ResultCache(args.cache_dir, args.cache_size * 1024 * 1024)
+    service = AnalysisService(cache, args.workers, args.processed_dir, args.max_datasets, args.max_resamples,
+                              args.max_request_workers)
+    server = make_server(service, args.host, args.port, args.socket)
+    print(f"Serving reports on {args.socket or f'http://{args.host}:{args.port}'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == '__main__':
+    main()
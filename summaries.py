@@ -0,0 +1,370 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from schema import group_column, level_column, score_column, skill_columns
+
+
+TestResult = namedtuple('TestResult', ['statistic', 'pvalue'])
+
+
+class ValueSummary:
+    """Histogram of one metric within one group.
+
+    Skill ratings and the composite score only take a handful of distinct
+    values, so a value -> count table is an exact, compact stand-in for the
+    raw column: every statistic the report needs can be derived from it.
+    """
+
+    def __init__(self, values, weights):
+        values = np.asarray(values, dtype='float64')
+        weights = np.asarray(weights, dtype='float64')
+        keep = weights > 0
+        order = np.argsort(values[keep])
+        self._values = values[keep][order]
+        self._weights = weights[keep][order]
+
+    @property
+    def counts(self):
+        return pd.Series(self._weights.astype('int64'), index=self._values)
+
+    @property
+    def n(self):
+        return int(self._weights.sum())
+
+    @property
+    def mean(self):
+        return float(np.dot(self._values, self._weights) / self._weights.sum())
+
+    @property
+    def var(self):
+        # Sample variance (ddof=1), matching Series.var()
+        deviations = self._values - self.mean
+        return float(np.dot(deviations ** 2, self._weights) / (self._weights.sum() - 1))
+
+    @property
+    def std(self):
+        return float(np.sqrt(self.var))
+
+
+def histogram_quantile(counts, values, q):
+    """Quantile q of every histogram in counts (..., values) at once, interpolated as in Series.quantile().
+
+    Empty histograms give NaN.
+    """
+    order = np.argsort(values)
+    counts, values = counts[..., order], np.asarray(values, dtype='float64')[order]
+    n = counts.sum(axis=-1)
+    cumulative = np.cumsum(counts, axis=-1)
+    h = np.maximum(n - 1, 0) * q
+    lower = np.floor(h)
+
+    def value_at(position):
+        # Value of the position-th element (0-based) of each sorted sample
+        index = (cumulative <= position[..., None]).sum(axis=-1)
+        return values[np.minimum(index, len(values) - 1)]
+
+    lo = value_at(lower)
+    hi = value_at(np.minimum(lower + 1, np.maximum(n - 1, 0)))
+    return np.where(n > 0, lo + (hi - lo) * (h - lower), np.nan)
+
+
+QUARTILES = (0.25, 0.5, 0.75)
+
+
+def quantile_table(counts, values, q=QUARTILES):
+    """min, the q quantiles and max of every histogram in counts (..., values), by describe() column name."""
+    q = [0.0] + list(q) + [1.0]
+    columns = ['min'] + [f"{p * 100:g}%" for p in q[1:-1]] + ['max']
+    return {column: histogram_quantile(counts, values, p) for column, p in zip(columns, q)}
+
+
+class GroupedSummaries:
+    """Per-(Student_Type, Level of Study) histograms for the score and every skill.
+
+    The grouping keys are factorized once per frame (or chunk) and a single
+    bincount over (cell, metric, value) fills every histogram at once, so no
+    boolean mask over the rows is ever rebuilt. Queries are answered from a
+    dense (group, level, metric, value) count cube that is built lazily and
+    cached, together with the ValueSummary objects handed out.
+
+    Built either from an in-memory frame or incrementally from chunks; both
+    routes give the same tables, so the report does not care which was used.
+    """
+
+    keys = [group_column, level_column]
+    metrics = [score_column] + skill_columns
+    unmapped = None              # summaries pickled before unmapped labels were counted have none
+
+    def __init__(self):
+        self.counts = None       # (group, level, metric, value) -> count
+        self.rows = None         # (group, level) -> number of rows, scored or not
+        self.levels = []         # levels in order of first appearance
+        self.unmapped = None     # (metric, label) -> responses with a skill label outside skill_mapping
+        self.source_shape = None
+        self._cube = None
+        self._cache = {}
+
+    @classmethod
+    def from_frame(cls, frame, source_shape=None):
+        summaries = cls()
+        summaries.add(frame)
+        summaries.source_shape = source_shape
+        return summaries
+
+    def add(self, frame, weights=None):
+        # Fold a cleaned, scored frame into the running tables in one pass; weights, if given,
+        # is the number of rows each row of frame stands for (frame holds pre-aggregated rows)
+        group_codes, group_labels = pd.factorize(frame[group_column])
+        level_codes, level_labels = pd.factorize(frame[level_column])
+        n_cells = len(group_labels) * len(level_labels)
+        cell = group_codes * len(level_labels) + level_codes
+
+        # Rows x metrics matrix, with every distinct value factorized together
+        matrix = np.column_stack([frame[m].to_numpy(dtype='float64', na_value=np.nan) for m in self.metrics])
+        value_codes, value_labels = pd.factorize(matrix.ravel())
+        value_codes = value_codes.reshape(matrix.shape)
+        n_values = max(len(value_labels), 1)
+
+        flat = (cell[:, None] * len(self.metrics) + np.arange(len(self.metrics))) * n_values + value_codes
+        valid = value_codes >= 0
+        if weights is None:
+            binned = np.bincount(flat[valid], minlength=n_cells * len(self.metrics) * n_values)
+        else:
+            weights = np.asarray(weights, dtype='float64')
+            binned = np.bincount(flat[valid], weights=np.broadcast_to(weights[:, None], flat.shape)[valid],
+                                 minlength=n_cells * len(self.metrics) * n_values).astype('int64')
+        cube = binned.reshape(len(group_labels), len(level_labels), len(self.metrics), n_values)
+
+        nonzero = np.nonzero(cube)
+        index = pd.MultiIndex.from_arrays([
+            np.asarray(group_labels)[nonzero[0]],
+            np.asarray(level_labels)[nonzero[1]],
+            np.asarray(self.metrics, dtype=object)[nonzero[2]],
+            np.asarray(value_labels, dtype='float64')[nonzero[3]],
+        ], names=self.keys + ['metric', 'value'])
+        counts = pd.Series(cube[nonzero], index=index)
+
+        row_cube = np.bincount(cell, weights=weights, minlength=n_cells).astype('int64')
+        row_cube = row_cube.reshape(len(group_labels), len(level_labels))
+        rows = pd.Series(row_cube.ravel(), index=pd.MultiIndex.from_product(
+            [np.asarray(group_labels), np.asarray(level_labels)], names=self.keys))
+
+        if self.counts is None:
+            self.counts, self.rows = counts, rows
+        else:
+            self.counts = self.counts.add(counts, fill_value=0)
+            self.rows = self.rows.add(rows, fill_value=0)
+        self._cube = None
+        self._cache = {}
+
+        for level in level_labels:
+            if level not in self.levels:
+                self.levels.append(level)
+
+    def add_unmapped(self, counts):
+        # Fold in the unmapped label counts of a frame or chunk (from SkillScorer.apply)
+        if self.unmapped is None:
+            self.unmapped = counts
+        else:
+            self.unmapped = self.unmapped.add(counts, fill_value=0).astype('int64')
+
+    def unmapped_count(self):
+        return 0 if self.unmapped is None else int(self.unmapped.sum())
+
+    def _dense(self):
+        # Dense count cube plus the labels of each axis, built once per state
+        if self._cube is None:
+            index = self.counts.index.remove_unused_levels()
+            shape = tuple(len(level) for level in index.levels)
+            cube = np.zeros(shape)
+            np.add.at(cube, tuple(index.codes), self.counts.to_numpy(dtype='float64'))
+            labels = [list(level) for level in index.levels]
+            self._cube = cube, labels
+        return self._cube
+
+    def _select(self, metric, group=None, level=None):
+        cube, (groups, levels, metrics, values) = self._dense()
+        cube = cube[:, :, metrics.index(metric), :]
+        if group is not None:
+            cube = cube[[groups.index(group)] if group in groups else [], :, :]
+        if level is not None:
+            cube = cube[:, [levels.index(level)] if level in levels else [], :]
+        return cube, groups, levels, np.asarray(values)
+
+    def row_count(self, group=None, level=None):
+        rows = self.rows
+        if group is not None:
+            rows = rows[rows.index.get_level_values(group_column) == group]
+        if level is not None:
+            rows = rows[rows.index.get_level_values(level_column) == level]
+        return int(rows.sum())
+
+    def groups(self):
+        return sorted(self.rows.index.get_level_values(group_column).unique())
+
+    def summary(self, metric=score_column, group=None, level=None):
+        key = (metric, group, level)
+        if key not in self._cache:
+            cube, _, _, values = self._select(metric, group, level)
+            self._cache[key] = ValueSummary(values, cube.sum(axis=(0, 1)))
+        return self._cache[key]
+
+    def cube(self, by=(group_column,), metrics=None):
+        """(group, level, metric, value) counts with the keys not in by summed out.
+
+        Returns (counts, groups, levels, metrics, values); a summed-out key has
+        the single label None.
+        """
+        cube, (groups, levels, all_metrics, values) = self._dense()
+        metrics = list(metrics or self.metrics)
+        cube = cube[:, :, [all_metrics.index(m) for m in metrics], :]
+        if level_column not in by:
+            cube = cube.sum(axis=1, keepdims=True)
+            levels = [None]
+        if group_column not in by:
+            cube = cube.sum(axis=0, keepdims=True)
+            groups = [None]
+        return cube, groups, levels, metrics, np.asarray(values)
+
+    def table(self, by=(group_column,), metrics=None):
+        """n, mean, std, var and standard error for every (by..., metric) cell at once."""
+        cube, groups, levels, metrics, values = self.cube(by, metrics)
+        n = cube.sum(axis=-1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = (cube @ values) / n
+            var = (cube * (values - mean[..., None]) ** 2).sum(axis=-1) / (n - 1)
+        index = pd.MultiIndex.from_product([groups, levels, metrics], names=self.keys + ['metric'])
+        table = pd.DataFrame({
+            'n': n.ravel().astype('int64'),
+            'mean': mean.ravel(),
+            'std': np.sqrt(var.ravel()),
+            'var': var.ravel(),
+        }, index=index)
+        table['se'] = table['std'] / np.sqrt(table['n'])
+        drop = [k for k in self.keys if k not in by]
+        return table.droplevel(drop) if drop else table
+
+    def quantiles(self, by=(group_column,), metrics=None, q=QUARTILES):
+        """min, the q quantiles and max of every (by..., metric) cell, read off the cumulative counts."""
+        cube, groups, levels, metrics, values = self.cube(by, metrics)
+        index = pd.MultiIndex.from_product([groups, levels, metrics], names=self.keys + ['metric'])
+        table = pd.DataFrame({column: cells.ravel() for column, cells in quantile_table(cube, values, q).items()},
+                             index=index)
+        drop = [k for k in self.keys if k not in by]
+        return table.droplevel(drop) if drop else table
+
+    def histograms(self, by=(group_column,), metrics=None):
+        """Non-empty (by..., metric, value) counts as a long frame, for plotting from the summaries."""
+        cube, groups, levels, metrics, values = self.cube(by, metrics)
+        index = pd.MultiIndex.from_product([groups, levels, metrics, values], names=self.keys + ['metric', 'value'])
+        frame = pd.Series(cube.ravel(), index=index, name='count').reset_index()
+        frame = frame[frame['count'] > 0].drop(columns=[k for k in self.keys if k not in by])
+        return frame.astype({'count': 'int64'}).reset_index(drop=True)
+
+    def to_frame(self):
+        # Row totals (metric and value null, levels in order) followed by every histogram count
+        rows = self.rows.reindex(self.levels, level=level_column).reset_index(name='count')
+        rows['metric'], rows['value'] = None, np.nan
+        counts = self.counts.reset_index(name='count')
+        frame = pd.concat([rows, counts], ignore_index=True)
+        return frame[self.keys + ['metric', 'value', 'count']].astype({'count': 'int64'})
+
+    @classmethod
+    def from_histogram_frame(cls, frame, source_shape=None):
+        """Rebuild the summaries written by to_frame(), without the rows they came from."""
+        summaries = cls()
+        is_rows = frame['metric'].isna()
+        rows, counts = frame[is_rows], frame[~is_rows]
+        summaries.rows = rows.set_index(cls.keys)['count'].astype('int64')
+        summaries.counts = counts.set_index(cls.keys + ['metric', 'value'])['count'].astype('int64')
+        summaries.levels = list(dict.fromkeys(rows[level_column]))
+        summaries.source_shape = source_shape
+        return summaries
+
+    def describe(self, metric=score_column):
+        # Same table as frame.groupby('Student_Type')[metric].describe()
+        groups = self.groups()
+        moments = pd.DataFrame({'count': [float(self.summary(metric, g).n) for g in groups],
+                                'mean': [self.summary(metric, g).mean for g in groups],
+                                'std': [self.summary(metric, g).std for g in groups]},
+                               index=pd.Index(groups, name=group_column))
+        quantiles = self.quantiles(metrics=[metric]).droplevel('metric')
+        table = moments.join(quantiles)
+        return table[['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max']]
+
+
+# Tests computed from summaries
+
+# scipy.stats is imported where it is used, so loading this module stays cheap
+
+def ttest(a, b, equal_var=True):
+    from scipy import stats
+    return stats.ttest_ind_from_stats(a.mean, a.std, a.n, b.mean, b.std, b.n, equal_var=equal_var)
+
+
+def anova_oneway(summaries, factor):
+    # One-way ANOVA table laid out like statsmodels' anova_lm(typ=2)
+    n = np.array([s.n for s in summaries.values()], dtype='float64')
+    means = np.array([s.mean for s in summaries.values()])
+    variances = np.array([s.var for s in summaries.values()])
+    grand = np.dot(means, n) / n.sum()
+    ss_between = np.dot(n, (means - grand) ** 2)
+    ss_within = np.dot(n - 1, variances)
+    df_between = len(n) - 1
+    df_within = n.sum() - len(n)
+    f_stat = (ss_between / df_between) / (ss_within / df_within)
+    from scipy import stats
+    return pd.DataFrame({
+        'sum_sq': [ss_between, ss_within],
+        'df': [float(df_between), float(df_within)],
+        'F': [f_stat, np.nan],
+        'PR(>F)': [stats.f.sf(f_stat, df_between, df_within), np.nan],
+    }, index=[factor, 'Residual'])
+
+
+def anova_twoway(cells, factors=(group_column, level_column)):
+    """Two-way ANOVA with interaction (type II sums of squares) from cell sufficient statistics.
+
+    cells is a table indexed by both factors with n, mean and var columns, such as
+    GroupedSummaries.table(by=factors, metrics=[metric]).droplevel('metric'). Each model
+    is a weighted least-squares fit to the cell means, so the cost depends on the
+    number of cells, not rows; empty cells are dropped.
+    """
+    cells = cells[cells['n'] > 0]
+    n = cells['n'].to_numpy(dtype='float64')
+    means = cells['mean'].to_numpy(dtype='float64')
+    # Single-row cells have no within-cell spread
+    ss_within = np.dot(n - 1, np.nan_to_num(cells['var'].to_numpy(dtype='float64')))
+
+    # Treatment-coded dummies for each factor and their interaction
+    codes = [pd.factorize(cells.index.get_level_values(f))[0] for f in factors]
+    a, b = (np.eye(c.max() + 1)[c][:, 1:] for c in codes)
+    ab = (a[:, :, None] * b[:, None, :]).reshape(len(n), -1)
+    weights = np.sqrt(n)
+
+    def fit(*terms):
+        # Residual sum of squares and rank of intercept + terms
+        design = np.column_stack((np.ones(len(n)),) + terms) * weights[:, None]
+        target = means * weights
+        coef, _, rank, _ = np.linalg.lstsq(design, target, rcond=None)
+        return ss_within + np.sum((target - design @ coef) ** 2), rank
+
+    rss_a, rank_a = fit(a)
+    rss_b, rank_b = fit(b)
+    rss_ab, rank_ab = fit(a, b)
+    rss_full, rank_full = fit(a, b, ab)
+    df_within = n.sum() - rank_full
+
+    sum_sq = np.array([rss_b - rss_ab, rss_a - rss_ab, rss_ab - rss_full])
+    dof = np.array([rank_ab - rank_b, rank_ab - rank_a, rank_full - rank_ab], dtype='float64')
+    with np.errstate(invalid='ignore', divide='ignore'):
+        f_stat = (sum_sq / dof) / (ss_within / df_within)
+    from scipy import stats
+    return pd.DataFrame({
+        'sum_sq': np.append(sum_sq, ss_within),
+        'df': np.append(dof, df_within),
+        'F': np.append(f_stat, np.nan),
+        'PR(>F)': np.append(stats.f.sf(f_stat, dof, df_within), np.nan),
+    }, index=[factors[0], factors[1], f'{factors[0]}:{factors[1]}', 'Residual'])
@@ -0,0 +1,227 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from schema import (experience_column, experience_levels, label_columns, likert_columns, likert_levels,
+                    skill_columns, skill_mapping, speaking_column, text_columns)
+
+# Seeded synthetic survey exports for scaling tests.
+#
+# The generator mimics the real export: the same 30 columns under the same
+# headers, nationality / first-language / university spellings as messy as
+# the collected ones, skill labels with the occasional 'Very strong' casing,
+# Likert answers and free-text answers drawn from phrase pools. Every label
+# column is built as a categorical from integer codes, so a chunk of a
+# million rows is generated in a few vectorized draws.
+#
+# Large exports are written chunk by chunk; each chunk gets its own child of
+# one SeedSequence, so a file depends only on (rows, seed, chunksize,
+# options) and never has to fit in memory.
+
+DEFAULT_CHUNKSIZE = 1_000_000
+EXCEL_MAX_ROWS = 1_048_575      # one header row plus the sheet's row limit
+
+# Skill answers outside the rating scale, for exports with unknown_rate > 0
+unknown_skill_labels = ['Average', 'Excellent', 'Fluent']
+
+# Spelling variants are kept on purpose: cleaning has to cope with them at any scale
+foreign_nationalities = ['Sri Lankan', 'Sri lankan', 'Srilankan', 'Tajik', 'Ugandan', 'Mauritian', 'Bangladeshi',
+                         'BANGLADESH', 'Namibian', 'Fijian', 'Sudan', 'Liberian', 'Jamaican', 'Nigeria', 'Gambian',
+                         'Congolese', 'Nepali', 'Egyptian', 'Motswana', 'Afghanistan', 'Tanzania', 'Myanmar', 'Somali']
+indian_languages = ['Hindi', 'HINDI', 'hindi', 'Marathi', 'Malayalam', 'Telugu', 'Kannada', 'Odia', 'Tamil',
+                    'Maithili', 'Bengali', 'Urdu', 'English']
+foreign_languages = ['Sinhala', 'Sinhalese', 'Arabic', 'Bangla', 'Swahili', 'Nepali', 'Tajik', 'Sesotho', 'Setswana',
+                     'Creole', 'Patois', 'Oshiwambo', 'Malagasy', 'Somali', 'Burmese', 'Pashto', 'English']
+universities = ['University of Lucknow', 'Lucknow University', 'Savitribai Phule Pune University',
+                'Symbiosis International University', 'University of Delhi', 'University of Mysore',
+                'Azim Premji University', 'English and Foreign Languages University', 'Punjab University',
+                'Bharathiar University', 'NIT Karnataka', 'Sister Nivedita University']
+study_levels = ['Undergraduate', 'Postgraduate', 'Doctoral', 'Diploma']
+
+# Free-text answers are an opener plus an optional detail, giving a realistic number of distinct strings
+text_phrases = {
+    text_columns[0]: (
+        ['Language barrier', 'Understanding different accents', 'Limited vocabulary', 'Speaking in front of the class',
+         'Writing academic assignments', 'Professors switching to Hindi', 'Lack of confidence while speaking',
+         'Following fast lectures', 'Grammar mistakes', 'No major challenges'],
+        ['in lectures.', 'with classmates.', 'during presentations.', 'in the first semester.',
+         'when reading research papers.', 'outside the classroom.'],
+    ),
+    text_columns[1]: (
+        ['English movies', 'Reading novels', 'Speaking with friends', 'Watching YouTube videos', 'Making notes',
+         'Listening to podcasts', 'Spoken English courses', 'Reading newspapers', 'Practising with a tutor',
+         'Language learning apps'],
+        ['every day.', 'with subtitles.', 'and revising vocabulary.', 'during holidays.', 'in the hostel.',
+         'before exams.'],
+    ),
+    text_columns[2]: (
+        ['Yes. Spoken English courses', 'Yes, academic writing workshops', 'Yes, peer tutoring',
+         'Yes, conversation clubs', 'Yes, language labs', 'No, the current support is enough',
+         'Yes, classes for foreign students', 'Yes, pronunciation training'],
+        ['at a lower cost.', 'for every department.', 'in the evenings.', 'for first-year students.'],
+    ),
+}
+
+
+def _choice(rng, n, p):
+    # Codes 0..len(p)-1 drawn with probabilities p (inverse CDF, cheaper than rng.choice for large n)
+    cdf = np.cumsum(p, dtype='float64')
+    return np.searchsorted(cdf / cdf[-1], rng.random(n), side='right').astype('int16')
+
+
+def _categorical(codes, categories):
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+
+def _numbered(names, count, prefix):
+    # The first count names, extended with numbered ones when more groups are asked for
+    return list(names[:count]) + [f"{prefix} {i}" for i in range(len(names) + 1, count + 1)]
+
+
+def generate_responses(n, seed=0, indian_share=0.5, n_universities=6, n_levels=2, label_noise=0.05,
+                       missing_rate=0.01, blank_text_rate=0.05, unknown_rate=0.0, rng=None):
+    """n synthetic survey responses laid out like the raw export (labels, not scores).
+
+    Proficiency comes from a latent ability per respondent plus per-skill
+    noise, with foreign students slightly ahead overall and in speaking in
+    particular, roughly matching the collected data. n_universities and
+    n_levels set the number of institutions and levels of study, for
+    sweeps over group counts. label_noise is the share of extreme skill
+    ratings written in the 'Very strong' / 'Very weak' casing,
+    missing_rate the share of rows with a missing key column and
+    unknown_rate the share of skill answers replaced by a label outside the
+    rating scale.
+    """
+    rng = rng if rng is not None else np.random.default_rng(seed)
+    indian = rng.random(n) < indian_share
+    columns = {}
+
+    n_foreign = len(foreign_nationalities)
+    nationality = np.where(indian, 0, 1 + rng.integers(0, n_foreign, n))
+    columns['Nationality'] = _categorical(nationality, ['Indian'] + foreign_nationalities)
+    languages = list(dict.fromkeys(indian_languages + foreign_languages))
+    indian_codes = np.array([languages.index(l) for l in indian_languages])
+    foreign_codes = np.array([languages.index(l) for l in foreign_languages])
+    columns['First Language'] = _categorical(
+        np.where(indian, indian_codes[rng.integers(0, len(indian_codes), n)],
+                 foreign_codes[rng.integers(0, len(foreign_codes), n)]), languages)
+    # A few large institutions and a long tail, as in the collected data
+    university_names = _numbered(universities, n_universities, 'University')
+    columns['University Name'] = _categorical(_choice(rng, n, 1 / np.arange(1, n_universities + 1)), university_names)
+    level_names = _numbered(study_levels, n_levels, 'Level')
+    level = _choice(rng, n, np.full(n_levels, 1.0))
+    columns['Level of Study'] = _categorical(level, level_names)
+    columns[experience_column] = _categorical(_choice(rng, n, [0.14, 0.33, 0.53]), experience_levels)
+
+    # Skill ratings 1-5 around a latent ability; later levels of study score a little higher
+    ability = np.where(indian, 3.6, 3.85) + 0.05 * level + rng.normal(0, 0.6, n)
+    labels = list(skill_mapping)
+    variants = {1: len(labels), 5: len(labels) + 1}     # 'Very weak', 'Very strong'
+    skill_labels = labels + ['Very weak', 'Very strong']
+    for skill in skill_columns:
+        offset = np.where(indian, 0.0, 0.3) if skill == speaking_column else 0.0
+        rating = np.clip(np.rint(ability + offset + rng.normal(0, 0.5, n)), 1, 5).astype('int16')
+        codes = rating - 1
+        noisy = rng.random(n) < label_noise
+        for value, code in variants.items():
+            codes[noisy & (rating == value)] = code
+        if unknown_rate > 0:
+            unknown = np.flatnonzero(rng.random(n) < unknown_rate)
+            codes[unknown] = len(skill_labels) + rng.integers(0, len(unknown_skill_labels), len(unknown))
+            columns[skill] = _categorical(codes, skill_labels + unknown_skill_labels)
+        else:
+            columns[skill] = _categorical(codes, skill_labels)
+
+    agreement = [0.10, 0.20, 0.17, 0.30, 0.23]
+    for col in likert_columns:
+        columns[col] = _categorical(_choice(rng, n, agreement), likert_levels)
+
+    for col in text_columns:
+        openers, details = text_phrases[col]
+        answers = list(openers) + [f"{o} {d}" for o in openers for d in details]
+        # Half the answers are a bare opener
+        opener = rng.integers(0, len(openers), n)
+        detail = rng.integers(0, len(details), n)
+        codes = np.where(rng.random(n) < 0.5, opener, len(openers) + opener * len(details) + detail)
+        codes[rng.random(n) < blank_text_rate] = -1
+        columns[col] = _categorical(codes, answers)
+
+    frame = pd.DataFrame(columns)
+    if missing_rate > 0:
+        # Missing key answers, spread over the key columns
+        missing = np.flatnonzero(rng.random(n) < missing_rate)
+        key = rng.integers(0, 3, len(missing))
+        for i, col in enumerate(['Nationality', 'First Language', 'Level of Study']):
+            frame.loc[frame.index[missing[key == i]], col] = np.nan
+    return frame[label_columns + [experience_column] + skill_columns + likert_columns + text_columns]
+
+
+def _format(path):
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix in ('.csv', '.parquet', '.xlsx'):
+        return suffix[1:]
+    raise ValueError(f"Unsupported synthetic export format: {path!r} (use .csv, .parquet or .xlsx)")
+
+
+def iter_chunks(n, seed=0, chunksize=DEFAULT_CHUNKSIZE, **options):
+    """Frames of up to chunksize responses, n in total, each chunk seeded independently."""
+    n_chunks = max(1, -(-n // chunksize))
+    seeds = np.random.SeedSequence(seed).spawn(n_chunks)
+    for i, child in enumerate(seeds):
+        size = min(chunksize, n - i * chunksize)
+        yield generate_responses(size, rng=np.random.default_rng(child), **options)
+
+
+def write_export(path, n, seed=0, chunksize=DEFAULT_CHUNKSIZE, **options):
+    """Write n synthetic responses to a CSV, Parquet or XLSX export, chunk by chunk; returns path."""
+    fmt = _format(path)
+    if fmt == 'xlsx':
+        # Workbooks are written in one go, so they are limited to one sheet's worth of rows
+        if n > EXCEL_MAX_ROWS:
+            raise ValueError(f"An XLSX export holds at most {EXCEL_MAX_ROWS} responses (asked for {n})")
+        frame = pd.concat(iter_chunks(n, seed, chunksize, **options), ignore_index=True)
+        frame.to_excel(path, index=False, sheet_name='Responses')
+        return path
+
+    tmp = path + '.tmp'
+    writer = None
+    try:
+        for i, chunk in enumerate(iter_chunks(n, seed, chunksize, **options)):
+            if fmt == 'csv':
+                chunk.to_csv(tmp, index=False, mode='w' if i == 0 else 'a', header=i == 0)
+                continue
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    os.replace(tmp, path)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write a seeded synthetic survey export.')
+    parser.add_argument('--rows', type=float, required=True, help='Number of responses, e.g. 1e6')
+    parser.add_argument('--output', required=True, help='Export path; .csv, .parquet or .xlsx')
+    parser.add_argument('--seed', type=int, default=0, help='Seed (default: 0)')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                        help=f'Rows generated and written at a time (default: {DEFAULT_CHUNKSIZE})')
+    parser.add_argument('--universities', type=int, default=6, help='Number of institutions (default: 6)')
+    parser.add_argument('--levels', type=int, default=2, help='Number of levels of study (default: 2)')
+    parser.add_argument('--indian-share', type=float, default=0.5, help='Share of Indian students (default: 0.5)')
+    parser.add_argument('--unknown-rate', type=float, default=0.0,
+                        help='Share of skill answers with a label outside the rating scale (default: 0)')
+    args = parser.parse_args(argv)
+    write_export(args.output, int(args.rows), args.seed, args.chunksize, indian_share=args.indian_share,
+                 n_universities=args.universities, n_levels=args.levels, unknown_rate=args.unknown_rate)
+    print(f"Wrote {int(args.rows)} synthetic responses to '{args.output}'")
+
+
+if __name__ == '__main__':
+    main()
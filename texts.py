@@ -0,0 +1,199 @@
+import argparse
+import json
+
+import numpy as np
+import pandas as pd
+
+from ingest import DEFAULT_CHUNKSIZE, with_student_type
+from readers import iter_raw_chunks
+from schema import group_column, key_columns, text_columns
+
+# Free-text answers, read only when a text stage asks for them.
+#
+# The analysis and the processed file leave the three free-text columns out.
+# Here they are read on their own, chunk by chunk, and parsed straight into
+# categoricals, so every distinct answer is stored once and every row is an
+# integer code. Normalizing (whitespace, case, placeholder blanks) runs on
+# that dictionary rather than the rows, and a bincount over (student type,
+# answer) codes folds each chunk into running counts, as GroupedSummaries
+# does for the ratings. Theme matching then runs once per distinct answer and
+# the theme frequencies by student type are a product of the match matrix
+# with the counts: millions of answers cost one counting pass.
+
+DEFAULT_OUTPUT_FILE = 'text_themes.csv'
+
+# Short names for the free-text questions
+question_names = {
+    text_columns[0]: 'Challenges',
+    text_columns[1]: 'Strategies',
+    text_columns[2]: 'Support programs',
+}
+
+# Answers that stand for no answer, after normalizing
+blank_answers = {'', 'null', 'nil', 'na', 'n/a', '-', '.'}
+
+# Theme -> regular expressions, matched against the lower-cased answers
+DEFAULT_THEMES = {
+    'accent / pronunciation': [r'accent', r'pronunciation'],
+    'vocabulary': [r'vocabular', r'\bwords?\b'],
+    'speaking / fluency': [r'\bspeak', r'\bspoken\b', r'fluen'],
+    'understanding': [r'understand'],
+    'language barrier': [r'barrier'],
+    'local language in class': [r'hindi', r'bengali', r'bangla', r'mother tongue', r'regional language'],
+    'confidence / shyness': [r'confiden', r'\bshy', r'hesita', r'nervous'],
+    'movies and videos': [r'movie', r'\bfilms?\b', r'series', r'youtube'],
+    'reading': [r'\bread', r'novel', r'\bbooks?\b', r'newspaper', r'literature'],
+    'friends and conversation': [r'friend', r'conversation', r'interact'],
+    'podcasts / listening': [r'podcast', r'\blisten'],
+    'apps and online': [r'\bapps?\b', r'online'],
+    'spoken English courses': [r'spoken english', r'speaking course', r'english (?:language )?speaking course'],
+    'writing support': [r'writing'],
+    'tutoring and clubs': [r'tutor', r'\bclubs?\b', r'\bpeer'],
+    'courses and classes': [r'course', r'\bclass(?:es)?\b', r'program', r'workshop', r'seminar'],
+}
+
+
+def normalize_answers(answers):
+    """Answers -> lower-case with whitespace collapsed; placeholders for no answer become NaN."""
+    normalized = pd.Index(answers).astype(str).str.replace(r'\s+', ' ', regex=True).str.strip().str.lower()
+    return normalized.where(~normalized.isin(blank_answers))
+
+
+class AnswerCounts:
+    """Per-(question, Student_Type) counts of every distinct normalized answer.
+
+    Built from chunks like GroupedSummaries; the index of counts is the
+    string dictionary, each answer appearing once per question and group.
+    """
+
+    def __init__(self):
+        self.counts = None      # (question, group, answer) -> count
+        self.rows = None        # group -> respondents, answered or not
+
+    def add(self, frame):
+        # Fold a frame with the group column and any of the text columns into the running counts
+        group_codes, group_labels = pd.factorize(frame[group_column])
+        parts = []
+        for col in [c for c in text_columns if c in frame]:
+            raw = frame[col].astype('category')
+            # Spelling variants of one answer share a code; blank answers get -1
+            answer_codes, answer_labels = pd.factorize(normalize_answers(raw.cat.categories))
+            codes = np.append(answer_codes, -1)[raw.cat.codes.to_numpy()]
+            keep = codes >= 0
+            flat = group_codes[keep] * len(answer_labels) + codes[keep]
+            binned = np.bincount(flat, minlength=len(group_labels) * len(answer_labels))
+            groups, answers = np.nonzero(binned.reshape(len(group_labels), len(answer_labels)))
+            index = pd.MultiIndex.from_arrays([
+                np.full(len(groups), col, dtype=object),
+                np.asarray(group_labels, dtype=object)[groups],
+                np.asarray(answer_labels, dtype=object)[answers],
+            ], names=['question', group_column, 'answer'])
+            parts.append(pd.Series(binned[groups * len(answer_labels) + answers], index=index))
+        counts = pd.concat(parts) if parts else None
+        rows = pd.Series(np.bincount(group_codes, minlength=len(group_labels)),
+                         index=pd.Index(np.asarray(group_labels, dtype=object), name=group_column))
+
+        if self.counts is None:
+            self.counts, self.rows = counts, rows
+        else:
+            if counts is not None:
+                self.counts = self.counts.add(counts, fill_value=0).astype('int64')
+            self.rows = self.rows.add(rows, fill_value=0).astype('int64')
+
+    def answers(self, question):
+        """Distinct answers x student types count table for one question."""
+        table = self.counts.xs(question, level='question').unstack(group_column, fill_value=0)
+        return table.reindex(columns=self.rows.index, fill_value=0)
+
+    def top_answers(self, question, n=10):
+        table = self.answers(question)
+        return table.loc[table.sum(axis=1).sort_values(ascending=False, kind='stable').index[:n]]
+
+
+def load_answers(paths, chunksize=DEFAULT_CHUNKSIZE, questions=None):
+    """Read only the key and free-text columns of the exports into AnswerCounts, chunk by chunk.
+
+    Rows are dropped and grouped exactly as in the analysis.
+    """
+    paths = [paths] if isinstance(paths, str) else list(paths)
+    columns = key_columns + list(questions or text_columns)
+    answers = AnswerCounts()
+    for path in paths:
+        for chunk in iter_raw_chunks(path, columns, chunksize):
+            answers.add(with_student_type(chunk))
+    return answers
+
+
+def theme_matches(answers, themes=DEFAULT_THEMES):
+    """Boolean (answers x themes) frame: which themes each normalized answer mentions."""
+    answers = pd.Index(answers, dtype=object)
+    return pd.DataFrame({theme: answers.str.contains('|'.join(f'(?:{p})' for p in patterns), regex=True)
+                         for theme, patterns in themes.items()}, index=answers)
+
+
+def theme_frequencies(answer_counts, themes=DEFAULT_THEMES, questions=None):
+    """Respondents mentioning each theme, per question, theme and student type.
+
+    Columns: answered (respondents with a non-blank answer), mentions and
+    share (mentions / answered). An answer may mention several themes.
+    """
+    tables = []
+    for question in questions or text_columns:
+        if answer_counts.counts is None or question not in answer_counts.counts.index.get_level_values('question'):
+            continue
+        counts = answer_counts.answers(question)
+        matches = theme_matches(counts.index, themes)
+        mentions = matches.to_numpy(dtype='float64').T @ counts.to_numpy(dtype='float64')
+        answered = counts.to_numpy(dtype='float64').sum(axis=0)
+        index = pd.MultiIndex.from_product([[question_names.get(question, question)], list(themes), counts.columns],
+                                           names=['question', 'theme', group_column])
+        table = pd.DataFrame({
+            'answered': np.tile(answered, len(themes)).astype('int64'),
+            'mentions': mentions.ravel().astype('int64'),
+        }, index=index)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            table['share'] = table['mentions'] / table['answered']
+        tables.append(table)
+    return pd.concat(tables) if tables else pd.DataFrame(columns=['answered', 'mentions', 'share'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Count themes in the free-text answers by student type.')
+    parser.add_argument('--input', nargs='+', default=['data/Data Collection.csv'], metavar='PATH',
+                        help='Survey exports: CSV, XLSX or Parquet (default: data/Data Collection.csv)')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT_FILE,
+                        help=f'Theme frequency table, CSV (default: {DEFAULT_OUTPUT_FILE})')
+    parser.add_argument('--themes', default=None, metavar='JSON',
+                        help='JSON file mapping theme names to lists of regular expressions '
+                             '(default: the built-in themes)')
+    parser.add_argument('--top', type=int, default=0,
+                        help='Also print the N most frequent answers to each question')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                        help=f'Rows read at a time (default: {DEFAULT_CHUNKSIZE})')
+    args = parser.parse_args(argv)
+
+    themes = DEFAULT_THEMES
+    if args.themes is not None:
+        with open(args.themes) as f:
+            themes = json.load(f)
+
+    print("Loading answers...")
+    answers = load_answers(args.input, args.chunksize)
+    table = theme_frequencies(answers, themes)
+    table.to_csv(args.output)
+
+    for question, name in question_names.items():
+        if name not in table.index.get_level_values('question'):
+            continue
+        part = table.xs(name, level='question')
+        shares = part['share'].unstack(group_column)
+        print(f"\n{name}: share of answers mentioning each theme")
+        print(shares[(part['mentions'].unstack(group_column) > 0).any(axis=1)].round(3).to_string())
+        if args.top > 0:
+            print(f"\nMost frequent answers ({name}):")
+            print(answers.top_answers(question, args.top).to_string())
+    print(f"\nTheme frequencies saved to '{args.output}'")
+
+
+if __name__ == '__main__':
+    main()